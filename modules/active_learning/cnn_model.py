@@ -1,17 +1,82 @@
-from tensorflow.keras.callbacks import EarlyStopping
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Conv1D
-from tensorflow.keras.layers import Dense
-from tensorflow.keras.layers import Dropout
-from tensorflow.keras.layers import Flatten
-from tensorflow.keras.layers import MaxPooling1D
-from tensorflow.keras.utils import to_categorical
-from imblearn.over_sampling import SMOTE
+import os
+import warnings
+import numpy as np
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
 from numpy.typing import NDArray
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from config import ActiveLearningConfig
 
-def get_model(points: int, num_classes: int) -> Sequential:
+# TensorFlow and imbalanced-learn are imported by functions, which need them,
+# so jobs, which do not train model, do not pay for their import.
+if TYPE_CHECKING:
+    import h5py
+    import tensorflow as tf
+    from tensorflow.keras.models import Sequential
+
+TFLITE_BATCH_SIZE = 256
+
+class ModelCache:
+    """
+    Least recently used cache of trained models with their compiled prediction functions, keyed by path, 
+    modification time and size of the file, where the model was saved.
+    Used by long-lived worker, so the job warm-starting from the model saved by previous job neither loads it 
+    from disk, nor compiles its prediction function again. Training updates weights of the cached model 
+    in place, and the compiled function reads them.
+    """
+
+    def __init__(self, max_models: int) -> None:
+        self.max_models = max_models
+        self.items: OrderedDict[tuple, tuple["Sequential", dict[tuple, Callable]]] = OrderedDict()
+
+    def pop(self, model_path: str) -> tuple["Sequential", dict[tuple, Callable]] | None:
+        """
+        Removes model saved to the file from the cache and returns it. 
+        The model is removed, because its training makes it differ from the file.
+
+        Parameters:
+            model_path (str): path to saved model.
+
+        Returns:
+            tuple[Sequential, dict[tuple, Callable]] | None: the model and its prediction functions,
+                None if it is not cached or the file was changed.
+        """
+        return self.items.pop(get_model_file_key(model_path), None)
+
+    def put(self, model_path: str, model: "Sequential", predictors: dict[tuple, Callable]) -> None:
+        """
+        Caches model just saved to the file, least recently used models are removed to fit into the limit.
+
+        Parameters:
+            model_path (str): path to saved model.
+            model (Sequential): the saved model.
+            predictors (dict[tuple, Callable]): prediction functions compiled for the model, see get_predictor.
+        """
+        if self.max_models <= 0:
+            return
+        while len(self.items) >= self.max_models:
+            self.items.popitem(last=False)
+        self.items[get_model_file_key(model_path)] = (model, predictors)
+
+model_cache: ModelCache | None = None
+
+def get_model_file_key(model_path: str) -> tuple[str, int, int]:
+    """
+    Gets key of saved model file, which changes, when the file is rewritten.
+
+    Parameters:
+        model_path (str): path to saved model.
+
+    Returns:
+        tuple[str, int, int]: resolved path, modification time in nanoseconds and size of the file.
+    """
+    path = Path(model_path).resolve()
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+def get_model(points: int, num_classes: int) -> "Sequential":
     """
     Creates convolutional neural network model for spectrum classification 
     
@@ -22,6 +87,9 @@ def get_model(points: int, num_classes: int) -> Sequential:
     Returns:
         Sequential: The model for spectrum classification.
     """
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Conv1D, Dense, Dropout, Flatten, MaxPooling1D
+
     model = Sequential([
         Conv1D(64, 3, activation='relu', input_shape=(points, 1)),
         Conv1D(64, 3, activation='relu'),
@@ -42,10 +110,275 @@ def get_model(points: int, num_classes: int) -> Sequential:
     model.compile(loss='categorical_crossentropy', optimizer='adam')
     return model
 
+def load_model(model_path: str, points: int, num_classes: int
+               ) -> tuple["Sequential | None", dict[tuple, Callable]]:
+    """
+    Loads saved model for warm start, if model cache is set, the model is taken from it, when it is cached.
+
+    Parameters:
+        model_path: path to saved model, may be empty.
+        points: number of uniform points, must match input layer size.
+        num_classes: number of spectrum classification classes, must match output layer size.
+
+    Returns:
+        Tuple[Sequential | None, dict[tuple, Callable]]:
+            The loaded model, None if it does not exist or its input or output size differs.
+            Prediction functions compiled for the model, empty if it was not cached, see get_predictor.
+    """
+    if not model_path or not Path(model_path).is_file():
+        return None, {}
+
+    cached = model_cache.pop(model_path) if model_cache is not None else None
+    if cached is not None:
+        model, predictors = cached
+    else:
+        from tensorflow.keras.models import load_model as load_keras_model
+        model, predictors = load_keras_model(model_path), {}
+    if tuple(model.input_shape) != (None, points, 1) or model.output_shape[-1] != num_classes:
+        return None, {}
+    return model, predictors
+
+def cache_model(model_path: str, model: "Sequential", predictors: dict[tuple, Callable]) -> None:
+    """
+    Adds model just saved to the file to model cache, if it is set.
+
+    Parameters:
+        model_path (str): path to saved model.
+        model (Sequential): the saved model.
+        predictors (dict[tuple, Callable]): prediction functions compiled for the model, see get_predictor.
+    """
+    if model_cache is not None:
+        model_cache.put(model_path, model, predictors)
+
+def get_cpu_threads(config: ActiveLearningConfig) -> int:
+    """
+    Gets number of threads used inside one operation: tf_intra_op_threads, if it is set,
+    otherwise number of CPU cores, which the job is allowed to run on.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
 
-def train(model: Sequential, fluxes: NDArray[float], 
+    Returns:
+        int: number of threads.
+    """
+    if config.tf_intra_op_threads > 0:
+        return config.tf_intra_op_threads
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def configure_cpu(config: ActiveLearningConfig) -> None:
+    """
+    Sets CPU affinity of the job and sizes of TensorFlow thread pools.
+    Intra-op pool, which also runs XLA compiled prediction, has get_cpu_threads threads.
+    Thread pools can be set only before TensorFlow runtime is initialized, later different setting 
+    is ignored with warning. So it is called once per process, before the first job, 
+    see job_active_learning and worker.run_worker.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+    """
+    if config.cpu_affinity:
+        os.sched_setaffinity(0, config.cpu_affinity)
+    if not config.cpu_affinity and config.tf_intra_op_threads <= 0 and config.tf_inter_op_threads <= 0:
+        return
+
+    import tensorflow as tf
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(get_cpu_threads(config))
+        if config.tf_inter_op_threads > 0:
+            tf.config.threading.set_inter_op_parallelism_threads(config.tf_inter_op_threads)
+    except RuntimeError:
+        warnings.warn("TensorFlow runtime is already initialized, thread pools keep "
+                      f"{tf.config.threading.get_intra_op_parallelism_threads()} intra-op and "
+                      f"{tf.config.threading.get_inter_op_parallelism_threads()} inter-op threads", 
+                      RuntimeWarning)
+
+def get_class_weights(labels: NDArray[int], num_classes: int) -> dict[int, float]:
+    """
+    Gets weights of classes inversely proportional to their frequency, for class-weighted loss.
+
+    Parameters:
+        labels (NDArray[int]): 1D array of labels.
+        num_classes (int): number of spectrum classification classes.
+
+    Returns:
+        dict[int, float]: weight of every class, classes without spectra have weight 1.
+    """
+    counts = np.bincount(labels, minlength=num_classes)
+    present = np.count_nonzero(counts)
+    return {i: labels.shape[0] / (present * count) if count else 1.0 for i, count in enumerate(counts)}
+
+def get_balanced_steps(labels: NDArray[int], batch_size: int) -> int:
+    """
+    Gets number of balanced batches in one epoch, so it has as many spectra as SMOTE oversampled data.
+
+    Parameters:
+        labels (NDArray[int]): 1D array of labels.
+        batch_size (int): number of spectra in one batch.
+
+    Returns:
+        int: number of batches.
+    """
+    counts = np.bincount(labels)
+    return -(-np.count_nonzero(counts) * int(counts.max()) // batch_size)
+
+def iter_balanced_batches(fluxes: NDArray[float], labels: NDArray[int], batch_size: int, steps: int,
+                          synthesize: bool, rng: np.random.Generator) -> Iterator[tuple[NDArray[float], NDArray[int]]]:
+    """
+    Samples class-balanced batches, balanced data are never materialized.
+
+    Class of every spectrum in the batch is drawn uniformly, then random spectrum of the class is taken.
+    If synthesize is True, spectrum of minority class is replaced by interpolation with another random 
+    spectrum of the same class, with probability of synthetic spectrum in SMOTE oversampled data.
+
+    Parameters:
+        fluxes (NDArray[float]): 2D array of fluxes or HDF5 dataset.
+        labels (NDArray[int]): 1D array of labels.
+        batch_size (int): number of spectra in one batch.
+        steps (int): number of batches.
+        synthesize (bool): if True, minority spectra are interpolated like SMOTE.
+        rng (np.random.Generator): random generator.
+
+    Yields:
+        Tuple[NDArray[float], NDArray[int]]:
+            2D array of fluxes in the batch.
+            1D array of labels in the batch.
+    """
+    classes, counts = np.unique(labels, return_counts=True)
+    class_rows = [np.flatnonzero(labels == label) for label in classes]
+    synthetic_rates = 1 - counts / counts.max()
+
+    for _ in range(steps):
+        batch_classes = rng.integers(classes.shape[0], size=batch_size)
+        rows = np.empty(batch_size, dtype=int)
+        partners = np.empty(batch_size, dtype=int)
+        synthetic = np.zeros(batch_size, dtype=bool)
+        for i, members in enumerate(class_rows):
+            mask = batch_classes == i
+            size = int(np.count_nonzero(mask))
+            rows[mask] = members[rng.integers(members.shape[0], size=size)]
+            partners[mask] = members[rng.integers(members.shape[0], size=size)]
+            if synthesize:
+                synthetic[mask] = rng.random(size) < synthetic_rates[i]
+
+        read_rows = np.concatenate((rows, partners[synthetic]))
+        unique_rows, inverse = np.unique(read_rows, return_inverse=True)
+        batch_fluxes = np.asarray(fluxes[unique_rows], dtype=np.float32)[inverse]
+        batch, partner_fluxes = batch_fluxes[:batch_size], batch_fluxes[batch_size:]
+        if partner_fluxes.shape[0]:
+            gaps = rng.random((partner_fluxes.shape[0], 1), dtype=np.float32)
+            batch[synthetic] += gaps * (partner_fluxes - batch[synthetic])
+
+        yield batch, classes[batch_classes]
+
+def make_dataset(fluxes: NDArray[float], labels: NDArray[int] | None, points: int, num_classes: int, 
+                 batch_size: int, shuffle: bool, balancing: str = "smote") -> "tf.data.Dataset":
+    """
+    Creates tf.data pipeline, which streams batches of fluxes and one-hot labels to the model.
+
+    Only one batch is converted at once and next batches are prefetched while the model runs.
+    If shuffle is True, spectra are shuffled by new permutation every epoch, rows of one batch are read
+    in increasing order, so fluxes may be also HDF5 dataset.
+    If balancing is sampler or batch_smote, batches are sampled class-balanced by iter_balanced_batches.
+
+    Parameters:
+        fluxes (NDArray[float]): 2D array of fluxes or HDF5 dataset.
+        labels (NDArray[int] | None): 1D array of labels, if None, only fluxes are streamed.
+        points (int): number of uniform points.
+        num_classes (int): number of spectrum classification classes.
+        batch_size (int): number of spectra in one batch.
+        shuffle (bool): if True, spectra are shuffled every epoch.
+        balancing (str): balancing of training data, see ActiveLearningConfig.
+
+    Returns:
+        tf.data.Dataset: dataset of batches.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.utils import to_categorical
+
+    count = fluxes.shape[0]
+    balanced = labels is not None and balancing in ("sampler", "batch_smote")
+    steps = get_balanced_steps(labels, batch_size) if balanced else -(-count // batch_size)
+
+    def get_batches() -> Iterator[NDArray[float] | tuple[NDArray[float], NDArray[float]]]:
+        if balanced:
+            for batch, batch_labels in iter_balanced_batches(fluxes, labels, batch_size, steps, 
+                                                             balancing == "batch_smote", np.random.default_rng()):
+                yield batch.reshape(-1, points, 1), to_categorical(batch_labels, num_classes=num_classes)
+            return
+
+        indexes = np.random.permutation(count) if shuffle else None
+        for start in range(0, count, batch_size):
+            rows = slice(start, start + batch_size) if indexes is None else np.sort(indexes[start:start + batch_size])
+            batch = np.asarray(fluxes[rows], dtype=np.float32).reshape(-1, points, 1)
+            if labels is None:
+                yield batch
+            else:
+                yield batch, to_categorical(labels[rows], num_classes=num_classes)
+
+    fluxes_spec = tf.TensorSpec(shape=(None, points, 1), dtype=tf.float32)
+    signature = fluxes_spec if labels is None else (fluxes_spec, tf.TensorSpec(shape=(None, num_classes), 
+                                                                               dtype=tf.float32))
+    dataset = tf.data.Dataset.from_generator(get_batches, output_signature=signature)
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(steps))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def make_store_dataset(fluxes: "h5py.Dataset", labels: NDArray[int], points: int, num_classes: int,
+                       batch_size: int, buffer_size: int) -> "tf.data.Dataset":
+    """
+    Creates tf.data pipeline for training, which streams shuffled batches of fluxes from HDF5 dataset.
+
+    Every epoch the dataset is read by contiguous blocks of its chunk rows (or batch size, if it is not chunked)
+    in random order of blocks, so reads stay sequential. Then spectra are shuffled by buffer of buffer_size 
+    spectra, batched and prefetched, only blocks in the buffer are in memory.
+
+    Parameters:
+        fluxes (h5py.Dataset): 2D HDF5 dataset of fluxes.
+        labels (NDArray[int]): 1D array of labels.
+        points (int): number of uniform points.
+        num_classes (int): number of spectrum classification classes.
+        batch_size (int): number of spectra in one batch.
+        buffer_size (int): number of spectra in shuffle buffer.
+
+    Returns:
+        tf.data.Dataset: dataset of batches.
+    """
+    import tensorflow as tf
+    from tensorflow.keras.utils import to_categorical
+
+    count = fluxes.shape[0]
+    block_size = fluxes.chunks[0] if fluxes.chunks is not None else batch_size
+
+    def get_blocks() -> Iterator[tuple[NDArray[float], NDArray[float]]]:
+        for start in np.random.permutation(np.arange(0, count, block_size)):
+            rows = slice(start, start + block_size)
+            yield (np.asarray(fluxes[rows], dtype=np.float32).reshape(-1, points, 1), 
+                   to_categorical(labels[rows], num_classes=num_classes))
+
+    signature = (tf.TensorSpec(shape=(None, points, 1), dtype=tf.float32), 
+                 tf.TensorSpec(shape=(None, num_classes), dtype=tf.float32))
+    dataset = tf.data.Dataset.from_generator(get_blocks, output_signature=signature)
+    dataset = dataset.unbatch().shuffle(buffer_size).batch(batch_size)
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(-(-count // batch_size)))
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def uses_data_pipeline(config: ActiveLearningConfig) -> bool:
+    """
+    Checks whether training data are streamed to the model by tf.data pipeline.
+    Class-balanced sampling of batches is done by the pipeline, so it is used even if data_pipeline is false.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+
+    Returns:
+        bool: True, if tf.data pipeline is used for training.
+    """
+    return config.data_pipeline or config.balancing in ("sampler", "batch_smote")
+
+def train(model: "Sequential", fluxes: NDArray[float], 
           labels: NDArray[int], points: int, num_classes: int, 
-          config: ActiveLearningConfig) -> None:
+          config: ActiveLearningConfig, warm_start: bool = False) -> None:
     """
     Trains the given model
     
@@ -55,25 +388,47 @@ def train(model: Sequential, fluxes: NDArray[float],
 
     Parameters:
         model (Sequential): model to train.
-        fluxes (NDArray[float]): 1D array of fluxes to train on.
+        fluxes (NDArray[float]): 2D array of fluxes to train on or HDF5 dataset.
         labels (NDArray[int]): 1D array of labels to train on.
         points (int): number of uniform points.
         num_classes (int): number of spectrum classification classes.
         config (ActiveLearningConfig): configuration for model training, loaded from configuration file.
+        warm_start (bool): if True, the model is already trained and only fine-tuned, 
+            so epochs and patience for warm start are used.
+
+    If tf.data pipeline is used (see uses_data_pipeline), batches are streamed to the model.
+    Fluxes may be also HDF5 dataset of append-only training store, then they are streamed from the file
+    by make_store_dataset, unless batches are sampled class-balanced.
+    Labels are balanced by class-weighted loss or by sampling of batches, if configured.
     """
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.utils import to_categorical
 
-    one_hot_y = to_categorical(labels, num_classes=num_classes)
+    epochs = config.epochs_warm_start if warm_start else config.epochs_train
+    patience = config.patience_warm_start if warm_start else config.patience_train
     callback = EarlyStopping(
-            monitor='loss', min_delta=config.min_delta_train, patience=config.patience_train,
+            monitor='loss', min_delta=config.min_delta_train, patience=patience,
             restore_best_weights=True
             )
+    class_weight = get_class_weights(labels, num_classes) if config.balancing == "class_weight" else None
+    if uses_data_pipeline(config):
+        if isinstance(fluxes, np.ndarray) or config.balancing in ("sampler", "batch_smote"):
+            dataset = make_dataset(fluxes, labels, points, num_classes, config.batch_size_train, shuffle=True,
+                                   balancing=config.balancing)
+        else:
+            dataset = make_store_dataset(fluxes, labels, points, num_classes, config.batch_size_train, 
+                                         config.shuffle_buffer_size)
+        model.fit(dataset, epochs=epochs, callbacks=[callback], class_weight=class_weight, verbose=0)
+        return
+
+    one_hot_y = to_categorical(labels, num_classes=num_classes)
     model.fit(
-            fluxes.reshape(-1, points, 1), one_hot_y, batch_size=config.batch_size_train, epochs=config.epochs_train,
-            callbacks=[callback], verbose=0
+            fluxes.reshape(-1, points, 1), one_hot_y, batch_size=config.batch_size_train, epochs=epochs,
+            callbacks=[callback], class_weight=class_weight, verbose=0
             )
 
 
-def predict(model: Sequential, fluxes: NDArray[float], 
+def predict(model: "Sequential", fluxes: NDArray[float], 
             points: int, config: ActiveLearningConfig) -> NDArray[NDArray[float]]:
     """
     Runs model prediction
@@ -86,10 +441,153 @@ def predict(model: Sequential, fluxes: NDArray[float],
     
     Returns (NDArray[NDArray[float]]): 
         2D array of predicted probabilities
+
+    If data_pipeline is configured, batches are streamed to the model by tf.data pipeline, 
+    so fluxes may be also HDF5 dataset, which is read by batches.
     """
+    if config.data_pipeline:
+        dataset = make_dataset(fluxes, None, points, 0, config.batch_size_predict, shuffle=False)
+        return model.predict(dataset, verbose=0)
+
     fluxes = fluxes[...].reshape(-1, points, 1)
     return model.predict(fluxes, verbose=0, batch_size=config.batch_size_predict)
 
+def get_padded_size(size: int, max_size: int) -> int:
+    """
+    Gets batch size rounded up to power of two, so compiled functions are traced only for few shapes.
+
+    Parameters:
+        size (int): number of spectra in the batch.
+        max_size (int): maximal batch size.
+
+    Returns:
+        int: padded batch size.
+    """
+    return min(max_size, 1 << (size - 1).bit_length())
+
+def get_xla_predictor(model: "Sequential", points: int, 
+                      config: ActiveLearningConfig) -> Callable[[NDArray[float]], NDArray[NDArray[float]]]:
+    """
+    Compiles model by XLA for prediction on CPU.
+    Compiled model runs on TensorFlow intra-op thread pool, sized by configure_cpu.
+
+    Parameters:
+        model (Sequential): model for prediction.
+        points (int): number of uniform points.
+        config (ActiveLearningConfig): configuration for model prediction, loaded from configuration file.
+
+    Returns:
+        Callable[[NDArray[float]], NDArray[NDArray[float]]]: function returning predicted probabilities of fluxes.
+    """
+    import tensorflow as tf
+
+    function = tf.function(lambda x: model(x, training=False), jit_compile=True)
+
+    def predict_xla(fluxes: NDArray[float]) -> NDArray[NDArray[float]]:
+        fluxes = fluxes.reshape(-1, points, 1)
+        result = np.empty((fluxes.shape[0], model.output_shape[-1]), dtype=np.float32)
+        for start in range(0, fluxes.shape[0], config.batch_size_predict):
+            batch = fluxes[start:start + config.batch_size_predict].astype(np.float32)
+            size = batch.shape[0]
+            padded = np.zeros((get_padded_size(size, config.batch_size_predict), points, 1), dtype=np.float32)
+            padded[:size] = batch
+            result[start:start + size] = function(padded).numpy()[:size]
+        return result
+
+    return predict_xla
+
+def get_tflite_predictor(model: "Sequential", points: int, 
+                         config: ActiveLearningConfig) -> Callable[[NDArray[float]], NDArray[NDArray[float]]]:
+    """
+    Converts model to TensorFlow Lite for prediction on CPU, optionally with dynamic range int8 quantization.
+    Batches of TFLITE_BATCH_SIZE spectra are predicted, larger batches do not speed up TensorFlow Lite.
+    Interpreter uses get_cpu_threads threads.
+
+    Parameters:
+        model (Sequential): model for prediction.
+        points (int): number of uniform points.
+        config (ActiveLearningConfig): configuration for model prediction, loaded from configuration file.
+
+    Returns:
+        Callable[[NDArray[float]], NDArray[NDArray[float]]]: function returning predicted probabilities of fluxes.
+    """
+    import tensorflow as tf
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        Interpreter = tf.lite.Interpreter
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if config.inference_quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    interpreter = Interpreter(model_content=converter.convert(), num_threads=get_cpu_threads(config))
+    input_index = interpreter.get_input_details()[0]["index"]
+    output_index = interpreter.get_output_details()[0]["index"]
+    batch_size = min(TFLITE_BATCH_SIZE, config.batch_size_predict)
+
+    def predict_tflite(fluxes: NDArray[float]) -> NDArray[NDArray[float]]:
+        fluxes = fluxes.reshape(-1, points, 1)
+        result = np.empty((fluxes.shape[0], model.output_shape[-1]), dtype=np.float32)
+        allocated = None
+        for start in range(0, fluxes.shape[0], batch_size):
+            batch = fluxes[start:start + batch_size].astype(np.float32)
+            if batch.shape[0] != allocated:
+                interpreter.resize_tensor_input(input_index, batch.shape)
+                interpreter.allocate_tensors()
+                allocated = batch.shape[0]
+            interpreter.set_tensor(input_index, batch)
+            interpreter.invoke()
+            result[start:start + batch.shape[0]] = interpreter.get_tensor(output_index)
+        return result
+
+    return predict_tflite
+
+def get_predictor(model: "Sequential", points: int, config: ActiveLearningConfig, fluxes: NDArray[float],
+                  predictors: dict[tuple, Callable] | None = None
+                  ) -> Callable[[NDArray[float]], NDArray[NDArray[float]]]:
+    """
+    Gets prediction function of configured inference backend.
+
+    XLA compiled function reads current weights of the model, so it is kept in predictors and reused 
+    after the model is trained again, see ModelCache. TensorFlow Lite model contains converted weights,
+    so it is converted every time.
+
+    Backend other than Keras is validated on a sample of the given fluxes, if its probabilities differ 
+    from Keras probabilities more than inference_max_drift, ValueError is raised.
+
+    Parameters:
+        model (Sequential): trained model for prediction.
+        points (int): number of uniform points.
+        config (ActiveLearningConfig): configuration for model prediction, loaded from configuration file.
+        fluxes (NDArray[float]): 2D array of fluxes for validation, e.g. training fluxes.
+        predictors (dict[tuple, Callable] | None): prediction functions compiled for the model,
+            compiled function is added to it.
+
+    Returns:
+        Callable[[NDArray[float]], NDArray[NDArray[float]]]: function returning predicted probabilities of fluxes.
+    """
+    def predict_keras(fluxes: NDArray[float]) -> NDArray[NDArray[float]]:
+        return predict(model, fluxes, points, config)
+
+    if config.inference_backend == "keras":
+        return predict_keras
+
+    key = ("xla", points, config.batch_size_predict)
+    if config.inference_backend == "xla" and predictors is not None and key in predictors:
+        predictor = predictors[key]
+    elif config.inference_backend == "xla":
+        predictor = get_xla_predictor(model, points, config)
+        if predictors is not None:
+            predictors[key] = predictor
+    else:
+        predictor = get_tflite_predictor(model, points, config)
+    sample = fluxes[:config.inference_validation_size]
+    drift = float(np.max(np.abs(predictor(sample) - predict_keras(sample)), initial=0))
+    if drift > config.inference_max_drift:
+        raise ValueError(f"Predictions of '{config.inference_backend}' backend differ from Keras by {drift}")
+
+    return predictor
+
 def balance(fluxes: NDArray[float], 
             labels: NDArray[int]
             ) -> tuple[NDArray[float], NDArray[int]]:
@@ -104,4 +602,5 @@ def balance(fluxes: NDArray[float],
         1D array of balanced fluxes.
         1D array of balaned labels.
     """
+    from imblearn.over_sampling import SMOTE
     return SMOTE().fit_resample(fluxes, labels)
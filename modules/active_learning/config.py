@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import (
     BaseModel,
     ConfigDict,
@@ -97,12 +99,250 @@ class ActiveLearningConfig(BaseModel):
         examples=[1000],
     )
 
+    warm_start: bool = Field(
+        False,
+        description="If true, model of previous iteration is fine-tuned instead of training new model. "
+                    "If the model does not exist or its input or output size differs, new model is trained.",
+        examples=[True],
+    )
+
+    epochs_warm_start: int = Field(
+        100,
+        description="Epochs for fine-tuning model of previous iteration",
+        examples=[100],
+    )
+
+    patience_warm_start: int = Field(
+        3,
+        description="Patience for fine-tuning model of previous iteration",
+        examples=[3],
+    )
+
+    model_path: str = Field(
+        "",
+        description="Path to model of previous iteration, used for warm start.",
+        examples=["/job_lamost_123/model.keras"],
+    )
+
     batch_size_predict: int = Field(
         2**14,
         description="Batch size for model prediction",
         examples=[16384],
     )
 
+    balancing: Literal["smote", "class_weight", "sampler", "batch_smote"] = Field(
+        "smote",
+        description="Balancing of training data: SMOTE oversampling before training, class-weighted loss, "
+                    "class-balanced sampling of batches, or class-balanced sampling with SMOTE-like interpolation "
+                    "inside batches. Last two modes stream batches by tf.data pipeline.",
+        examples=["batch_smote"],
+    )
+
+    data_pipeline: bool = Field(
+        False,
+        description="If true, model is trained and predicts on batches streamed by tf.data pipeline, "
+                    "instead of converting whole arrays to tensors. Balancing sampler and batch_smote always "
+                    "train by the pipeline, even if it is false. If append_training_data is true and balancing "
+                    "is not smote, training fluxes are streamed from the store, otherwise they are read to memory.",
+        examples=[True],
+    )
+
+    shuffle_buffer_size: int = Field(
+        2**12,
+        description="Count of spectra in shuffle buffer, when training fluxes are streamed from the store "
+                    "by tf.data pipeline, see data_pipeline.",
+        examples=[4096],
+    )
+
+    tf_intra_op_threads: int = Field(
+        0,
+        description="Number of threads used by TensorFlow inside one operation, 0 means TensorFlow default.",
+        examples=[4],
+    )
+
+    tf_inter_op_threads: int = Field(
+        0,
+        description="Number of threads used by TensorFlow to run independent operations, 0 means TensorFlow default.",
+        examples=[2],
+    )
+
+    cpu_affinity: list[int] = Field(
+        [],
+        description="CPU cores, which job is allowed to run on, empty list means all cores.",
+        examples=[[0, 1, 2, 3]],
+    )
+
+    inference_backend: Literal["keras", "xla", "tflite"] = Field(
+        "keras",
+        description="Backend for model prediction on pool data: Keras, XLA compiled function or TensorFlow Lite.",
+        examples=["tflite"],
+    )
+
+    inference_quantize: bool = Field(
+        False,
+        description="If true, TensorFlow Lite model is quantized by dynamic range int8 quantization.",
+        examples=[False],
+    )
+
+    inference_max_drift: float = Field(
+        1e-3,
+        description="Maximum absolute difference of probabilities predicted by backend and by Keras "
+                    "on validation sample, exceeding it fails the job.",
+        examples=[1e-3],
+    )
+
+    inference_validation_size: int = Field(
+        256,
+        description="Number of training spectra used to validate inference backend.",
+        examples=[256],
+    )
+
+    prep_spectra_format: Literal["json", "binary", "both"] = Field(
+        "json",
+        description="Format of spectra shown in the plot on the front-end: prep_spectra.json, or binary file "
+                    "prep_spectra.bin with JSON index prep_spectra_index.json, so one spectrum can be read by byte range.",
+        examples=["binary"],
+    )
+
+    prep_spectra_dtype: Literal["float32", "float16"] = Field(
+        "float32",
+        description="Floating point precision of fluxes in binary file of shown spectra, wave is always float32.",
+        examples=["float16"],
+    )
+
+    budgeted_scoring: bool = Field(
+        False,
+        description="If true, scores of pool spectra are saved and only part of the pool is scored again "
+                    "every iteration, other spectra keep their scores from previous iterations.",
+        examples=[True],
+    )
+
+    rescore_budget: float = Field(
+        0.2,
+        description="Fraction of scored pool spectra, which are scored again in budgeted scoring. Spectra "
+                    "predicted as candidates and spectra with the highest entropies are chosen first.",
+        examples=[0.2],
+    )
+
+    rescore_exploration: float = Field(
+        0.1,
+        description="Fraction of the rescore budget used for randomly chosen spectra in budgeted scoring.",
+        examples=[0.1],
+    )
+
+    full_rescore_every: int = Field(
+        5,
+        description="Number of iterations, after which all pool spectra are scored again in budgeted scoring.",
+        examples=[5],
+    )
+
+    score_cache_path: str = Field(
+        "",
+        description="Path to saved scores of pool spectra from previous iteration, used in budgeted scoring.",
+        examples=["/job_lamost_123/score_cache.h5"],
+    )
+
+    pool_chunk_size: int = Field(
+        0,
+        description="Number of pool spectra read and scored at once, "
+                    "0 means whole pool is loaded to memory.",
+        examples=[65536],
+    )
+
+    reference_pool: bool = Field(
+        False,
+        description="If true, result file references rows of the original pool file instead of copying "
+                    "pool spectra, the original pool file must stay on its place and must not be modified, "
+                    "otherwise reading the result fails.",
+        examples=[True],
+    )
+
+    append_training_data: bool = Field(
+        False,
+        description="If true, training data of all iterations are kept in one append-only file, "
+                    "every iteration appends only new spectra with its iteration number. "
+                    "The file is moved to result directory of every iteration, so only the last iteration "
+                    "can be run again.",
+        examples=[True],
+    )
+
+    dim_reduc_incremental: bool = Field(
+        False,
+        description="If true, t-SNE embedding of training data is saved and new training spectra are placed "
+                    "into the embedding of previous iteration instead of embedding all training data again.",
+        examples=[True],
+    )
+
+    dim_reduc_full_every: int = Field(
+        5,
+        description="Number of iterations, after which full t-SNE embedding is computed again in incremental mode.",
+        examples=[5],
+    )
+
+    dim_reduc_max_drift: float = Field(
+        0.5,
+        description="Maximal number of spectra added since the last full t-SNE embedding relative to its size, "
+                    "full embedding is computed again, when it is exceeded.",
+        examples=[0.5],
+    )
+
+    dim_reduc_state_path: str = Field(
+        "",
+        description="Path to saved t-SNE embedding of previous iteration, used in incremental mode.",
+        examples=["/job_lamost_123/dim_reduc_state.h5"],
+    )
+
+    dim_reduc_tiles: bool = Field(
+        False,
+        description="If true, multi-resolution tiles of t-SNE plot of training data are written "
+                    "to directory dim_reduc_tiles, so plot can be loaded by parts.",
+        examples=[True],
+    )
+
+    profile_stage: str = Field(
+        "",
+        description="Name of job stage in metrics.json, which is profiled, empty string means no profiling.",
+        examples=["train"],
+    )
+
+    profile_mode: Literal["cprofile", "tracemalloc"] = Field(
+        "cprofile",
+        description="Profiler of the profiled stage: cProfile stats are written to profile_<stage>.prof, "
+                    "top memory allocations of tracemalloc to tracemalloc_<stage>.txt.",
+        examples=["tracemalloc"],
+    )
+
+    precision: Literal["float32", "float64"] = Field(
+        "float64",
+        description="Floating point precision of loaded, balanced and written spectra.",
+        examples=["float32"],
+    )
+
+    hdf5_chunk_rows: int = Field(
+        0,
+        description="Number of spectra in one HDF5 chunk of flux datasets, "
+                    "0 means automatic size aligned to batch size for model prediction.",
+        examples=[0],
+    )
+
+    hdf5_compression: Literal["gzip", "lzf"] | None = Field(
+        None,
+        description="Compression filter of HDF5 flux datasets, None means no compression.",
+        examples=["lzf"],
+    )
+
+    hdf5_compression_level: int = Field(
+        4,
+        description="Compression level of gzip filter.",
+        examples=[4],
+    )
+
+    hdf5_shuffle: bool = Field(
+        False,
+        description="If true, applies shuffle filter to HDF5 flux datasets.",
+        examples=[False],
+    )
+
     perf_est_list_path: str = Field(
         "",
         description="Path to file containing performances from previous iteration.",
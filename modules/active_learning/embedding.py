@@ -0,0 +1,83 @@
+import numpy as np
+from numpy.typing import NDArray
+
+PLACE_BLOCK_SIZE = 2**22
+
+def get_conditional_affinities(distances: NDArray[NDArray[float]], perplexity: float,
+                               steps: int = 64) -> NDArray[NDArray[float]]:
+    """
+    Gets t-SNE conditional affinities of points to their nearest neighbours.
+    Precision of gaussian kernel of every point is found by bisection, so entropy of its affinities
+    matches the perplexity.
+
+    Parameters:
+        distances (NDArray[NDArray[float]]): 2D array of squared distances of every point to its neighbours.
+        perplexity (float): t-SNE perplexity.
+        steps (int): number of bisection steps.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of affinities, every row sums to 1.
+    """
+    distances = distances - distances.min(axis=1, keepdims=True)
+    target = np.log(min(perplexity, distances.shape[1]))
+    low = np.full((distances.shape[0], 1), -np.inf)
+    high = np.full((distances.shape[0], 1), np.inf)
+    beta = np.ones((distances.shape[0], 1))
+
+    for _ in range(steps):
+        affinities = np.exp(-distances * beta)
+        sums = affinities.sum(axis=1, keepdims=True)
+        entropies = np.log(sums) + beta * (distances * affinities).sum(axis=1, keepdims=True) / sums
+        too_flat = entropies > target
+        low = np.where(too_flat, beta, low)
+        high = np.where(too_flat, high, beta)
+        beta = np.where(np.isinf(high), beta * 2, np.where(np.isinf(low), beta / 2, (low + high) / 2))
+
+    affinities = np.exp(-distances * beta)
+    return affinities / affinities.sum(axis=1, keepdims=True)
+
+def place_points(fluxes: NDArray[NDArray[float]], embedding: NDArray[NDArray[float]],
+                 fluxes_new: NDArray[NDArray[float]], perplexity: float = 30, n_iter: int = 250,
+                 learning_rate: float = 1.0, max_step: float = 1.0) -> NDArray[NDArray[float]]:
+    """
+    Places new points into existing t-SNE embedding, which is not changed.
+
+    New point starts at the affinity-weighted mean of its nearest neighbours in the embedding, then only
+    new points are optimized by t-SNE gradient against fixed embedded points, every new point independently.
+    Cost is proportional to number of new points times number of embedded points.
+
+    Parameters:
+        fluxes (NDArray[NDArray[float]]): 2D array of fluxes of embedded points.
+        embedding (NDArray[NDArray[float]]): 2D array of embedded points.
+        fluxes_new (NDArray[NDArray[float]]): 2D array of fluxes of new points.
+        perplexity (float): t-SNE perplexity.
+        n_iter (int): number of optimization steps.
+        learning_rate (float): step size of optimization.
+        max_step (float): maximal move of point in one step, which keeps optimization stable.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of embedded new points.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    k = min(int(3 * perplexity) + 1, fluxes.shape[0])
+    distances, neighbours = NearestNeighbors(n_neighbors=k).fit(fluxes).kneighbors(fluxes_new)
+    affinities = get_conditional_affinities(distances ** 2, perplexity)
+    placed = np.einsum("ij,ijk->ik", affinities, embedding[neighbours])
+
+    block_size = max(1, PLACE_BLOCK_SIZE // embedding.shape[0])
+    for start in range(0, placed.shape[0], block_size):
+        rows = slice(start, start + block_size)
+        points, p, nbrs = placed[rows], affinities[rows], neighbours[rows]
+        for _ in range(n_iter):
+            diff = points[:, None, :] - embedding[None, :, :]
+            q = 1 / (1 + (diff ** 2).sum(axis=2))
+            repulsive = np.einsum("ij,ijk->ik", q ** 2, diff) / q.sum(axis=1, keepdims=True)
+            q_nbrs = np.take_along_axis(q, nbrs, axis=1)
+            attractive = np.einsum("ij,ijk->ik", p * q_nbrs, points[:, None, :] - embedding[nbrs])
+            steps = -4 * learning_rate * (attractive - repulsive)
+            norms = np.linalg.norm(steps, axis=1, keepdims=True)
+            points = points + steps * np.minimum(1, max_step / np.maximum(norms, 1e-12))
+        placed[rows] = points
+
+    return placed
@@ -1,17 +1,361 @@
 import h5py
-from numpy.typing import NDArray 
+import json
+import sys
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from numpy.typing import DTypeLike, NDArray 
 from typing import Any
 
 from config import ActiveLearningConfig
+from filename_index import get_filename_hashes, write_filename_index
+from hdf5_layout import get_flux_dataset_options
 
-def read_pool_data(file_path: str
+class PoolCache:
+    """
+    Least recently used cache of pool data read from HDF5 files, limited by memory.
+    Used by long-lived worker, so pool read by previous job is not read from disk again.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.items: OrderedDict[tuple, tuple[NDArray, ...]] = OrderedDict()
+        self.sizes: dict[tuple, int] = {}
+        self.size = 0
+
+    def get(self, key: tuple) -> tuple[NDArray, ...] | None:
+        """
+        Gets cached arrays and marks them as recently used.
+
+        Parameters:
+            key (tuple): key of cached arrays.
+
+        Returns:
+            tuple[NDArray, ...] | None: cached arrays, None if they are not cached.
+        """
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key: tuple, arrays: tuple[NDArray, ...]) -> None:
+        """
+        Caches arrays, least recently used arrays are removed to fit into memory limit.
+        Arrays larger than the limit are not cached.
+
+        Parameters:
+            key (tuple): key of cached arrays.
+            arrays (tuple[NDArray, ...]): arrays to cache, they are made read-only.
+        """
+        size = sum(array.nbytes + (sum(sys.getsizeof(item) for item in array) if array.dtype == object else 0)
+                   for array in arrays)
+        if key in self.items or size > self.max_bytes:
+            return
+
+        while self.size + size > self.max_bytes:
+            old_key, _ = self.items.popitem(last=False)
+            self.size -= self.sizes.pop(old_key)
+        for array in arrays:
+            array.flags.writeable = False
+        self.items[key] = arrays
+        self.sizes[key] = size
+        self.size += size
+
+pool_cache: PoolCache | None = None
+
+def read_dataset(dataset: h5py.Dataset, dtype: DTypeLike | None = None, 
+                 selection: slice | NDArray[int] = slice(None)) -> NDArray:
+    """
+    Reads the dataset, converting it to the data type without intermediate copy.
+
+    Parameters:
+        dataset (h5py.Dataset): dataset to read.
+        dtype (DTypeLike | None): data type of result, if None, stored data type is kept.
+        selection (slice | NDArray[int]): rows to read, by default the whole dataset is read.
+            Array of rows must be strictly increasing.
+
+    Returns:
+        NDArray: the dataset data.
+    """
+    if dtype is None or dataset.dtype == dtype:
+        return dataset[selection]
+    return dataset.astype(dtype)[selection]
+
+def read_rows(dataset: h5py.Dataset, rows: NDArray[int], dtype: DTypeLike | None = None) -> NDArray:
+    """
+    Reads rows of the dataset in the given order. Consecutive rows are read at once by one slice,
+    which is much faster, than reading them by a list of rows.
+
+    Parameters:
+        dataset (h5py.Dataset): dataset to read, or its string wrapper.
+        rows (NDArray[int]): 1D array of rows to read.
+        dtype (DTypeLike | None): data type of result, if None, stored data type is kept.
+
+    Returns:
+        NDArray: the rows of dataset.
+    """
+    if rows.shape[0] == 0:
+        return read_dataset(dataset, dtype, slice(0, 0))
+
+    is_sorted = bool(np.all(rows[1:] >= rows[:-1]))
+    order = None if is_sorted else np.argsort(rows, kind="stable")
+    sorted_rows = rows if is_sorted else rows[order]
+    runs = np.split(sorted_rows, np.flatnonzero(np.diff(sorted_rows) != 1) + 1)
+    data = np.concatenate([read_dataset(dataset, dtype, slice(run[0], run[-1] + 1)) for run in runs])
+    if is_sorted:
+        return data
+
+    result = np.empty_like(data)
+    result[order] = data
+    return result
+
+def get_pool_group(h5f: h5py.File) -> tuple[h5py.Group, NDArray[int] | None]:
+    """
+    Gets group with pool datasets from opened HDF5 file. 
+    
+    If the file references rows of the original pool file, pool datasets are in the linked original pool,
+    otherwise they are in the file itself. ValueError is raised, if the original pool file was modified
+    since the reference was written, so referenced rows could point to other spectra.
+
+    Parameters:
+        h5f (h5py.File): opened HDF5 file with pool data.
+
+    Returns:
+        Tuple[h5py.Group, NDArray[int] | None]:
+            Group containing datasets filenames, wave, fluxes.
+            1D array of referenced rows of the original pool, None if the file contains pool itself.
+    """
+    if "pool_rows" not in h5f:
+        return h5f, None
+
+    pool, attrs = h5f["pool"], h5f["pool_rows"].attrs
+    if "pool_mtime_ns" in attrs:
+        stat = Path(pool.file.filename).stat()
+        if (stat.st_mtime_ns, stat.st_size) != (attrs["pool_mtime_ns"], attrs["pool_size"]):
+            raise ValueError(f"Pool data '{pool.file.filename}' were modified after '{h5f.filename}' "
+                             "referenced them")
+    return pool, h5f["pool_rows"][:]
+
+def write_pool_reference(h5f: h5py.File, pool_path: str, indexes: NDArray[int]) -> None:
+    """
+    Writes reference to rows of pool data, instead of copying them. 
+    
+    If pool data references another file, the reference is resolved, so the written reference 
+    always links the original pool file directly. Modification time and size of the original pool file
+    are stored in attributes of pool_rows, so modification of the pool is detected, see get_pool_group.
+
+    Parameters:
+        h5f (h5py.File): opened HDF5 file, where reference will be written.
+        pool_path (str): path to HDF5 file with pool data.
+        indexes (NDArray[int]): 1D array of referenced spectrum indexes in the pool data.
+    """
+    with h5py.File(pool_path, "r") as pool_h5f:
+        _, rows = get_pool_group(pool_h5f)
+        if rows is None:
+            original_path, rows = str(Path(pool_path).resolve()), indexes
+        else:
+            original_path, rows = pool_h5f.get("pool", getlink=True).filename, rows[indexes]
+
+    stat = Path(original_path).stat()
+    h5f["pool"] = h5py.ExternalLink(original_path, "/")
+    h5f.create_dataset("pool_rows", data=np.asarray(rows, dtype=np.int64))
+    h5f["pool_rows"].attrs["pool_mtime_ns"] = stat.st_mtime_ns
+    h5f["pool_rows"].attrs["pool_size"] = stat.st_size
+
+def read_filename_index(file_path: str) -> tuple[NDArray[np.uint64], NDArray[int]]:
+    """
+    Reads sorted index of filenames from HDF5 file with pool or training data.
+    If the file has no index, it is computed from filenames.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool or training data.
+
+    Returns:
+        Tuple[NDArray[np.uint64], NDArray[int]]:
+            1D array of sorted filename hashes.
+            1D array of spectrum indexes, corresponding to hashes.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        if "filename_index_hashes" in h5f:
+            return h5f["filename_index_hashes"][:], h5f["filename_index_rows"][:]
+        
+        pool, rows = get_pool_group(h5f)
+        filenames = pool["filenames"].asstr()[:] if rows is None else read_rows(pool["filenames"].asstr(), rows)
+
+    hashes = get_filename_hashes(filenames)
+    rows = np.argsort(hashes, kind="stable")
+    return hashes[rows], rows
+
+def read_filename_hashes(file_path: str) -> NDArray[np.uint64]:
+    """
+    Reads filename hashes of all spectra in HDF5 file with pool or training data, using its index.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool or training data.
+
+    Returns:
+        NDArray[np.uint64]: 1D array of filename hashes in order of spectra.
+    """
+    sorted_hashes, rows = read_filename_index(file_path)
+    hashes = np.empty_like(sorted_hashes)
+    hashes[rows] = sorted_hashes
+    return hashes
+
+def get_unique_rows(sorted_hashes: NDArray[np.uint64], rows: NDArray[int], 
+                    read_filenames: Callable[[NDArray[int]], NDArray[str]]) -> NDArray[int]:
+    """
+    Gets spectrum indexes without duplicate filenames, the first spectrum of every filename is kept.
+    Spectra with the same filename hash are compared by their filenames, so hash collision 
+    of different filenames does not drop a spectrum.
+
+    Parameters:
+        sorted_hashes (NDArray[np.uint64]): 1D array of sorted filename hashes.
+        rows (NDArray[int]): 1D array of spectrum indexes, corresponding to hashes, sorted stably.
+        read_filenames (Callable[[NDArray[int]], NDArray[str]]): function reading filenames of spectrum indexes,
+            called only for spectra sharing their hash with another spectrum.
+
+    Returns:
+        NDArray[int]: 1D array of sorted spectrum indexes.
+    """
+    same = sorted_hashes[1:] == sorted_hashes[:-1]
+    first = np.ones(sorted_hashes.shape[0], dtype=bool)
+    first[1:] = ~same
+    if same.any():
+        shared = np.zeros(sorted_hashes.shape[0], dtype=bool)
+        shared[1:] |= same
+        shared[:-1] |= same
+        positions = np.flatnonzero(shared)
+        groups = np.cumsum(first)[positions]
+        filenames = np.asarray(read_filenames(rows[positions]), dtype=str)
+        order = np.lexsort((rows[positions], filenames, groups))
+        groups, filenames = groups[order], filenames[order]
+        first[positions[order]] = np.concatenate(([True], (groups[1:] != groups[:-1]) |
+                                                  (filenames[1:] != filenames[:-1])))
+
+    return np.sort(rows[first])
+
+def get_member_mask(hashes: NDArray[np.uint64], read_filenames: Callable[[NDArray[int]], NDArray[str]],
+                    filenames_ref: NDArray[str]) -> NDArray[bool]:
+    """
+    Finds spectra, whose filenames are among reference filenames. Spectra are matched by filename hashes 
+    and only filenames of matched spectra are read and compared, so hash collision does not match 
+    a different spectrum.
+
+    Parameters:
+        hashes (NDArray[np.uint64]): 1D array of filename hashes of spectra.
+        read_filenames (Callable[[NDArray[int]], NDArray[str]]): function reading filenames of spectrum indexes.
+        filenames_ref (NDArray[str]): 1D array of reference filenames.
+
+    Returns:
+        NDArray[bool]: 1D array, True for spectra with filename among reference filenames.
+    """
+    mask = np.isin(hashes, get_filename_hashes(filenames_ref))
+    if mask.any():
+        filenames = np.asarray(read_filenames(np.flatnonzero(mask)), dtype=str)
+        mask[mask] = np.isin(filenames, np.asarray(filenames_ref, dtype=str))
+    return mask
+
+def find_rows(file_path: str, filenames: NDArray[str]) -> NDArray[int]:
+    """
+    Finds spectrum indexes of filenames in HDF5 file with pool or training data by binary search in its index.
+    If more spectra in the file share the hash of searched filename, their filenames are read and compared.
+    Filename, whose hash matches only one spectrum, is not compared, see read_fluxes_by_filenames.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool or training data.
+        filenames (NDArray[str]): 1D array of searched filenames.
+
+    Returns:
+        NDArray[int]: 1D array of spectrum indexes, -1 for filenames, which were not found.
+    """
+    sorted_hashes, rows = read_filename_index(file_path)
+    hashes = get_filename_hashes(filenames)
+    if sorted_hashes.shape[0] == 0:
+        return np.full(hashes.shape[0], -1, dtype=int)
+
+    starts = np.searchsorted(sorted_hashes, hashes, side="left")
+    ends = np.searchsorted(sorted_hashes, hashes, side="right")
+    found = np.where(ends > starts, rows[np.minimum(starts, sorted_hashes.shape[0] - 1)], -1)
+    shared = np.flatnonzero(ends - starts > 1)
+    if shared.shape[0]:
+        positions = np.unique(np.concatenate([np.arange(starts[i], ends[i]) for i in shared]))
+        stored_filenames = read_pool_filenames(file_path, rows[positions])
+        # Rows of the same hash are sorted stably, so the first spectrum of duplicate filename is found.
+        stored_rows = {}
+        for filename, row in zip(stored_filenames[::-1], rows[positions][::-1]):
+            stored_rows[filename] = row
+        for i in shared:
+            found[i] = stored_rows.get(filenames[i], -1)
+
+    return found
+
+def read_fluxes_by_filenames(file_path: str, filenames: NDArray[str], dtype: DTypeLike | None = None
+                             ) -> NDArray[NDArray[float]]:
+    """
+    Reads fluxes of spectra with given filenames from HDF5 file with pool data, only found rows are read.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool data.
+        filenames (NDArray[str]): 1D array of spectra filenames.
+        dtype (DTypeLike | None): data type of loaded fluxes, if None, stored data type is kept.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of fluxes in order of filenames.
+    """
+    indexes = find_rows(file_path, filenames)
+    if np.any(indexes < 0):
+        raise ValueError(f"Spectra {filenames[indexes < 0][:5].tolist()} not found in '{file_path}'")
+
+    unique_indexes, inverse = np.unique(indexes, return_inverse=True)
+    found_filenames, fluxes = read_pool_subset(file_path, unique_indexes, dtype)
+    if not np.array_equal(found_filenames[inverse], filenames):
+        raise ValueError(f"Filename hashes collide in '{file_path}'")
+
+    return fluxes[inverse]
+
+def read_cached_pool(pool: h5py.Group, dtype: DTypeLike | None = None
+                     ) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
+    """
+    Reads the whole pool data through pool cache, they are read from disk only if the file 
+    is not cached or was changed.
+
+    Parameters:
+        pool (h5py.Group): group containing datasets filenames, wave, fluxes.
+        dtype (DTypeLike | None): data type of loaded wave and fluxes, if None, stored data type is kept.
+
+    Returns:
+        Tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
+            1D array of spectra filenames.
+            1D array of preprocessed spectra wave.
+            2D array with preprocessed fluxes
+    """
+    path = Path(pool.file.filename).resolve()
+    stat = path.stat()
+    key = (str(path), pool.name, stat.st_mtime_ns, stat.st_size, None if dtype is None else np.dtype(dtype).str)
+    arrays = pool_cache.get(key)
+    if arrays is None:
+        arrays = (pool["filenames"].asstr()[:], read_dataset(pool["wave"], dtype), read_dataset(pool["fluxes"], dtype))
+        pool_cache.put(key, arrays)
+
+    return arrays
+
+def read_pool_data(file_path: str, dtype: DTypeLike | None = None
                    ) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
     """
     Reads pool data from HDF5 file.
-    HDF5 file must contain following datasets: filenames, wave, fluxes.
+    HDF5 file must contain following datasets: filenames, wave, fluxes, or reference to rows of them 
+    in other file (datasets pool, pool_rows).
+
+    If pool cache is set and the file references the original pool, the whole original pool is read 
+    through the cache, so the cache holds only pools read by more jobs, see reference_pool. Cached arrays 
+    are read-only and returned without copy, if all rows are referenced in order, 
+    otherwise referenced rows are copied from them.
 
     Parameters:
         file_path (str): path to HDF5 file with pool data
+        dtype (DTypeLike | None): data type of loaded wave and fluxes, converted by HDF5 during reading.
+            If None, stored data type is kept.
     
     Returns:
         Tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
@@ -20,14 +364,171 @@ def read_pool_data(file_path: str
             2D array with preprocessed fluxes
     """
     with h5py.File(file_path, "r") as h5f:
-        filenames = h5f["filenames"].asstr()[:]
-        wave = h5f["wave"][:]
-        fluxes = h5f["fluxes"][:]
+        pool, rows = get_pool_group(h5f)
+        if pool_cache is not None and rows is not None:
+            filenames, wave, fluxes = read_cached_pool(pool, dtype)
+            if np.array_equal(rows, np.arange(filenames.shape[0])):
+                return filenames, wave, fluxes
+            return filenames[rows], wave, fluxes[rows]
+
+        wave = read_dataset(pool["wave"], dtype)
+        if rows is None:
+            filenames = pool["filenames"].asstr()[:]
+            fluxes = read_dataset(pool["fluxes"], dtype)
+        else:
+            filenames = read_rows(pool["filenames"].asstr(), rows)
+            fluxes = read_rows(pool["fluxes"], rows, dtype)
         
     return filenames, wave, fluxes
 
+def read_pool_subset(file_path: str, indexes: NDArray[int], dtype: DTypeLike | None = None
+                     ) -> tuple[NDArray[str], NDArray[NDArray[float]]]:
+    """
+    Reads only selected spectra of pool data from HDF5 file.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool data
+        indexes (NDArray[int]): 1D array of strictly increasing spectrum indexes.
+        dtype (DTypeLike | None): data type of loaded fluxes, if None, stored data type is kept.
+
+    Returns:
+        Tuple[NDArray[str], NDArray[NDArray[float]]]:
+            1D array of selected spectra filenames.
+            2D array with selected preprocessed fluxes.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        pool, rows = get_pool_group(h5f)
+        if rows is not None:
+            indexes = rows[indexes]
+        if indexes.shape[0] == 0:
+            return (np.array([], dtype=object), 
+                    read_dataset(pool["fluxes"], dtype, slice(0, 0)))
+        return pool["filenames"].asstr()[indexes], read_dataset(pool["fluxes"], dtype, indexes)
+
+def read_pool_filenames(file_path: str, indexes: NDArray[int]) -> NDArray[str]:
+    """
+    Reads only filenames of selected spectra of pool data from HDF5 file.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool data
+        indexes (NDArray[int]): 1D array of spectrum indexes in any order.
+
+    Returns:
+        NDArray[str]: 1D array of selected spectra filenames, in order of indexes.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        pool, rows = get_pool_group(h5f)
+        return read_rows(pool["filenames"].asstr(), indexes if rows is None else rows[indexes])
+
+def read_pool_wave(file_path: str, dtype: DTypeLike | None = None) -> NDArray[float]:
+    """
+    Reads only wave of pool data from HDF5 file.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool data
+        dtype (DTypeLike | None): data type of loaded wave, if None, stored data type is kept.
+
+    Returns:
+        NDArray[float]: 1D array of preprocessed spectra wave.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        pool, _ = get_pool_group(h5f)
+        return read_dataset(pool["wave"], dtype)
+
+def iter_pool_data(file_path: str, chunk_size: int, dtype: DTypeLike | None = None
+                   ) -> Iterator[tuple[NDArray[str], NDArray[NDArray[float]]]]:
+    """
+    Reads pool data from HDF5 file by chunks of spectra, only one chunk is held in memory.
+    HDF5 file must contain following datasets: filenames, fluxes, or reference to rows of them 
+    in other file (datasets pool, pool_rows).
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool data
+        chunk_size (int): number of spectra in one chunk.
+        dtype (DTypeLike | None): data type of loaded fluxes, converted by HDF5 during reading.
+            If None, stored data type is kept.
+
+    Yields:
+        Tuple[NDArray[str], NDArray[NDArray[float]]]:
+            1D array of spectra filenames in the chunk.
+            2D array with preprocessed fluxes in the chunk.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        pool, rows = get_pool_group(h5f)
+        filenames, fluxes = pool["filenames"].asstr(), pool["fluxes"]
+        if rows is None:
+            for start in range(0, pool["filenames"].shape[0], chunk_size):
+                selection = slice(start, start + chunk_size)
+                yield filenames[selection], read_dataset(fluxes, dtype, selection)
+        else:
+            for start in range(0, rows.shape[0], chunk_size):
+                chunk_rows = rows[start:start + chunk_size]
+                yield read_rows(filenames, chunk_rows), read_rows(fluxes, chunk_rows, dtype)
+
+def is_training_store(file_path: str) -> bool:
+    """
+    Checks whether the file is append-only training data store, which has iteration of every spectrum.
+
+    Parameters:
+        file_path (str): path to HDF5 file containing training data.
+
+    Returns:
+        bool: True if the file exists and contains dataset iteration.
+    """
+    if not file_path or not Path(file_path).is_file():
+        return False
+    with h5py.File(file_path, "r") as h5f:
+        return "iteration" in h5f
+
+def check_training_store(file_path: str, iteration: int) -> None:
+    """
+    Checks, that append-only training data store can be used by the iteration. 
+    If the store contains spectra of later iteration, ValueError is raised, because the iteration 
+    would remove them, while results of later iterations depend on them.
 
-def read_training_data(file_path: str
+    Parameters:
+        file_path (str): path to HDF5 store with training data.
+        iteration (int): iteration, which appends to the store.
+    """
+    if not is_training_store(file_path):
+        return
+    with h5py.File(file_path, "r") as h5f:
+        last_iteration = int(h5f["iteration"][-1]) if h5f["iteration"].shape[0] else None
+    if last_iteration is not None and last_iteration > iteration:
+        raise ValueError(f"Training data store {file_path} contains spectra of iteration {last_iteration}, "
+                         f"iteration {iteration} cannot be run again")
+
+def truncate_training_store(file_path: str, iteration: int) -> int:
+    """
+    Removes spectra added by the iteration or later from append-only training data store, 
+    so the iteration can be run again. Earlier iteration cannot be run again, see check_training_store.
+
+    Parameters:
+        file_path (str): path to HDF5 store with training data.
+        iteration (int): iteration, which appends to the store.
+
+    Returns:
+        int: number of spectra left in the store, 0 if the store does not exist.
+    """
+    check_training_store(file_path, iteration)
+    if not is_training_store(file_path):
+        return 0
+
+    with h5py.File(file_path, "a") as h5f:
+        rows = int(np.searchsorted(h5f["iteration"][:], iteration, side="left"))
+        if rows == h5f["iteration"].shape[0]:
+            return rows
+
+        for name in ("filenames", "fluxes", "labels", "iteration"):
+            h5f[name].resize(rows, axis=0)
+        sorted_hashes, index_rows = h5f["filename_index_hashes"][:], h5f["filename_index_rows"][:]
+        hashes = np.empty(rows, dtype=np.uint64)
+        hashes[index_rows[index_rows < rows]] = sorted_hashes[index_rows < rows]
+        write_filename_index(h5f, hashes)
+
+    return rows
+
+def read_training_data(file_path: str, dtype: DTypeLike | None = None, iteration: int | None = None
                        )-> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]], NDArray[int]]:
     """
     Reads training data from HDF5 file.
@@ -35,6 +536,10 @@ def read_training_data(file_path: str
 
     Parameters:
         file_path (str): path to HDF5 file containing training data
+        dtype (DTypeLike | None): data type of loaded wave and fluxes, converted by HDF5 during reading.
+            If None, stored data type is kept.
+        iteration (int | None): if the file is append-only store, only spectra added until this iteration 
+            are read. If None, all spectra are read.
     
     Returns:
         Tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]], NDArray[int]]:
@@ -44,13 +549,64 @@ def read_training_data(file_path: str
             1D array of spectrum labels, in integers.
     """
     with h5py.File(file_path, "r") as h5f:
-        filenames = h5f["filenames"].asstr()[:]
-        wave = h5f["wave"][:]
-        labels = h5f["labels"][:]
-        fluxes = h5f["fluxes"][:]
+        selection = slice(None)
+        if iteration is not None and "iteration" in h5f:
+            selection = slice(0, int(np.searchsorted(h5f["iteration"][:], iteration, side="right")))
+        filenames = h5f["filenames"].asstr()[selection]
+        wave = read_dataset(h5f["wave"], dtype)
+        labels = h5f["labels"][selection]
+        fluxes = read_dataset(h5f["fluxes"], dtype, selection)
     
     return filenames, wave, fluxes, labels
 
+def open_training_data(h5f: h5py.File, dtype: DTypeLike | None = None
+                       ) -> tuple[NDArray[str], NDArray[float], h5py.Dataset, NDArray[int]]:
+    """
+    Reads training data from opened HDF5 file, except fluxes, which are left in the file to be streamed.
+
+    Parameters:
+        h5f (h5py.File): opened HDF5 file containing training data.
+        dtype (DTypeLike | None): data type of loaded wave, if None, stored data type is kept.
+
+    Returns:
+        Tuple[NDArray[str], NDArray[float], h5py.Dataset, NDArray[int]]:
+            1D array of spectrum filenames.
+            1D array of preprocessed spectra wave.
+            2D dataset with preprocessed fluxes.
+            1D array of spectrum labels, in integers.
+    """
+    return h5f["filenames"].asstr()[:], read_dataset(h5f["wave"], dtype), h5f["fluxes"], h5f["labels"][:]
+
+def write_pool_data(h5f: h5py.File, config: ActiveLearningConfig, result: dict[str, Any]) -> None:
+    """
+    Writes pool spectra of the result to opened HDF5 file, if reference_pool is configured, 
+    only reference to them in the original pool file is written.
+
+    Parameters:
+        h5f (h5py.File): opened HDF5 file, where pool spectra will be written.
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        result (dict): contains the result of a job, has keys:
+            filenames (NDArray[str]): 1D array containing spectrum filenames.
+            filename_hashes (NDArray[np.uint64]): optional, 1D array containing hashes of spectrum filenames,
+                if reference_pool is configured, they replace filenames and fluxes.
+            wave (NDArray[float]): 1D array containing spectrum wave from the pool data.
+            fluxes (NDArray[NDArray[float]]): 2D array containing spectrum fluxes from the pool data.
+            pool_indexes (NDArray[int]): 1D array containing spectrum indexes in the pool data.
+    """
+    if "filename_hashes" in result:
+        write_filename_index(h5f, result["filename_hashes"])
+    else:
+        write_filename_index(h5f, get_filename_hashes(result["filenames"]))
+    if config.reference_pool:
+        write_pool_reference(h5f, config.pool_data_path, result["pool_indexes"])
+        return
+
+    h5f.create_dataset("filenames", data=result["filenames"].tolist(), dtype=h5py.string_dtype("utf-8"))
+    h5f.create_dataset("wave", data=result["wave"])
+    h5f.create_dataset("fluxes", data=result["fluxes"], 
+                       **get_flux_dataset_options(config.model_dump(), result["fluxes"].shape[1], 
+                                                  result["fluxes"].dtype, result["fluxes"].shape[0]))
+
 def write_active_learning_result(file_path: str, config: ActiveLearningConfig, 
                                  result: dict[str, Any]) -> None:
     """
@@ -63,6 +619,7 @@ def write_active_learning_result(file_path: str, config: ActiveLearningConfig,
             filenames (NDArray[str]): 1D array containing spectrum filenames.
             wave (NDArray[float]): 1D array containing spectrum wave from the pool data.
             fluxes (NDArray[NDArray[float]]): 2D array containing spectrum fluxes from the pool data.
+            pool_indexes (NDArray[int]): 1D array containing spectrum indexes in the pool data.
             labels_pred (NDArray[int]): 1D array containing labels with the most high probability.
             entropies (NDArray[float]): 1D array containing entropies to each spectrum.
             oracle_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected to query oracle.
@@ -71,44 +628,118 @@ def write_active_learning_result(file_path: str, config: ActiveLearningConfig,
             model: model that was trained.
     """
     with h5py.File(file_path, "w") as h5f:
-        h5f.create_dataset("filenames", data=result["filenames"].tolist(), dtype=h5py.string_dtype("utf-8"))
-        h5f.create_dataset("wave", data=result["wave"])
-        h5f.create_dataset("fluxes", data=result["fluxes"])
+        write_pool_data(h5f, config, result)
         h5f.create_dataset("labels", data=result["labels_pred"])
         h5f.create_dataset("entropies", data=result["entropies"])
-        h5f.create_dataset("oracle_indexes", data=result["oracle_indexes"])
-        h5f.create_dataset("perf_est_indexes", data=result["perf_est_indexes"])
+        write_active_learning_indexes(h5f, config, result)
+
+def write_active_learning_result_chunks(file_path: str, config: ActiveLearningConfig, wave: NDArray[float],
+                                        chunks: Iterable[dict[str, Any]]) -> int:
+    """
+    Writes scored pool spectra of active learning job's regular iteration to HDF5 file by chunks,
+    if reference_pool is configured, only reference to them in the original pool file is written.
+    Indexes must be written after by write_active_learning_indexes.
+
+    Parameters:
+        file_path (str): path to HDF5, where result will be written.
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        wave (NDArray[float]): 1D array containing spectrum wave from the pool data.
+        chunks (Iterable[dict[str, Any]]): parts of the result, every one has keys:
+            filenames (NDArray[str]): 1D array containing spectrum filenames.
+            fluxes (NDArray[NDArray[float]]): 2D array containing spectrum fluxes from the pool data.
+            pool_indexes (NDArray[int]): 1D array containing spectrum indexes in the pool data.
+            labels_pred (NDArray[int]): 1D array containing labels with the most high probability.
+            entropies (NDArray[float]): 1D array containing entropies to each spectrum.
+
+    Returns:
+        int: number of written spectra.
+    """
+    rows, pool_indexes, hashes = 0, [], []
+    datasets = (("labels", "labels_pred"), ("entropies", "entropies"))
+    if not config.reference_pool:
+        datasets = (("filenames", "filenames"), ("fluxes", "fluxes")) + datasets
+
+    with h5py.File(file_path, "w") as h5f:
+        if not config.reference_pool:
+            h5f.create_dataset("wave", data=wave)
+        for chunk in chunks:
+            if not rows and not config.reference_pool:
+                h5f.create_dataset("filenames", shape=(0,), maxshape=(None,), dtype=h5py.string_dtype("utf-8"),
+                                   chunks=True)
+                h5f.create_dataset("fluxes", shape=(0, wave.shape[0]), dtype=chunk["fluxes"].dtype,
+                                   **get_flux_dataset_options(config.model_dump(), wave.shape[0], 
+                                                              chunk["fluxes"].dtype))
+            if not rows:
+                h5f.create_dataset("labels", shape=(0,), maxshape=(None,), dtype=chunk["labels_pred"].dtype,
+                                   chunks=True)
+                h5f.create_dataset("entropies", shape=(0,), maxshape=(None,), dtype=chunk["entropies"].dtype,
+                                   chunks=True)
+
+            count = chunk["filenames"].shape[0]
+            for name, key in datasets:
+                h5f[name].resize(rows + count, axis=0)
+                h5f[name][rows:rows + count] = chunk[key]
+            pool_indexes.append(chunk["pool_indexes"])
+            hashes.append(get_filename_hashes(chunk["filenames"]))
+            rows += count
+
+        if rows:
+            write_filename_index(h5f, np.concatenate(hashes))
+        if config.reference_pool and rows:
+            write_pool_reference(h5f, config.pool_data_path, np.concatenate(pool_indexes))
+
+    return rows
+
+def write_active_learning_indexes(h5f: h5py.File, config: ActiveLearningConfig, result: dict[str, Any]) -> None:
+    """
+    Writes selected spectrum indexes of active learning job's regular iteration to opened HDF5 file, 
+    and saves model if it is configured.
 
-        if config.show_candidates:
-            h5f.create_dataset("candidate_indexes", data=result["candidate_indexes"])
-        if config.save_model:
-            result["model"].save(f"{config.result_dir_path}/model.keras")
+    Parameters:
+        h5f (h5py.File): opened HDF5 file with the result.
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        result (dict): contains the result of a job, has keys:
+            oracle_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected to query oracle.
+            perf_est_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected perfomance estimation of current job.
+            candidate_indexes (NDArray[int]): 1D array containing spectrum indexes, which were predicted as candidate.
+            model: model that was trained.
+    """
+    h5f.create_dataset("oracle_indexes", data=result["oracle_indexes"])
+    h5f.create_dataset("perf_est_indexes", data=result["perf_est_indexes"])
+
+    if config.show_candidates:
+        h5f.create_dataset("candidate_indexes", data=result["candidate_indexes"])
+    if config.save_model or config.warm_start:
+        result["model"].save(f"{config.result_dir_path}/model.keras")
 
-def write_active_learning_0_iter(file_path: str, result: dict[str, Any]) -> None:
+def write_active_learning_0_iter(file_path: str, config: ActiveLearningConfig, 
+                                 result: dict[str, Any]) -> None:
     """
     Writes the result of active learning job's zero iteration to HDF5 file.
 
     Parameters:
         file_path (str): path to HDF5, where result will be written.
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
         result (dict): contains the result of a job, has keys:
             filenames (NDArray[str]): 1D array containing spectrum filenames.
+            filename_hashes (NDArray[np.uint64]): optional, replaces filenames, see write_pool_data.
             wave (NDArray[float]): 1D array containing spectrum wave from the pool data.
             fluxes (NDArray[NDArray[float]]): 2D array containing spectrum fluxes from the pool data.
+            pool_indexes (NDArray[int]): 1D array containing spectrum indexes in the pool data.
             oracle_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected to query oracle.
     """
     with h5py.File(file_path, "w") as h5f:
-        h5f.create_dataset("filenames", data=result["filenames"].tolist(), dtype=h5py.string_dtype("utf-8"))
-        h5f.create_dataset("wave", data=result["wave"])
-        h5f.create_dataset("fluxes", data=result["fluxes"])
+        write_pool_data(h5f, config, result)
         h5f.create_dataset("oracle_indexes", data=result["oracle_indexes"])
 
-def write_training_data(file_path: str, filenames: NDArray[str], wave: NDArray[float], 
-                        fluxes: NDArray[NDArray[float]], labels: NDArray[int]) -> None:
+def write_training_data(file_path: str, config: ActiveLearningConfig, filenames: NDArray[str], 
+                        wave: NDArray[float], fluxes: NDArray[NDArray[float]], labels: NDArray[int]) -> None:
     """
     Writes the current job's training data 
 
     Parameters:
         file_path (str): path to HDF5, where training data will be written.
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
         filenames (NDArray[str]): 1D array containing spectrum filenames.
         wave (NDArray[float]): 1D numpy array containing spectrum wave from the training data.
         fluxes (NDArray[NDArray[float]]): 2D array containing spectrum fluxes from the training data.
@@ -117,5 +748,204 @@ def write_training_data(file_path: str, filenames: NDArray[str], wave: NDArray[f
     with h5py.File(file_path, "w") as h5f:
         h5f.create_dataset("filenames", data=filenames.tolist(), dtype=h5py.string_dtype("utf-8"))
         h5f.create_dataset("wave", data=wave)
-        h5f.create_dataset("fluxes", data=fluxes)
-        h5f.create_dataset("labels", data=labels)
\ No newline at end of file
+        h5f.create_dataset("fluxes", data=fluxes, 
+                           **get_flux_dataset_options(config.model_dump(), fluxes.shape[1], fluxes.dtype, 
+                                                      fluxes.shape[0]))
+        h5f.create_dataset("labels", data=labels)
+        write_filename_index(h5f, get_filename_hashes(filenames))
+
+def append_training_data(file_path: str, config: ActiveLearningConfig, filenames: NDArray[str], 
+                         wave: NDArray[float], fluxes: NDArray[NDArray[float]], labels: NDArray[int]) -> None:
+    """
+    Appends the current job's new training spectra to append-only store, creates it if it does not exist.
+
+    Spectra added by the current iteration are removed first, see truncate_training_store.
+    Then only spectra, whose filenames are not in the store yet, are appended with the current iteration number.
+
+    Parameters:
+        file_path (str): path to HDF5 store, where training data will be appended.
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        filenames (NDArray[str]): 1D array containing spectrum filenames.
+        wave (NDArray[float]): 1D numpy array containing spectrum wave from the training data.
+        fluxes (NDArray[NDArray[float]]): 2D array containing spectrum fluxes from the training data.
+        labels (NDArray[int]): 1D array containing labels, in integer.
+    """
+    rows = truncate_training_store(file_path, config.iteration)
+    datasets = ("filenames", "fluxes", "labels", "iteration")
+    with h5py.File(file_path, "a") as h5f:
+        if "iteration" not in h5f:
+            for name in list(h5f.keys()):
+                del h5f[name]
+            h5f.create_dataset("filenames", shape=(0,), maxshape=(None,), dtype=h5py.string_dtype("utf-8"),
+                               chunks=True)
+            h5f.create_dataset("wave", data=wave)
+            h5f.create_dataset("fluxes", shape=(0, wave.shape[0]), dtype=fluxes.dtype,
+                               **get_flux_dataset_options(config.model_dump(), wave.shape[0], fluxes.dtype))
+            h5f.create_dataset("labels", shape=(0,), maxshape=(None,), dtype=labels.dtype, chunks=True)
+            h5f.create_dataset("iteration", shape=(0,), maxshape=(None,), dtype=np.int64, chunks=True)
+            write_filename_index(h5f, np.array([], dtype=np.uint64))
+
+        sorted_hashes, index_rows = h5f["filename_index_hashes"][:], h5f["filename_index_rows"][:]
+        hashes = np.empty(rows, dtype=np.uint64)
+        hashes[index_rows] = sorted_hashes
+
+        # Hashes only preselect stored spectra, filenames decide, so hash collision does not skip a spectrum.
+        new_hashes = get_filename_hashes(filenames)
+        stored_filenames = read_rows(h5f["filenames"].asstr(), np.flatnonzero(np.isin(hashes, new_hashes)))
+        new = ~np.isin(np.asarray(filenames, dtype=str), np.asarray(stored_filenames, dtype=str))
+        count = int(np.count_nonzero(new))
+        data = {
+            "filenames": filenames[new].astype(object),
+            "fluxes": fluxes[new],
+            "labels": labels[new],
+            "iteration": np.full(count, config.iteration, dtype=np.int64),
+        }
+        for name in datasets:
+            h5f[name].resize(rows + count, axis=0)
+            h5f[name][rows:rows + count] = data[name]
+
+        write_filename_index(h5f, np.concatenate((hashes, new_hashes[new])))
+
+def write_score_cache(file_path: str, hashes: NDArray[np.uint64], labels_pred: NDArray[int], 
+                      entropies: NDArray[float], full_iteration: int) -> None:
+    """
+    Writes scores of pool spectra to HDF5 file, so next iteration can reuse them.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+        hashes (NDArray[np.uint64]): 1D array of filename hashes of scored spectra.
+        labels_pred (NDArray[int]): 1D array of predicted labels.
+        entropies (NDArray[float]): 1D array of entropies.
+        full_iteration (int): iteration, when all pool spectra were scored last time.
+    """
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("hashes", data=hashes)
+        h5f.create_dataset("labels_pred", data=labels_pred)
+        h5f.create_dataset("entropies", data=entropies)
+        h5f.attrs["full_iteration"] = full_iteration
+
+def read_score_cache(file_path: str) -> dict[str, Any] | None:
+    """
+    Reads scores of pool spectra from previous iteration, sorted by filename hashes.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+
+    Returns:
+        dict[str, Any] | None: hashes, labels_pred, entropies and full_iteration, 
+            None if the file does not exist.
+    """
+    if not file_path or not Path(file_path).is_file():
+        return None
+    with h5py.File(file_path, "r") as h5f:
+        hashes = h5f["hashes"][:]
+        rows = np.argsort(hashes)
+        return {
+            "hashes": hashes[rows],
+            "labels_pred": h5f["labels_pred"][:][rows],
+            "entropies": h5f["entropies"][:][rows],
+            "full_iteration": int(h5f.attrs["full_iteration"]),
+        }
+
+def write_prep_spectra_binary(dir_path: str, filenames: NDArray[str], wave: NDArray[float], 
+                              fluxes: NDArray[NDArray[float]], dtype: DTypeLike) -> None:
+    """
+    Writes spectra shown in the plot on the front-end to binary file prep_spectra.bin 
+    and its index prep_spectra_index.json.
+
+    Binary file contains little-endian float32 wave followed by fluxes of every spectrum in given precision.
+    Index contains data types, number of points, byte lengths of wave and spectrum 
+    and byte offset of every spectrum by its filename.
+
+    Parameters:
+        dir_path (str): path to directory, where files are written.
+        filenames (NDArray[str]): 1D array containing filenames of shown spectra.
+        wave (NDArray[float]): 1D array containing spectrum wave.
+        fluxes (NDArray[NDArray[float]]): 2D array containing fluxes of shown spectra.
+        dtype (DTypeLike): floating point precision of fluxes.
+    """
+    wave = np.asarray(wave, dtype="<f4")
+    flux_dtype = np.dtype(dtype).newbyteorder("<")
+    spectrum_bytes = wave.shape[0] * flux_dtype.itemsize
+    with open(f"{dir_path}/prep_spectra.bin", "wb") as f:
+        wave.tofile(f)
+        np.asarray(fluxes, dtype=flux_dtype).tofile(f)
+
+    index = {
+        "wave_dtype": "float32",
+        "flux_dtype": flux_dtype.name,
+        "byte_order": "little",
+        "points": wave.shape[0],
+        "wave_bytes": wave.nbytes,
+        "spectrum_bytes": spectrum_bytes,
+        "spectra": {str(filename): wave.nbytes + i * spectrum_bytes for i, filename in enumerate(filenames)},
+    }
+    with open(f"{dir_path}/prep_spectra_index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+def write_prep_spectra(config: ActiveLearningConfig, filenames: NDArray[str], wave: NDArray[float],
+                       fluxes: NDArray[NDArray[float]], indent: int | None = 4) -> None:
+    """
+    Writes spectra shown in the plot on the front-end as JSON, binary file with index or both,
+    see prep_spectra_format.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        filenames (NDArray[str]): 1D array containing filenames of shown spectra.
+        wave (NDArray[float]): 1D array containing spectrum wave.
+        fluxes (NDArray[NDArray[float]]): 2D array containing fluxes of shown spectra.
+        indent (int | None): indentation of JSON file, None means compact JSON.
+    """
+    if config.prep_spectra_format != "json":
+        write_prep_spectra_binary(config.result_dir_path, filenames, wave, fluxes, config.prep_spectra_dtype)
+    if config.prep_spectra_format == "binary":
+        return
+
+    spectra_fluxes = {}
+    for filename, flux in zip(filenames, fluxes):
+        spectra_fluxes[filename] = flux.tolist()
+    prep_spectra = {
+        "wave": wave.tolist(),
+        "spectra": spectra_fluxes
+    }
+
+    with open(f"{config.result_dir_path}/prep_spectra.json", 'w', encoding='utf-8') as f:
+        json.dump(prep_spectra, f, indent=indent)
+
+def write_dim_reduc_state(file_path: str, hashes: NDArray[np.uint64], embedding: NDArray[NDArray[float]],
+                          full_iteration: int, full_size: int) -> None:
+    """
+    Writes t-SNE embedding of training data to HDF5 file, so next iteration can place only new spectra.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+        hashes (NDArray[np.uint64]): 1D array of filename hashes of embedded spectra.
+        embedding (NDArray[NDArray[float]]): 2D array of embedded spectra.
+        full_iteration (int): iteration of the last full embedding.
+        full_size (int): number of spectra in the last full embedding.
+    """
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("hashes", data=hashes)
+        h5f.create_dataset("embedding", data=embedding)
+        h5f.attrs["full_iteration"] = full_iteration
+        h5f.attrs["full_size"] = full_size
+
+def read_dim_reduc_state(file_path: str) -> dict[str, Any] | None:
+    """
+    Reads t-SNE embedding of training data of previous iteration.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+
+    Returns:
+        dict[str, Any] | None: hashes, embedding, full_iteration and full_size, None if the file does not exist.
+    """
+    if not file_path or not Path(file_path).is_file():
+        return None
+    with h5py.File(file_path, "r") as h5f:
+        return {
+            "hashes": h5f["hashes"][:],
+            "embedding": h5f["embedding"][:],
+            "full_iteration": int(h5f.attrs["full_iteration"]),
+            "full_size": int(h5f.attrs["full_size"]),
+        }
@@ -1,10 +1,30 @@
 import sys
 import json
+from pathlib import Path
 
+# Modules shared by all jobs are in directory common next to directories of jobs.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+import cnn_model
 import zero_iteration
 import regular_iteration
+import worker
 from config import ActiveLearningConfig
 
+def load_config(config_path: str) -> ActiveLearningConfig:
+    """
+    Loads and validates config.
+
+    Parameters:
+        config_path (str): path to config file.
+
+    Returns:
+        ActiveLearningConfig: job's configuration.
+    """
+    with open(config_path) as f:
+        config_file = json.load(f)
+
+    return ActiveLearningConfig.model_validate(config_file)
+
 def main(config_path: str, result_dir_path: str) -> None:
     """
     Loads and validates config, then runs the iteration.
@@ -13,10 +33,7 @@ def main(config_path: str, result_dir_path: str) -> None:
         config_path (str): path to config file.
         result_dir_path (str): path to directory, where result will be saved.
     """
-    with open(config_path) as f:
-        config_file = json.load(f)
-
-    config = ActiveLearningConfig.model_validate(config_file)
+    config = load_config(config_path)
     config.result_dir_path = result_dir_path
 
     if config.iteration == 0:
@@ -25,9 +42,18 @@ def main(config_path: str, result_dir_path: str) -> None:
         regular_iteration.run(config)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        raise Exception("Enter only path to config and path to save results")
-    main(sys.argv[1], sys.argv[2])
+    if len(sys.argv) in (3, 4, 5) and sys.argv[1] == "--worker":
+        worker.run_worker(sys.argv[2], main, 
+                          int(sys.argv[3]) if len(sys.argv) >= 4 else worker.DEFAULT_CACHE_SIZE_MB,
+                          cpu_config=load_config(sys.argv[4]) if len(sys.argv) == 5 else None)
+    elif len(sys.argv) != 3:
+        raise Exception("Enter only path to config and path to save results, "
+                        "or --worker, path to queue directory, optionally pool cache size in MiB "
+                        "and path to config with CPU settings")
+    else:
+        # Thread pools of TensorFlow can be set only once, so CPU settings are applied before the job.
+        cnn_model.configure_cpu(load_config(sys.argv[1]))
+        main(sys.argv[1], sys.argv[2])
     
 
     
@@ -1,13 +1,49 @@
 import numpy as np
 import json
-from scipy.stats import entropy
-from sklearn.manifold import TSNE
+import h5py
+import heapq
+import shutil
+from contextlib import ExitStack
+from collections.abc import Callable, Iterator
 from numpy.typing import NDArray
+from pathlib import Path
 from typing import Any
 
 from config import ActiveLearningConfig
 import file_utils
 import cnn_model
+import embedding
+import tiles
+from metrics import Metrics
+
+WAVE_RTOL = 4 * np.finfo(np.float32).eps
+
+def is_same_wave(wave_a: NDArray[float], wave_b: NDArray[float]) -> bool:
+    """
+    Checks whether two waves are same, with relative tolerance safe for waves stored in float32.
+
+    Parameters:
+        wave_a (NDArray[float]): 1D array of spectrum wave.
+        wave_b (NDArray[float]): 1D array of spectrum wave.
+
+    Returns:
+        bool: True if waves have same shape and all points are equal within tolerance.
+    """
+    return wave_a.shape == wave_b.shape and np.allclose(wave_a, wave_b, rtol=WAVE_RTOL, atol=0)
+
+def get_entropies(label_list_pred: NDArray[NDArray[float]]) -> NDArray[float]:
+    """
+    Computes entropy of predicted probabilities of every spectrum.
+
+    Parameters:
+        label_list_pred (NDArray[NDArray[float]]): 2D array of predicted probabilities.
+
+    Returns:
+        NDArray[float]: 1D array of entropies.
+    """
+    from scipy.stats import entropy
+
+    return entropy(label_list_pred.T)
 
 def get_tr_data(config: ActiveLearningConfig
                 ) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]], NDArray[int]]:
@@ -17,9 +53,9 @@ def get_tr_data(config: ActiveLearningConfig
     If HDF5 file for training data is provided, reads data from file.
 
     If HDF5 file for additinoal training data is provided:
-        Reads from HDF5 file spectrum filenames, wave and fluxes.
+        Reads from HDF5 file spectrum wave.
         Reads spectrum filenames and labels from provided JSON file.
-        Finds corresponding fluxes using filenames from JSON file.
+        Reads only corresponding fluxes from HDF5 file, found by its filename index.
         Concatenates all training data.
     
     After loading all training data, removes duplicates spectra using filenames.
@@ -36,25 +72,25 @@ def get_tr_data(config: ActiveLearningConfig
     """
 
     if config.training_data_path:
-        filenames_tr, wave_tr, fluxes_tr, labels_tr = file_utils.read_training_data(config.training_data_path)
+        filenames_tr, wave_tr, fluxes_tr, labels_tr = file_utils.read_training_data(config.training_data_path, 
+                                                                                   config.precision, 
+                                                                                   config.iteration - 1)
     else:
-        filenames_tr, wave_tr, fluxes_tr, labels_tr = np.array([]), np.array([]) , np.array([]), np.array([], dtype=int)
+        filenames_tr, wave_tr, fluxes_tr, labels_tr = (np.array([]), np.array([], dtype=config.precision), 
+                                                       np.array([], dtype=config.precision), np.array([], dtype=int))
 
 
     if config.training_data_to_add_path:
-        filenames_to_add, wave_to_add, fluxes_to_add = file_utils.read_pool_data(config.training_data_to_add_path)
-        if filenames_tr.shape[0] and not np.array_equal(wave_tr, wave_to_add):
+        wave_to_add = file_utils.read_pool_wave(config.training_data_to_add_path, config.precision)
+        if filenames_tr.shape[0] and not is_same_wave(wave_tr, wave_to_add):
             raise ValueError("Different waves in 'training data' and 'label to add'")
         
         with open(config.oracle_data_to_add_path) as f:
             oracle_data = json.load(f)
 
-        filenames_oracle = np.array(oracle_data["filenames"])
-        mask = np.isin(filenames_to_add, filenames_oracle)
-        selected_filenames = filenames_to_add[mask]
-        selected_fluxes = fluxes_to_add[mask]
-        filename_fluxes = dict(zip(selected_filenames, selected_fluxes))
-        fluxes_oracle = np.array([filename_fluxes[f_oracle] for f_oracle in filenames_oracle])
+        filenames_oracle = np.array(oracle_data["filenames"], dtype=str)
+        fluxes_oracle = file_utils.read_fluxes_by_filenames(config.training_data_to_add_path, filenames_oracle, 
+                                                            config.precision)
 
         filenames_tr = np.concatenate((filenames_tr, filenames_oracle))
         # fluxes_tr = np.concatenate((fluxes_tr, fluxes_oracle))
@@ -65,8 +101,9 @@ def get_tr_data(config: ActiveLearningConfig
         else:
             fluxes_tr = np.concatenate((fluxes_tr, fluxes_oracle))
 
-    _, indexes = np.unique(filenames_tr, return_index=True)
-    indexes = np.sort(indexes)
+    hashes_tr = file_utils.get_filename_hashes(filenames_tr)
+    order = np.argsort(hashes_tr, kind="stable")
+    indexes = file_utils.get_unique_rows(hashes_tr[order], order, lambda rows: filenames_tr[rows])
     filenames_tr = filenames_tr[indexes]
     fluxes_tr = fluxes_tr[indexes]
     labels_tr = labels_tr[indexes]
@@ -74,26 +111,32 @@ def get_tr_data(config: ActiveLearningConfig
     return filenames_tr, wave_tr, fluxes_tr, labels_tr
 
 def get_pool_data(config: ActiveLearningConfig
-                  ) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
+                  ) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]], NDArray[int], NDArray[np.uint64]]:
     """
-    Reads pool data and removes duplicates spectra using filenames.
+    Reads pool data and removes duplicates spectra using filename index.
 
     Parameters:
         config (ActiveLearningConfig): job's configuration, loaded from configuration file.
 
     Returns:
-        Tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]:
+        Tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]], NDArray[int], NDArray[np.uint64]]:
             1D array of spectrum filenames.
             1D array of spectrum wave.
             2D array of spectrum fluxes.
+            1D array of spectrum indexes in the pool data.
+            1D array of spectrum filename hashes.
     """
-    filenames, wave, fluxes = file_utils.read_pool_data(config.pool_data_path)
-    _, indexes = np.unique(filenames, return_index=True)
-    indexes = np.sort(indexes)
-    filenames = filenames[indexes]
-    fluxes = fluxes[indexes]
-
-    return filenames, wave, fluxes
+    filenames, wave, fluxes = file_utils.read_pool_data(config.pool_data_path, config.precision)
+    sorted_hashes, rows = file_utils.read_filename_index(config.pool_data_path)
+    hashes = np.empty_like(sorted_hashes)
+    hashes[rows] = sorted_hashes
+    indexes = file_utils.get_unique_rows(sorted_hashes, rows, lambda pool_rows: filenames[pool_rows])
+    if indexes.shape[0] < filenames.shape[0]:
+        filenames = filenames[indexes]
+        fluxes = fluxes[indexes]
+        hashes = hashes[indexes]
+
+    return filenames, wave, fluxes, indexes, hashes
 
 def get_perf_est_list(config: ActiveLearningConfig) -> list[int]:
     """
@@ -116,6 +159,244 @@ def get_perf_est_list(config: ActiveLearningConfig) -> list[int]:
     
     return perf_est_list
 
+def get_candidate_classes_indexes(config: ActiveLearningConfig) -> NDArray[int]:
+    """
+    Gets indexes of candidate classes in the list of all classes.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+
+    Returns:
+        NDArray[int]: 1D array of candidate classes indexes.
+    """
+    mask = np.isin(np.array(config.classes), np.array(config.candidate_classes))
+    return np.where(mask)[0]
+
+def push_top_entropies(heap: list[tuple[float, int]], entropies: NDArray[float], start: int, size: int) -> None:
+    """
+    Keeps spectra with the highest entropies in min-heap of limited size.
+
+    Parameters:
+        heap (list[tuple[float, int]]): min-heap of entropies and spectrum indexes, updated in place.
+        entropies (NDArray[float]): 1D array containing entropies of next spectra.
+        start (int): spectrum index of the first entropy.
+        size (int): maximum size of the heap.
+    """
+    if size <= 0:
+        return
+    indexes = np.arange(entropies.shape[0])
+    if entropies.shape[0] > size:
+        indexes = np.argpartition(entropies, -size)[-size:]
+    if len(heap) == size:
+        indexes = indexes[entropies[indexes] > heap[0][0]]
+
+    for i in indexes:
+        item = (float(entropies[i]), start + int(i))
+        if len(heap) < size:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+def get_score_cache(config: ActiveLearningConfig) -> dict[str, Any] | None:
+    """
+    Reads scores of pool spectra from previous iteration for budgeted scoring and chooses spectra,
+    which are scored again.
+
+    Spectra predicted as candidates and then spectra with the highest entropies are chosen within 
+    the rescore budget, rescore_exploration of the budget is used for randomly chosen other spectra.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+
+    Returns:
+        dict[str, Any] | None: scores sorted by filename hashes with boolean mask rescore, see 
+            file_utils.read_score_cache. None if all spectra are scored, because budgeted scoring is off, 
+            scores are not saved or full_rescore_every iterations passed since the last full scoring.
+    """
+    if not config.budgeted_scoring:
+        return None
+    cache = file_utils.read_score_cache(config.score_cache_path)
+    if cache is None or config.iteration - cache["full_iteration"] >= config.full_rescore_every:
+        return None
+
+    count = cache["hashes"].shape[0]
+    budget = min(int(config.rescore_budget * count), count)
+    explored = int(budget * config.rescore_exploration)
+    is_candidate = np.isin(cache["labels_pred"], get_candidate_classes_indexes(config))
+    order = np.lexsort((-cache["entropies"], ~is_candidate))
+    rest = order[budget - explored:]
+
+    cache["rescore"] = np.zeros(count, dtype=bool)
+    cache["rescore"][order[:budget - explored]] = True
+    cache["rescore"][np.random.choice(rest, size=min(explored, rest.shape[0]), replace=False)] = True
+    return cache
+
+def score_spectra(predictor: Callable[[NDArray[float]], NDArray[NDArray[float]]], fluxes: NDArray[float], 
+                  hashes: NDArray[np.uint64], cache: dict[str, Any] | None) -> tuple[NDArray[int], NDArray[float]]:
+    """
+    Predicts labels and entropies of spectra. With score cache only spectra chosen for rescoring 
+    and spectra without saved scores are predicted, other spectra take saved scores.
+
+    Parameters:
+        predictor (Callable[[NDArray[float]], NDArray[NDArray[float]]]): function predicting probabilities.
+        fluxes (NDArray[float]): 2D array of fluxes.
+        hashes (NDArray[np.uint64]): 1D array of filename hashes.
+        cache (dict[str, Any] | None): scores of previous iteration, see get_score_cache, 
+            if None, all spectra are predicted.
+
+    Returns:
+        Tuple[NDArray[int], NDArray[float]]:
+            1D array of predicted labels.
+            1D array of entropies.
+    """
+    if cache is None:
+        label_list_pred = predictor(fluxes)
+        return np.argmax(label_list_pred, axis=1), get_entropies(label_list_pred)
+
+    positions = np.searchsorted(cache["hashes"], hashes)
+    found = positions < cache["hashes"].shape[0]
+    found[found] = cache["hashes"][positions[found]] == hashes[found]
+    scored = ~found
+    scored[found] = cache["rescore"][positions[found]]
+
+    labels_pred = np.empty(hashes.shape[0], dtype=int)
+    entropies = np.empty(hashes.shape[0])
+    labels_pred[~scored] = cache["labels_pred"][positions[~scored]]
+    entropies[~scored] = cache["entropies"][positions[~scored]]
+    if scored.any():
+        label_list_pred = predictor(fluxes[scored])
+        labels_pred[scored] = np.argmax(label_list_pred, axis=1)
+        entropies[scored] = get_entropies(label_list_pred)
+
+    return labels_pred, entropies
+
+def write_score_cache(config: ActiveLearningConfig, cache: dict[str, Any] | None, hashes: NDArray[np.uint64],
+                      labels_pred: NDArray[int], entropies: NDArray[float]) -> None:
+    """
+    Saves scores of pool spectra for next iteration, if budgeted scoring is configured.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        cache (dict[str, Any] | None): scores of previous iteration, None if all spectra were scored.
+        hashes (NDArray[np.uint64]): 1D array of filename hashes of scored spectra.
+        labels_pred (NDArray[int]): 1D array of predicted labels.
+        entropies (NDArray[float]): 1D array of entropies.
+    """
+    if config.budgeted_scoring:
+        full_iteration = config.iteration if cache is None else cache["full_iteration"]
+        file_utils.write_score_cache(f"{config.result_dir_path}/score_cache.h5", hashes, labels_pred, entropies,
+                                     full_iteration)
+
+def score_pool_chunks(config: ActiveLearningConfig, predictor: Callable[[NDArray[float]], NDArray[NDArray[float]]], 
+                      filenames_tr: NDArray[str], state: dict[str, Any], 
+                      cache: dict[str, Any] | None = None) -> Iterator[dict[str, Any]]:
+    """
+    Reads pool data by chunks, removes duplicates and training spectra, predicts labels and entropies 
+    of remaining spectra.
+
+    Duplicates and training spectra are found by filename index of the pool before reading, 
+    only filenames of spectra with matching hashes are read to confirm them. 
+    Only indexes of spectra with the highest entropies and candidate indexes are kept in the state,
+    scored chunks are yielded to be written.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        predictor (Callable[[NDArray[float]], NDArray[NDArray[float]]]): function predicting probabilities.
+        filenames_tr (NDArray[str]): 1D array of training spectrum filenames.
+        state (dict[str, Any]): updated in place, has keys:
+            rows (int): number of scored spectra.
+            pool_rows (int): number of read pool spectra.
+            oracle_heap (list[tuple[float, int]]): min-heap of the highest entropies and spectrum indexes.
+            candidate_indexes (list[NDArray[int]]): indexes of spectra predicted as candidate, by chunks.
+            scores (list[tuple]): filename hashes, labels and entropies by chunks, kept for budgeted scoring.
+        cache (dict[str, Any] | None): scores of previous iteration, see get_score_cache.
+
+    Yields:
+        dict[str, Any]: scored chunk, has keys filenames, fluxes, pool_indexes, labels_pred, entropies.
+    """
+    classes_indexes = get_candidate_classes_indexes(config)
+    sorted_hashes, rows = file_utils.read_filename_index(config.pool_data_path)
+    hashes = np.empty_like(sorted_hashes)
+    hashes[rows] = sorted_hashes
+
+    def read_filenames(indexes: NDArray[int]) -> NDArray[str]:
+        return file_utils.read_pool_filenames(config.pool_data_path, indexes)
+
+    keep = np.zeros(rows.shape[0], dtype=bool)
+    keep[file_utils.get_unique_rows(sorted_hashes, rows, read_filenames)] = True
+    keep[file_utils.get_member_mask(hashes, read_filenames, filenames_tr)] = False
+    del sorted_hashes, rows, hashes
+
+    for filenames, fluxes in file_utils.iter_pool_data(config.pool_data_path, config.pool_chunk_size, 
+                                                       config.precision):
+        mask = keep[state["pool_rows"]:state["pool_rows"] + filenames.shape[0]]
+        pool_indexes = state["pool_rows"] + np.where(mask)[0]
+        state["pool_rows"] += filenames.shape[0]
+        if not mask.any():
+            continue
+
+        filenames, fluxes = filenames[mask], fluxes[mask]
+        hashes = file_utils.get_filename_hashes(filenames)
+        labels_pred, entropies = score_spectra(predictor, fluxes, hashes, cache)
+        if config.budgeted_scoring:
+            state["scores"].append((hashes, labels_pred, entropies))
+
+        push_top_entropies(state["oracle_heap"], entropies, state["rows"], config.oracle_batch_size)
+        state["candidate_indexes"].append(state["rows"] + np.where(np.isin(labels_pred, classes_indexes))[0])
+        state["rows"] += filenames.shape[0]
+
+        yield {
+            "filenames": filenames,
+            "fluxes": fluxes,
+            "pool_indexes": pool_indexes,
+            "labels_pred": labels_pred,
+            "entropies": entropies,
+        }
+
+def write_result_by_chunks(config: ActiveLearningConfig, model: Any, 
+                           predictor: Callable[[NDArray[float]], NDArray[NDArray[float]]], 
+                           filenames_tr: NDArray[str], wave: NDArray[float]) -> int:
+    """
+    Scores pool data by chunks of pool_chunk_size spectra and writes the result, 
+    so peak memory does not depend on the pool size.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        model: trained model.
+        predictor (Callable[[NDArray[float]], NDArray[NDArray[float]]]): function predicting probabilities.
+        filenames_tr (NDArray[str]): 1D array of training spectrum filenames.
+        wave (NDArray[float]): 1D array of pool spectrum wave.
+
+    Returns:
+        int: number of scored spectra.
+    """
+    result_path = f"{config.result_dir_path}/result.h5"
+    state = {"rows": 0, "pool_rows": 0, "oracle_heap": [], "candidate_indexes": [np.array([], dtype=int)], 
+             "scores": []}
+    cache = get_score_cache(config)
+    chunks = score_pool_chunks(config, predictor, filenames_tr, state, cache)
+    if file_utils.write_active_learning_result_chunks(result_path, config, wave, chunks) == 0:
+        raise ValueError("All data from pool is in training data")
+    if state["scores"]:
+        write_score_cache(config, cache, *(np.concatenate(scores) for scores in zip(*state["scores"])))
+
+    candidate_indexes = np.concatenate(state["candidate_indexes"])
+    perf_est_batch = min(config.perf_est_batch_size, candidate_indexes.shape[0])
+    result = {
+        "oracle_indexes": np.array([i for _, i in sorted(state["oracle_heap"])], dtype=int),
+        "perf_est_indexes": np.random.choice(candidate_indexes, size=perf_est_batch, replace=False),
+        "candidate_indexes": candidate_indexes,
+        "model": model,
+    }
+
+    with h5py.File(result_path, "a") as h5f:
+        file_utils.write_active_learning_indexes(h5f, config, result)
+
+    plot_indexes = get_plot_indexes(config, result)
+    filenames, fluxes = file_utils.read_pool_subset(result_path, plot_indexes, config.precision)
+    file_utils.write_prep_spectra(config, filenames, wave, fluxes)
+    return state["rows"]
+
 def get_indexes(
         config: ActiveLearningConfig, labels_pred: NDArray[int], entropies: NDArray[float]
         ) -> tuple[NDArray[int], NDArray[int], NDArray[int]]:
@@ -133,10 +414,7 @@ def get_indexes(
             1D array containing spectrum indexes, which were selected performance estimation of current job.
             1D array containing spectrum indexes, which were predicted as candidate.
     """
-    classes_np = np.array(config.classes)
-    candidate_classes_np = np.array(config.candidate_classes)
-    mask = np.isin(classes_np, candidate_classes_np)
-    classes_indexes = np.where(mask)[0]
+    classes_indexes = get_candidate_classes_indexes(config)
     # classes_indexes = np.arange(config.classes.shape[0])[mask]
     mask = np.isin(labels_pred, classes_indexes)
     # candidate_indexes = np.arange(y_labels.shape[0])[mask]
@@ -161,36 +439,93 @@ def write_prep_data_plot(config: ActiveLearningConfig, result: dict[str, Any]) -
             perf_est_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected perfomance estimation of current job.
             candidate_indexes (NDArray[int]): 1D array containing spectrum indexes, which were predicted as candidate.
     """
-    unique_inds = np.unique(np.concatenate((
+    unique_inds = get_plot_indexes(config, result)
+    file_utils.write_prep_spectra(config, result["filenames"][unique_inds], result["wave"], 
+                                  result["fluxes"][unique_inds])
+
+def get_plot_indexes(config: ActiveLearningConfig, result: dict[str, Any]) -> NDArray[int]:
+    """
+    Gets sorted unique indexes of spectra shown in the plot on the front-end.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        result (dict[str, Any]): contains the result of a job, at least has keys:
+            oracle_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected to query oracle.
+            perf_est_indexes (NDArray[int]): 1D array containing spectrum indexes, which were selected perfomance estimation of current job.
+            candidate_indexes (NDArray[int]): 1D array containing spectrum indexes, which were predicted as candidate.
+
+    Returns:
+        NDArray[int]: 1D array of spectrum indexes.
+    """
+    return np.unique(np.concatenate((
                 result["oracle_indexes"], 
                 result["perf_est_indexes"], 
                 result["candidate_indexes"] if config.show_candidates else np.array([], dtype=int)
-            )))
-    
-    spectra_fluxes = {}
-    filenames, fluxes, wave = result["filenames"], result["fluxes"], result["wave"]
-    for i in unique_inds:
-        spectra_fluxes[filenames[i]] = fluxes[i].tolist()
-    prep_spectra = {
-        "wave": wave.tolist(),
-        "spectra": spectra_fluxes
-    }
+            ))).astype(int)
+
+def get_embedding(config: ActiveLearningConfig, filenames_tr: NDArray[str], 
+                  fluxes_tr: NDArray[float]) -> NDArray[NDArray[float]]:
+    """
+    Gets t-SNE embedding of training data.
+
+    In incremental mode, embedding of previous iteration is read and only new training spectra are placed 
+    into it. Full embedding is computed in the first iteration, every dim_reduc_full_every iterations, 
+    when spectra added since the last full embedding exceed dim_reduc_max_drift of its size, 
+    or when some embedded spectrum is no longer in training data. Embedding is saved for next iteration.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        filenames_tr (NDArray[str]): 1D array of filenames used for model training.
+        fluxes_tr (NDArray[float)): 2D array of fluxes used for model training.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of embedded fluxes.
+    """
+    from sklearn.manifold import TSNE
 
-    with open(f"{config.result_dir_path}/prep_spectra.json", 'w', encoding='utf-8') as f:
-        json.dump(prep_spectra, f, indent=4) 
+    if not config.dim_reduc_incremental:
+        return TSNE(random_state=42).fit_transform(fluxes_tr)
 
+    hashes = file_utils.get_filename_hashes(filenames_tr)
+    state = file_utils.read_dim_reduc_state(config.dim_reduc_state_path)
+    full = (state is None or config.iteration - state["full_iteration"] >= config.dim_reduc_full_every
+            or hashes.shape[0] - state["full_size"] > config.dim_reduc_max_drift * state["full_size"]
+            or not np.isin(state["hashes"], hashes).all())
 
-def write_dim_reduc_data(config: ActiveLearningConfig, fluxes_tr: NDArray[float], 
+    if full:
+        fluxes_embedded = TSNE(random_state=42).fit_transform(fluxes_tr)
+        full_iteration, full_size = config.iteration, hashes.shape[0]
+    else:
+        rows = np.argsort(state["hashes"])
+        positions = np.searchsorted(state["hashes"], hashes, sorter=rows).clip(max=rows.shape[0] - 1)
+        embedded_rows = rows[positions]
+        is_embedded = state["hashes"][embedded_rows] == hashes
+
+        fluxes_embedded = np.empty((hashes.shape[0], 2))
+        fluxes_embedded[is_embedded] = state["embedding"][embedded_rows[is_embedded]]
+        if not is_embedded.all():
+            fluxes_embedded[~is_embedded] = embedding.place_points(fluxes_tr[is_embedded], 
+                                                                   fluxes_embedded[is_embedded],
+                                                                   fluxes_tr[~is_embedded])
+        full_iteration, full_size = state["full_iteration"], state["full_size"]
+
+    file_utils.write_dim_reduc_state(f"{config.result_dir_path}/dim_reduc_state.h5", hashes, fluxes_embedded,
+                                     full_iteration, full_size)
+    return fluxes_embedded
+
+def write_dim_reduc_data(config: ActiveLearningConfig, filenames_tr: NDArray[str], fluxes_tr: NDArray[float], 
                          labels_tr: NDArray[int]) -> None:
     """
     Write the data for constructing scatter plot of training data after applying t-SNE on the front-end.
+    If dim_reduc_tiles is configured, multi-resolution tiles of the plot are also written.
 
     Parameters:
         config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        filenames_tr (NDArray[str]): 1D array of filenames used for model training.
         fluxes_tr (NDArray[float)): 2D array of fluxes used for model training.
         labels_tr (NDArray[int]): 1D array of labels.
     """
-    fluxes_embedded = TSNE(random_state=42).fit_transform(fluxes_tr)
+    fluxes_embedded = get_embedding(config, filenames_tr, fluxes_tr)
     data = {
         "x": fluxes_embedded[:, 0].tolist(),
         "y": fluxes_embedded[:, 1].tolist(),
@@ -201,6 +536,96 @@ def write_dim_reduc_data(config: ActiveLearningConfig, fluxes_tr: NDArray[float]
     with open(f"{config.result_dir_path}/dim_reduc.json", 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4)
 
+    if config.dim_reduc_tiles:
+        tiles.write_tiles(f"{config.result_dir_path}/dim_reduc_tiles", fluxes_embedded, labels_tr, config.classes)
+
+
+def move_training_store(config: ActiveLearningConfig) -> str:
+    """
+    Moves append-only training data store from result directory of previous iteration to result directory
+    of the current iteration, so the store is always in result directory of its last iteration and removing
+    result directories of earlier iterations does not remove it. The store is renamed, when both directories
+    are on the same file system, so it is not copied.
+
+    If the store was already moved by the current iteration, which is run again, it is kept. 
+    If it was moved by later iteration, or it contains spectra of later iteration, ValueError is raised,
+    because earlier iteration cannot be run again.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+
+    Returns:
+        str: path to the store in the result directory, the file does not exist, if the store is not created yet.
+    """
+    store_path = config.result_dir_path + "/training_data.h5"
+    if file_utils.is_training_store(config.training_data_path):
+        if Path(config.training_data_path).resolve() != Path(store_path).resolve():
+            shutil.move(config.training_data_path, store_path)
+    elif (config.training_data_path and not Path(config.training_data_path).is_file() 
+          and not file_utils.is_training_store(store_path)):
+        raise ValueError(f"Training data store '{config.training_data_path}' was moved by later iteration, "
+                         f"iteration {config.iteration} cannot be run again")
+
+    file_utils.check_training_store(store_path, config.iteration)
+    return store_path
+
+def update_training_store(config: ActiveLearningConfig, store_path: str) -> None:
+    """
+    Appends new training spectra of the iteration to append-only training data store.
+
+    Spectra of the current iteration are removed from the store first, so the iteration can be run again.
+    New spectra are labeled oracle spectra and, if the store is empty, spectra of provided training data file.
+    Oracle spectra already in the store are found by filename index of the store, and only fluxes of 
+    the rest are read, so reading is proportional to new spectra, not to the whole store.
+
+    Parameters:
+        config (ActiveLearningConfig): job's configuration, loaded from configuration file.
+        store_path (str): path to the store, see move_training_store.
+    """
+    rows = file_utils.truncate_training_store(store_path, config.iteration)
+    if rows == 0 and config.training_data_path and Path(config.training_data_path).is_file():
+        filenames, wave, fluxes, labels = file_utils.read_training_data(config.training_data_path, config.precision)
+    else:
+        filenames, wave, fluxes, labels = np.array([], dtype=str), None, None, np.array([], dtype=int)
+    if rows:
+        with h5py.File(store_path, "r") as h5f:
+            wave = h5f["wave"][:]
+
+    filenames_oracle, labels_oracle = np.array([], dtype=str), np.array([], dtype=int)
+    if config.training_data_to_add_path:
+        wave_to_add = file_utils.read_pool_wave(config.training_data_to_add_path, config.precision)
+        if wave is not None and not is_same_wave(wave, wave_to_add):
+            raise ValueError("Different waves in 'training data' and 'label to add'")
+        wave = wave_to_add
+
+        with open(config.oracle_data_to_add_path) as f:
+            oracle_data = json.load(f)
+        filenames_oracle = np.array(oracle_data["filenames"], dtype=str)
+        labels_oracle = np.array(oracle_data["labels"], dtype=int)
+        if rows:
+            stored_rows = file_utils.find_rows(store_path, filenames_oracle)
+            stored = stored_rows >= 0
+            stored[stored] = (file_utils.read_pool_filenames(store_path, stored_rows[stored]) 
+                              == filenames_oracle[stored])
+            filenames_oracle, labels_oracle = filenames_oracle[~stored], labels_oracle[~stored]
+
+    # Training data go first, so they win over oracle spectra of the same filename, like in get_tr_data.
+    count = filenames.shape[0]
+    filenames = np.concatenate((filenames, filenames_oracle)).astype(str)
+    labels = np.concatenate((labels, labels_oracle))
+    if filenames.shape[0] == 0:
+        return
+
+    hashes = file_utils.get_filename_hashes(filenames)
+    order = np.argsort(hashes, kind="stable")
+    indexes = file_utils.get_unique_rows(hashes[order], order, lambda rows: filenames[rows])
+    fluxes = fluxes[indexes[indexes < count]] if count else None
+    if indexes[-1] >= count:
+        fluxes_oracle = file_utils.read_fluxes_by_filenames(config.training_data_to_add_path, 
+                                                            filenames[indexes[indexes >= count]], config.precision)
+        fluxes = fluxes_oracle if fluxes is None else np.concatenate((fluxes, fluxes_oracle))
+
+    file_utils.append_training_data(store_path, config, filenames[indexes], wave, fluxes, labels[indexes])
 
 def create_new_config(config: ActiveLearningConfig) -> None:
     """
@@ -216,6 +641,12 @@ def create_new_config(config: ActiveLearningConfig) -> None:
     new_config["pool_data_path"] = config.result_dir_path + "/result.h5"
     new_config["perf_est_list_path"] = config.result_dir_path + "/perf_est_list.json"
     new_config["iteration"] = config.iteration + 1
+    if config.warm_start:
+        new_config["model_path"] = config.result_dir_path + "/model.keras"
+    if config.budgeted_scoring:
+        new_config["score_cache_path"] = config.result_dir_path + "/score_cache.h5"
+    if config.dim_reduc_incremental:
+        new_config["dim_reduc_state_path"] = config.result_dir_path + "/dim_reduc_state.h5"
     
     with open(f"{config.result_dir_path}/new_config.json", 'w', encoding='utf-8') as f:
         json.dump(new_config, f, indent=4)
@@ -224,55 +655,105 @@ def run(config: ActiveLearningConfig) -> None:
     """
     Runs regular iteration of active learning job.
     
-    1. Loads training and pool data.
+    1. Loads training and pool data, fluxes of append-only store are streamed, if tf.data pipeline is used.
     2. Trains model and predicts on it.
     3. Gets corresponding indexes.
     4. Saves results to file and creates severel files.
+    5. Saves timing and memory of stages to metrics.json.
 
     Parameters:
         config (ActiveLearningConfig): job's configuration, loaded from configuration file.
     """
-    perf_est_list = get_perf_est_list(config)
-    filenames_tr, wave_tr, fluxes_tr, labels_tr = get_tr_data(config)
-    filenames, wave, fluxes = get_pool_data(config)
-
-    if not np.array_equal(wave_tr, wave):
-        raise ValueError("Different waves for pool and training data")
-
-    mask = ~np.isin(filenames, filenames_tr)
-    filenames = filenames[mask]
-    fluxes = fluxes[mask]
-
-    if filenames.size == 0 or fluxes.size == 0:
-        raise ValueError("All data from pool is in training data")
+    metrics = Metrics(config.result_dir_path, config.profile_stage, config.profile_mode)
+    with ExitStack() as files:
+        perf_est_list = get_perf_est_list(config)
+        with metrics.stage("read_training_data") as stage:
+            if config.append_training_data:
+                store_path = move_training_store(config)
+                update_training_store(config, store_path)
+            if config.append_training_data and config.balancing != "smote" and cnn_model.uses_data_pipeline(config):
+                store = files.enter_context(h5py.File(store_path, "r"))
+                filenames_tr, wave_tr, fluxes_tr, labels_tr = file_utils.open_training_data(store, config.precision)
+            elif config.append_training_data:
+                filenames_tr, wave_tr, fluxes_tr, labels_tr = file_utils.read_training_data(store_path, config.precision)
+            else:
+                filenames_tr, wave_tr, fluxes_tr, labels_tr = get_tr_data(config)
+            stage["rows"] = filenames_tr.shape[0]
+        with metrics.stage("read_pool_data") as stage:
+            if config.pool_chunk_size > 0:
+                wave = file_utils.read_pool_wave(config.pool_data_path, config.precision)
+            else:
+                filenames, wave, fluxes, pool_indexes, hashes = get_pool_data(config)
+                stage["rows"] = filenames.shape[0]
+
+        if not is_same_wave(wave_tr, wave):
+            raise ValueError("Different waves for pool and training data")
+
+        if config.pool_chunk_size <= 0:
+            mask = ~file_utils.get_member_mask(hashes, lambda indexes: filenames[indexes], filenames_tr)
+            filenames = filenames[mask]
+            fluxes = fluxes[mask]
+            pool_indexes = pool_indexes[mask]
+            hashes = hashes[mask]
+
+            if filenames.size == 0 or fluxes.size == 0:
+                raise ValueError("All data from pool is in training data")
     
-    points, num_classes = wave.shape[0], len(config.classes)
-    fluxes_tr_bal, labels_tr_bal = cnn_model.balance(fluxes_tr, labels_tr)
-    model = cnn_model.get_model(points, num_classes)
-    cnn_model.train(model, fluxes_tr_bal, labels_tr_bal, points, num_classes, config)
-    label_list_pred = cnn_model.predict(model, fluxes, points, config)
-    labels_pred = np.argmax(label_list_pred, axis=1)
-    entropies = entropy(label_list_pred.T)
-
-    oracle_indexes, perf_est_indexes, candidate_indexes = get_indexes(config, labels_pred, entropies)
-
-    result = {
-        "filenames": filenames,
-        "wave": wave,
-        "fluxes": fluxes,
-        "labels_pred": labels_pred,
-        "entropies": entropies,
-        "oracle_indexes": oracle_indexes,
-        "perf_est_indexes": perf_est_indexes,
-        "candidate_indexes": candidate_indexes,
-        "model": model,
-    }
-
-    write_prep_data_plot(config, result)
-    file_utils.write_active_learning_result(f"{config.result_dir_path}/result.h5", config, result)
-    file_utils.write_training_data(f"{config.result_dir_path}/training_data.h5", 
-                                   filenames_tr, wave_tr, fluxes_tr, labels_tr)
-    write_dim_reduc_data(config, fluxes_tr, labels_tr)
-    with open(f"{config.result_dir_path}/perf_est_list.json", 'w', encoding='utf-8') as f:
-        json.dump(perf_est_list, f, indent=4)
-    create_new_config(config)
+        points, num_classes = wave.shape[0], len(config.classes)
+        with metrics.stage("balance", fluxes_tr.shape[0]):
+            if config.balancing == "smote":
+                fluxes_tr_bal, labels_tr_bal = cnn_model.balance(fluxes_tr, labels_tr)
+            else:
+                fluxes_tr_bal, labels_tr_bal = fluxes_tr, labels_tr
+        with metrics.stage("train", fluxes_tr_bal.shape[0]):
+            model, predictors = (cnn_model.load_model(config.model_path, points, num_classes) if config.warm_start 
+                                 else (None, {}))
+            warm_start = model is not None
+            if not warm_start:
+                model = cnn_model.get_model(points, num_classes)
+            cnn_model.train(model, fluxes_tr_bal, labels_tr_bal, points, num_classes, config, warm_start)
+        with metrics.stage("prepare_predictor"):
+            predictor = cnn_model.get_predictor(model, points, config, fluxes_tr, predictors)
+
+        if config.pool_chunk_size > 0:
+            with metrics.stage("predict_and_write_result") as stage:
+                stage["rows"] = write_result_by_chunks(config, model, predictor, filenames_tr, wave)
+        else:
+            with metrics.stage("predict", filenames.shape[0]):
+                cache = get_score_cache(config)
+                labels_pred, entropies = score_spectra(predictor, fluxes, hashes, cache)
+                write_score_cache(config, cache, hashes, labels_pred, entropies)
+
+            with metrics.stage("get_indexes", filenames.shape[0]):
+                oracle_indexes, perf_est_indexes, candidate_indexes = get_indexes(config, labels_pred, entropies)
+
+            result = {
+                "filenames": filenames,
+                "wave": wave,
+                "fluxes": fluxes,
+                "pool_indexes": pool_indexes,
+                "labels_pred": labels_pred,
+                "entropies": entropies,
+                "oracle_indexes": oracle_indexes,
+                "perf_est_indexes": perf_est_indexes,
+                "candidate_indexes": candidate_indexes,
+                "model": model,
+            }
+
+            with metrics.stage("write_result", filenames.shape[0]):
+                write_prep_data_plot(config, result)
+                file_utils.write_active_learning_result(f"{config.result_dir_path}/result.h5", config, result)
+        if config.save_model or config.warm_start:
+            cnn_model.cache_model(f"{config.result_dir_path}/model.keras", model, predictors)
+        if not config.append_training_data:
+            with metrics.stage("write_training_data", filenames_tr.shape[0]):
+                file_utils.write_training_data(f"{config.result_dir_path}/training_data.h5", config,
+                                               filenames_tr, wave_tr, fluxes_tr, labels_tr)
+        with metrics.stage("dim_reduc", filenames_tr.shape[0]):
+            if isinstance(fluxes_tr, h5py.Dataset):
+                fluxes_tr = file_utils.read_dataset(fluxes_tr, config.precision)
+            write_dim_reduc_data(config, filenames_tr, fluxes_tr, labels_tr)
+        with open(f"{config.result_dir_path}/perf_est_list.json", 'w', encoding='utf-8') as f:
+            json.dump(perf_est_list, f, indent=4)
+        create_new_config(config)
+        metrics.write()
@@ -0,0 +1,144 @@
+import json
+import os
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from pathlib import Path
+
+import cnn_model
+import file_utils
+from config import ActiveLearningConfig
+
+QUEUE_DIRS = ("pending", "running", "done")
+DEFAULT_CACHE_SIZE_MB = 1024
+MODEL_CACHE_SIZE = 2
+POLL_INTERVAL = 0.5
+
+def submit_job(queue_dir: str, config_path: str, result_dir_path: str) -> Path:
+    """
+    Adds job to directory queue of the worker. 
+    The job file is written under temporary name and renamed, so the worker never reads incomplete job.
+
+    Parameters:
+        queue_dir (str): path to queue directory of the worker.
+        config_path (str): path to config file.
+        result_dir_path (str): path to directory, where result will be saved.
+
+    Returns:
+        Path: path to file, where the worker writes status of the job, after it is finished.
+    """
+    for name in QUEUE_DIRS:
+        Path(queue_dir, name).mkdir(parents=True, exist_ok=True)
+
+    job_name = f"{time.time_ns()}-{os.getpid()}.json"
+    tmp_path = Path(queue_dir, "pending", f".{job_name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"config_path": str(Path(config_path).resolve()), 
+                   "result_dir_path": str(Path(result_dir_path).resolve())}, f)
+    tmp_path.rename(Path(queue_dir, "pending", job_name))
+
+    return Path(queue_dir, "done", job_name)
+
+def claim_job(queue_dir: str) -> Path | None:
+    """
+    Takes the oldest pending job by moving it to running jobs, so other workers skip it.
+
+    Parameters:
+        queue_dir (str): path to queue directory of the worker.
+
+    Returns:
+        Path | None: path to claimed job file, None if there is no pending job.
+    """
+    for job_path in sorted(Path(queue_dir, "pending").glob("*.json")):
+        running_path = Path(queue_dir, "running", job_path.name)
+        try:
+            job_path.rename(running_path)
+        except FileNotFoundError:
+            continue
+        return running_path
+
+    return None
+
+def run_job(job_path: Path, queue_dir: str, main: Callable[[str, str], None]) -> None:
+    """
+    Runs claimed job and writes its status to done jobs. Errors of the job are written to status, 
+    so the worker continues with next job.
+
+    Parameters:
+        job_path (Path): path to claimed job file.
+        queue_dir (str): path to queue directory of the worker.
+        main (Callable[[str, str], None]): function running the job with config path and result directory.
+    """
+    with open(job_path) as f:
+        job = json.load(f)
+
+    start = time.perf_counter()
+    status = {**job, "status": "ok"}
+    try:
+        main(job["config_path"], job["result_dir_path"])
+    except Exception:
+        status.update({"status": "error", "error": traceback.format_exc()})
+    status["duration"] = time.perf_counter() - start
+
+    done_path = Path(queue_dir, "done", job_path.name)
+    tmp_path = done_path.with_name(f".{job_path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, indent=4)
+    tmp_path.rename(done_path)
+    job_path.unlink()
+
+def clear_session() -> None:
+    """
+    Clears global state of Keras left by the finished job, so models and graphs of previous jobs 
+    do not accumulate in long-lived worker. Models in model cache stay usable.
+    TensorFlow is not imported, if no job has used it yet.
+    """
+    tf = sys.modules.get("tensorflow")
+    if tf is not None:
+        tf.keras.backend.clear_session()
+
+def run_worker(queue_dir: str, main: Callable[[str, str], None], 
+               cache_size_mb: int = DEFAULT_CACHE_SIZE_MB, max_jobs: int | None = None,
+               cpu_config: ActiveLearningConfig | None = None) -> None:
+    """
+    Runs long-lived worker, which takes jobs from directory queue one by one.
+
+    Imported frameworks stay loaded between jobs and original pool data are kept in memory limited cache,
+    so every job after the first one skips their loading, see file_utils.read_pool_data. 
+    Last saved models are kept with their compiled prediction functions, so the job warm-starting from 
+    the model of previous job does not load and compile it again, see cnn_model.ModelCache. 
+    Jobs are run by the same function as from command line, so their results are same. 
+    Keras session is cleared after every job.
+
+    CPU settings can be applied only once per process, so they are applied before the first job, 
+    settings of jobs are ignored.
+
+    Queue directory contains directories:
+        pending: jobs to run, JSON files with keys config_path and result_dir_path, see submit_job.
+        running: jobs being run.
+        done: status of finished jobs, JSON files with keys status, duration and error, if job failed.
+
+    Parameters:
+        queue_dir (str): path to queue directory.
+        main (Callable[[str, str], None]): function running the job with config path and result directory.
+        cache_size_mb (int): memory limit of pool cache in MiB, 0 disables the cache.
+        max_jobs (int | None): number of jobs, after which worker stops, if None, worker runs until interrupted.
+        cpu_config (ActiveLearningConfig | None): configuration with CPU settings, see cnn_model.configure_cpu.
+    """
+    for name in QUEUE_DIRS:
+        Path(queue_dir, name).mkdir(parents=True, exist_ok=True)
+    if cpu_config is not None:
+        cnn_model.configure_cpu(cpu_config)
+    file_utils.pool_cache = file_utils.PoolCache(cache_size_mb * 2**20) if cache_size_mb > 0 else None
+    cnn_model.model_cache = cnn_model.ModelCache(MODEL_CACHE_SIZE)
+
+    jobs = 0
+    while max_jobs is None or jobs < max_jobs:
+        job_path = claim_job(queue_dir)
+        if job_path is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        run_job(job_path, queue_dir, main)
+        clear_session()
+        jobs += 1
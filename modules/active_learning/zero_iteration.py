@@ -3,6 +3,7 @@ import json
 
 from config import ActiveLearningConfig
 import file_utils
+from metrics import Metrics
 
 def create_new_config(config: ActiveLearningConfig) -> None:
     """
@@ -25,34 +26,38 @@ def run(config: ActiveLearningConfig) -> None:
     """
     Runs zero iteration of active learning job.
     
-    1. Loads pool data.
+    1. Loads pool data, if reference_pool is configured, only wave, filename index and oracle spectra
+       are loaded.
     2. Gets oracle indexes.
     3. Saves results to file and creates severel files.
+    4. Saves timing and memory of stages to metrics.json.
 
     Parameters:
         config (ActiveLearningConfig): job's configuration, loaded from configuration file.
     """
-    
-    filenames, wave, fluxes = file_utils.read_pool_data(config.pool_data_path)
+    metrics = Metrics(config.result_dir_path, config.profile_stage, config.profile_mode)
     oracle_indexes = np.arange(config.oracle_batch_size)
-
-    spectra_fluxes = {}
-    for i in oracle_indexes:
-        spectra_fluxes[filenames[i]] = fluxes[i].tolist()
-    prep_spectra = {
-        "wave": wave.tolist(),
-        "spectra": spectra_fluxes
-    }
-
-    result = {
-        "filenames": filenames,
-        "wave": wave,
-        "fluxes": fluxes,
-        "oracle_indexes": oracle_indexes
-    }
-
-    file_utils.write_active_learning_0_iter(config.result_dir_path+"/result.h5", result)
-    with open(f"{config.result_dir_path}/prep_spectra.json", 'w', encoding='utf-8') as f:
-        json.dump(prep_spectra, f)
-
-    create_new_config(config)
\ No newline at end of file
+    with metrics.stage("read_pool_data") as stage:
+        if config.reference_pool:
+            wave = file_utils.read_pool_wave(config.pool_data_path, config.precision)
+            hashes = file_utils.read_filename_hashes(config.pool_data_path)
+            filenames_oracle, fluxes_oracle = file_utils.read_pool_subset(config.pool_data_path, oracle_indexes,
+                                                                          config.precision)
+            result = {"filename_hashes": hashes, "wave": wave}
+            count = hashes.shape[0]
+        else:
+            filenames, wave, fluxes = file_utils.read_pool_data(config.pool_data_path, config.precision)
+            filenames_oracle, fluxes_oracle = filenames[oracle_indexes], fluxes[oracle_indexes]
+            result = {"filenames": filenames, "wave": wave, "fluxes": fluxes}
+            count = filenames.shape[0]
+        stage["rows"] = count
+    result["pool_indexes"] = np.arange(count)
+    result["oracle_indexes"] = oracle_indexes
+
+    with metrics.stage("write_result", count):
+        file_utils.write_active_learning_0_iter(config.result_dir_path+"/result.h5", config, result)
+    with metrics.stage("write_prep_spectra", oracle_indexes.shape[0]):
+        file_utils.write_prep_spectra(config, filenames_oracle, wave, fluxes_oracle, indent=None)
+
+    create_new_config(config)
+    metrics.write()
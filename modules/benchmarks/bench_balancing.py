@@ -0,0 +1,57 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "active_learning"))
+import cnn_model
+import synthetic_data
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares SMOTE oversampling with on-the-fly balancing modes "
+                                                 "in time and peak memory of one training epoch input.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[20000, 500, 300])
+    parser.add_argument("--points", type=int, default=600)
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    labels = np.repeat(np.arange(len(args.counts)), args.counts)
+    fluxes = synthetic_data.make_preprocessed_fluxes(args.points, labels, np.random.default_rng(42))
+    num_classes = len(args.counts)
+    steps = cnn_model.get_balanced_steps(labels, args.batch_size)
+
+    def smote() -> int:
+        fluxes_bal, labels_bal = cnn_model.balance(fluxes, labels)
+        indexes = np.random.permutation(labels_bal.shape[0])
+        for start in range(0, indexes.shape[0], args.batch_size):
+            np.asarray(fluxes_bal[indexes[start:start + args.batch_size]], dtype=np.float32)
+        return labels_bal.shape[0]
+
+    def class_weight() -> int:
+        cnn_model.get_class_weights(labels, num_classes)
+        indexes = np.random.permutation(labels.shape[0])
+        for start in range(0, indexes.shape[0], args.batch_size):
+            np.asarray(fluxes[np.sort(indexes[start:start + args.batch_size])], dtype=np.float32)
+        return labels.shape[0]
+
+    def sampler(synthesize: bool) -> int:
+        batches = cnn_model.iter_balanced_batches(fluxes, labels, args.batch_size, steps, synthesize,
+                                                  np.random.default_rng())
+        return sum(batch_labels.shape[0] for _, batch_labels in batches)
+
+    modes = (("smote", smote), ("class_weight", class_weight), ("sampler", lambda: sampler(False)),
+             ("batch_smote", lambda: sampler(True)))
+    for name, fn in modes:
+        tracemalloc.start()
+        start = time.perf_counter()
+        samples = fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>12}: {elapsed:8.3f} s, peak {peak / 2 ** 20:9.1f} MiB, {samples} spectra/epoch")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import json
+import multiprocessing
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import synthetic_data
+
+DIM_REDUC_DIR = Path(__file__).resolve().parent.parent / "dim_reduc"
+
+SCRIPT = """
+import resource, sys, time
+sys.path.insert(0, {module_dir!r})
+import job_dim_reduc
+start = time.perf_counter()
+job_dim_reduc.main({config_path!r}, {result_dir!r})
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures runtime and peak memory of scalable dim_reduc job.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--points", type=int, default=600)
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--max-samples", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--pca-components", type=int, default=50)
+    parser.add_argument("--method", default="barnes_hut")
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    # Classes have decreasing shares.
+    shares = np.linspace(args.classes, 1, args.classes).tolist()
+    print(f"{'spectra':>10} {'embedded':>10} {'runtime':>10} {'peak RSS':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path, config_path = f"{tmp_dir}/data.h5", f"{tmp_dir}/config.json"
+            # Data are generated in another process, so peak memory of the benchmark process 
+            # does not leak into peak memory of the job process.
+            generator = multiprocessing.get_context("spawn").Process(
+                target=synthetic_data.write_spectra_file, args=(data_path, size, args.points, shares), 
+                kwargs={"with_labels": True, "dtype": np.float32})
+            generator.start()
+            generator.join()
+            with open(config_path, "w") as f:
+                json.dump({
+                    "data_path": data_path, "classes": [str(i) for i in range(args.classes)],
+                    "max_samples": args.max_samples, "chunk_size": args.chunk_size, 
+                    "pca_components": args.pca_components, "method": args.method, "n_jobs": args.n_jobs,
+                    "plot": "density",
+                }, f)
+
+            script = SCRIPT.format(module_dir=str(DIM_REDUC_DIR), config_path=config_path, result_dir=tmp_dir)
+            output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, 
+                                    check=True).stdout.split()
+            with open(f"{tmp_dir}/dim_reduc.json") as f:
+                embedded = len(json.load(f)["x"])
+
+        print(f"{size:>10} {embedded:>10} {float(output[-2]):9.1f}s {int(output[-1]) / 2 ** 10:9.0f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "active_learning"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from hdf5_layout import get_flux_dataset_options
+from config import ActiveLearningConfig
+import synthetic_data
+
+SETTINGS = {
+    "contiguous": {},
+    "chunked": {"hdf5_chunk_rows": 128},
+    "lzf": {"hdf5_compression": "lzf"},
+    "lzf+shuffle": {"hdf5_compression": "lzf", "hdf5_shuffle": True},
+    "gzip1+shuffle": {"hdf5_compression": "gzip", "hdf5_compression_level": 1, "hdf5_shuffle": True},
+    "gzip4+shuffle": {"hdf5_compression": "gzip", "hdf5_compression_level": 4, "hdf5_shuffle": True},
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares file size and read throughput of HDF5 flux layouts.")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--points", type=int, default=600)
+    parser.add_argument("--batch-size-predict", type=int, default=2**14)
+    parser.add_argument("--shares", type=float, nargs="+", default=[0.9, 0.06, 0.04])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    labels = synthetic_data.make_labels(args.count, args.shares, rng)
+    fluxes = synthetic_data.make_preprocessed_fluxes(args.points, labels, rng)
+    raw_mb = fluxes.nbytes / 2**20
+    print(f"{'setting':>14} {'chunks':>12} {'size MB':>9} {'ratio':>6} {'write MB/s':>11} "
+          f"{'read MB/s':>10} {'batch read MB/s':>16}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, setting in SETTINGS.items():
+            config = ActiveLearningConfig.model_validate({
+                "iteration": 1, "classes": [], "candidate_classes": [], "pool_data_path": "",
+                "batch_size_predict": args.batch_size_predict, **setting
+            })
+            file_path = f"{tmp_dir}/{name}.h5"
+
+            start = time.perf_counter()
+            with h5py.File(file_path, "w") as h5f:
+                dataset = h5f.create_dataset("fluxes", data=fluxes, 
+                                             **get_flux_dataset_options(config.model_dump(), fluxes.shape[1],
+                                                                        fluxes.dtype, fluxes.shape[0]))
+                chunks = dataset.chunks
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with h5py.File(file_path, "r") as h5f:
+                h5f["fluxes"][:]
+            read_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with h5py.File(file_path, "r") as h5f:
+                dataset = h5f["fluxes"]
+                for batch_start in range(0, dataset.shape[0], args.batch_size_predict):
+                    dataset[batch_start:batch_start + args.batch_size_predict]
+            batch_read_time = time.perf_counter() - start
+
+            size_mb = os.path.getsize(file_path) / 2**20
+            print(f"{name:>14} {str(chunks[0] if chunks else '-'):>12} {size_mb:9.1f} {raw_mb / size_mb:6.2f} "
+                  f"{raw_mb / write_time:11.0f} {raw_mb / read_time:10.0f} {raw_mb / batch_read_time:16.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "active_learning"))
+import cnn_model
+from config import ActiveLearningConfig
+
+BACKENDS = {
+    "keras": {"inference_backend": "keras"},
+    "xla": {"inference_backend": "xla"},
+    "tflite": {"inference_backend": "tflite"},
+    "tflite-int8": {"inference_backend": "tflite", "inference_quantize": True},
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares throughput of inference backends on CPU.")
+    parser.add_argument("--count", type=int, default=8192)
+    parser.add_argument("--points", type=int, default=600)
+    parser.add_argument("--classes", type=int, default=3)
+    parser.add_argument("--batch-size-predict", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    fluxes = rng.uniform(-1, 1, (args.count, args.points))
+    model = cnn_model.get_model(args.points, args.classes)
+    reference = None
+
+    print(f"{'backend':>12} {'spectra/s':>12} {'max drift':>10} {'setup':>8}")
+    for name, setting in BACKENDS.items():
+        config = ActiveLearningConfig.model_validate({
+            "iteration": 1, "classes": [], "candidate_classes": [], "pool_data_path": "",
+            "batch_size_predict": args.batch_size_predict, "inference_max_drift": np.inf, **setting
+        })
+        start = time.perf_counter()
+        predictor = cnn_model.get_predictor(model, args.points, config, fluxes)
+        predictor(fluxes[:args.batch_size_predict])
+        setup = time.perf_counter() - start
+
+        best, probabilities = np.inf, None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            probabilities = predictor(fluxes)
+            best = min(best, time.perf_counter() - start)
+        if reference is None:
+            reference = probabilities
+        drift = np.max(np.abs(probabilities - reference))
+        print(f"{name:>12} {args.count / best:12.0f} {drift:10.2e} {setup:7.2f}s")
+
+if __name__ == "__main__":
+    main()
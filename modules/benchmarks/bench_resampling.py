@@ -0,0 +1,54 @@
+import argparse
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "preprocessing"))
+import resampling
+import synthetic_data
+
+def measure_time(fn: Callable[[], Any]) -> float:
+    """
+    Measures wall time of one call of the function.
+
+    Parameters:
+        fn (Callable[[], Any]): measured function.
+
+    Returns:
+        float: wall time in seconds.
+    """
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares np.interp loop with batched resampling engine.")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--grids", type=int, default=3)
+    parser.add_argument("--native-points", type=int, default=synthetic_data.LAMOST_POINTS)
+    parser.add_argument("--points", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    waves, fluxes = synthetic_data.make_source_spectra(args.count, args.grids, args.native_points)
+    new_wave = np.linspace(synthetic_data.PREP_START, synthetic_data.PREP_END, args.points)
+
+    def loop() -> np.ndarray:
+        return np.array([np.interp(new_wave, w, f) for w, f in zip(waves, fluxes)])
+
+    def batched() -> np.ndarray:
+        return resampling.resample(new_wave, zip(waves, fluxes))
+
+    if not np.array_equal(loop(), batched()):
+        raise ValueError("Batched resampling differs from np.interp")
+
+    for name, fn in (("np.interp loop", loop), ("batched", batched)):
+        best = min(measure_time(fn) for _ in range(args.repeat))
+        print(f"{name:>16}: {args.count / best:12.0f} spectra/s ({best:.3f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+MODULES_DIR = Path(__file__).resolve().parent.parent
+
+# Entry point: (module directory, entry module, modules imported lazily by the code path).
+ENTRY_POINTS = {
+    "preprocessing": ("preprocessing", "job_preprocessing", ["astropy.io.fits", "sklearn.preprocessing"]),
+    "al_iteration_0": ("active_learning", "job_active_learning", []),
+    "al_regular": ("active_learning", "job_active_learning", 
+                   ["tensorflow.keras", "imblearn.over_sampling", "scipy.stats", "sklearn.manifold"]),
+    "dim_reduc": ("dim_reduc", "job_dim_reduc", ["sklearn.manifold"]),
+    "dim_reduc_plot": ("dim_reduc", "job_dim_reduc", ["sklearn.manifold", "matplotlib.pyplot"]),
+}
+
+SCRIPT = """
+import sys, time
+sys.path.insert(0, {module_dir!r})
+start = time.perf_counter()
+import {entry}
+entry = time.perf_counter() - start
+for name in {lazy!r}:
+    __import__(name)
+print(entry, time.perf_counter() - start)
+"""
+
+def measure(module_dir: str, entry: str, lazy: list[str]) -> tuple[float, float]:
+    """
+    Measures import time of entry module and of all modules needed by the code path in a new process.
+
+    Parameters:
+        module_dir (str): name of module directory.
+        entry (str): name of entry module.
+        lazy (list[str]): modules imported lazily by the code path.
+
+    Returns:
+        Tuple[float, float]: import time of entry module and of the whole code path in seconds.
+    """
+    script = SCRIPT.format(module_dir=str(MODULES_DIR / module_dir), entry=entry, lazy=lazy)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=MODULES_DIR / module_dir).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures startup import time of module entry points.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1.0, 
+                        help="maximum import time of entry module in seconds, exceeding it fails the benchmark")
+    parser.add_argument("entry_points", nargs="*", default=list(ENTRY_POINTS))
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"{'entry point':>16} {'entry import':>13} {'code path':>10}")
+    for name in args.entry_points:
+        times = [measure(*ENTRY_POINTS[name]) for _ in range(args.repeat)]
+        entry, total = min(t[0] for t in times), min(t[1] for t in times)
+        print(f"{name:>16} {entry:12.3f}s {total:9.3f}s")
+        if entry > args.budget:
+            over_budget.append(name)
+
+    if over_budget:
+        raise SystemExit(f"Entry import time over budget {args.budget} s: {', '.join(over_budget)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+
+MODULES_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(MODULES_DIR / "preprocessing"))
+sys.path.insert(0, str(MODULES_DIR / "active_learning"))
+sys.path.insert(0, str(MODULES_DIR / "common"))
+import cnn_model
+import file_utils
+import job_preprocessing
+import regular_iteration
+from config import ActiveLearningConfig
+from metrics import get_peak_rss, get_rss, reset_peak_rss
+
+import synthetic_data
+
+CLASSES = ["other", "single peak", "double peak"]
+# Smaller increases of RSS are not compared, they are dominated by allocator noise.
+RSS_FLOOR_MIB = 16
+
+def run_stage(stage: Callable[[], int]) -> dict[str, float]:
+    """
+    Runs one stage and measures it.
+    Peak RSS includes memory of earlier stages and imported frameworks, so the stage's own memory 
+    is measured by increase of peak RSS over RSS at the start of the stage.
+
+    Parameters:
+        stage (Callable[[], int]): stage, which returns number of processed spectra.
+
+    Returns:
+        dict[str, float]: wall time, CPU time, processed spectra, spectra per second, peak RSS 
+            and its increase during the stage.
+    """
+    reset_peak_rss()
+    start_rss = get_rss()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    rows = stage()
+    seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+    peak_rss = get_peak_rss()
+    return {
+        "seconds": seconds,
+        "cpu_seconds": cpu_seconds,
+        "rows": rows,
+        "rows_per_second": rows / seconds if seconds > 0 else 0.0,
+        "peak_rss_mib": peak_rss,
+        "rss_increase_mib": max(peak_rss - start_rss, 0.0),
+    }
+
+def get_stages(args: argparse.Namespace, tmp_dir: str) -> dict[str, Callable[[], int]]:
+    """
+    Creates stages of preprocessing and active learning iteration on synthetic data.
+    Stages share their results, so they must run in the given order.
+
+    Parameters:
+        args (argparse.Namespace): parsed arguments of the benchmark.
+        tmp_dir (str): path to directory with synthetic data and results.
+
+    Returns:
+        dict[str, Callable[[], int]]: stages by name, every stage returns number of processed spectra.
+    """
+    fits_dir, pool_path, training_path = f"{tmp_dir}/fits", f"{tmp_dir}/pool.h5", f"{tmp_dir}/training_data.h5"
+    synthetic_data.write_lamost_fits(fits_dir, args.fits_count, args.shares)
+    synthetic_data.write_spectra_file(pool_path, args.pool_size, args.points, args.shares, seed=1)
+    synthetic_data.write_spectra_file(training_path, args.training_size, args.points, args.shares, 
+                                      with_labels=True, name_prefix="train", seed=2)
+    config = ActiveLearningConfig.model_validate({
+        "iteration": 2, "classes": CLASSES, "candidate_classes": CLASSES[1:], "pool_data_path": pool_path, 
+        "training_data_path": training_path, "epochs_train": args.epochs, "result_dir_path": tmp_dir,
+    })
+    points, num_classes = args.points, len(CLASSES)
+    state = {}
+    # TensorFlow is imported lazily, it is imported here, so its import time is not measured in train stage.
+    cnn_model.get_model(points, num_classes)
+
+    def read_spectrum() -> int:
+        files = sorted(Path(fits_dir).iterdir())
+        for file in files:
+            job_preprocessing.read_spectrum(file)
+        return len(files)
+
+    def preprocess() -> int:
+        filenames, _, _ = job_preprocessing.preprocess_lamost_dr2_dir(fits_dir, 3800, 9000, points)
+        return filenames.shape[0]
+
+    def get_tr_data() -> int:
+        state["filenames_tr"], state["wave_tr"], state["fluxes_tr"], state["labels_tr"] = \
+            regular_iteration.get_tr_data(config)
+        return state["fluxes_tr"].shape[0]
+
+    def get_pool_data() -> int:
+        state["filenames"], state["wave"], state["fluxes"], state["pool_indexes"], _ = \
+            regular_iteration.get_pool_data(config)
+        return state["fluxes"].shape[0]
+
+    def balance() -> int:
+        state["fluxes_bal"], state["labels_bal"] = cnn_model.balance(state["fluxes_tr"], state["labels_tr"])
+        return state["fluxes_bal"].shape[0]
+
+    def train() -> int:
+        state["model"] = cnn_model.get_model(points, num_classes)
+        cnn_model.train(state["model"], state["fluxes_bal"], state["labels_bal"], points, num_classes, config)
+        return state["fluxes_bal"].shape[0] * args.epochs
+
+    def predict() -> int:
+        label_list_pred = cnn_model.predict(state["model"], state["fluxes"], points, config)
+        state["labels_pred"] = np.argmax(label_list_pred, axis=1)
+        state["entropies"] = regular_iteration.get_entropies(label_list_pred)
+        return state["fluxes"].shape[0]
+
+    def get_indexes() -> int:
+        state["indexes"] = regular_iteration.get_indexes(config, state["labels_pred"], state["entropies"])
+        return state["labels_pred"].shape[0]
+
+    def write_results() -> int:
+        oracle_indexes, perf_est_indexes, candidate_indexes = state["indexes"]
+        result = {
+            "filenames": state["filenames"],
+            "wave": state["wave"],
+            "fluxes": state["fluxes"],
+            "pool_indexes": state["pool_indexes"],
+            "labels_pred": state["labels_pred"],
+            "entropies": state["entropies"],
+            "oracle_indexes": oracle_indexes,
+            "perf_est_indexes": perf_est_indexes,
+            "candidate_indexes": candidate_indexes,
+            "model": state["model"],
+        }
+        file_utils.write_active_learning_result(f"{tmp_dir}/result.h5", config, result)
+        file_utils.write_training_data(f"{tmp_dir}/training_data_new.h5", config, state["filenames_tr"],
+                                       state["wave_tr"], state["fluxes_tr"], state["labels_tr"])
+        return state["fluxes"].shape[0] + state["fluxes_tr"].shape[0]
+
+    def tsne() -> int:
+        regular_iteration.get_embedding(config, state["filenames_tr"], state["fluxes_tr"])
+        return state["fluxes_tr"].shape[0]
+
+    return {
+        "read_spectrum": read_spectrum,
+        "preprocess_lamost_dr2_dir": preprocess,
+        "get_tr_data": get_tr_data,
+        "get_pool_data": get_pool_data,
+        "balance": balance,
+        "train": train,
+        "predict": predict,
+        "get_indexes": get_indexes,
+        "write_results": write_results,
+        "tsne": tsne,
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints comparison of stages with saved baseline and finds regressions.
+
+    Parameters:
+        results (dict): results of the current run.
+        baseline (dict): results of the baseline run.
+        tolerance (float): allowed relative increase of wall time and RSS increase of the stage.
+            RSS increases are compared from RSS_FLOOR_MIB, baseline without them is compared only by time.
+
+    Returns:
+        list[str]: names of stages, whose wall time or RSS increase grew more than tolerance.
+    """
+    regressions = []
+    changed = [key for key, value in results["parameters"].items() 
+               if key != "tolerance" and baseline["parameters"].get(key) != value]
+    if changed:
+        print(f"\nBaseline was measured with different parameters: {', '.join(changed)}")
+    print(f"\n{'stage':>26} {'time ratio':>11} {'RSS increase ratio':>19}")
+    for name, stage in results["stages"].items():
+        if name not in baseline["stages"]:
+            continue
+        base = baseline["stages"][name]
+        time_ratio = stage["seconds"] / max(base["seconds"], 1e-9)
+        rss_ratio = (max(stage["rss_increase_mib"], RSS_FLOOR_MIB) / max(base["rss_increase_mib"], RSS_FLOOR_MIB)
+                     if "rss_increase_mib" in base else 1.0)
+        regressed = time_ratio > 1 + tolerance or rss_ratio > 1 + tolerance
+        print(f"{name:>26} {time_ratio:10.2f}x {rss_ratio:18.2f}x{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks stages of preprocessing and active learning iteration "
+                                                 "on synthetic LAMOST-like data offline.")
+    parser.add_argument("--fits-count", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=20000)
+    parser.add_argument("--training-size", type=int, default=2000)
+    parser.add_argument("--points", type=int, default=600)
+    parser.add_argument("--shares", type=float, nargs="+", default=[0.9, 0.06, 0.04],
+                        help="share of every class: other, single peak, double peak")
+    parser.add_argument("--epochs", type=int, default=2)
+    parser.add_argument("--output", default="bench_suite.json", help="path to JSON file with results")
+    parser.add_argument("--baseline", help="path to JSON file with results of baseline run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative increase of time and RSS increase of stages against baseline")
+    args = parser.parse_args()
+    if len(args.shares) != len(CLASSES):
+        parser.error(f"--shares needs {len(CLASSES)} values")
+
+    results = {
+        "environment": {"python": platform.python_version(), "numpy": np.__version__, 
+                        "platform": platform.platform(), "processor": platform.processor()},
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "stages": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stages = get_stages(args, tmp_dir)
+        print(f"{'stage':>26} {'seconds':>9} {'CPU s':>8} {'spectra/s':>11} {'peak RSS':>12} {'RSS increase':>13}")
+        for name, stage in stages.items():
+            measured = run_stage(stage)
+            results["stages"][name] = measured
+            print(f"{name:>26} {measured['seconds']:9.3f} {measured['cpu_seconds']:8.3f} "
+                  f"{measured['rows_per_second']:11.0f} {measured['peak_rss_mib']:8.0f} MiB "
+                  f"{measured['rss_increase_mib']:9.0f} MiB")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            raise SystemExit(f"Regression over tolerance {args.tolerance}: {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main()
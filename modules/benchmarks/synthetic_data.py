@@ -0,0 +1,183 @@
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+LAMOST_START = 3690
+LAMOST_END = 9100
+LAMOST_POINTS = 3909
+PREP_START = 3800
+PREP_END = 9000
+LINES = (6563.0, 4861.0)
+
+def make_labels(count: int, shares: list[float], rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws labels of spectra, share of every class is given, so data can be imbalanced.
+
+    Parameters:
+        count (int): number of spectra.
+        shares (list[float]): share of every class, normalized to sum 1.
+        rng (np.random.Generator): random generator.
+
+    Returns:
+        np.ndarray: 1D array of labels.
+    """
+    shares = np.asarray(shares, dtype=float)
+    return rng.choice(shares.shape[0], size=count, p=shares / shares.sum())
+
+def make_fluxes(wave: np.ndarray, labels: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Creates synthetic spectra with noisy continuum. Spectra of class 1 have one emission peak,
+    spectra of class 2 and higher have two peaks, like single and double peak classes of the jobs.
+
+    Parameters:
+        wave (np.ndarray): 1D array of wave.
+        labels (np.ndarray): 1D array of labels.
+        rng (np.random.Generator): random generator.
+
+    Returns:
+        np.ndarray: 2D array of fluxes.
+    """
+    slopes = rng.uniform(-0.5, 0.5, (labels.shape[0], 1))
+    continuum = 100 * (1 + slopes * (wave - wave.mean()) / (wave.max() - wave.min()))
+    fluxes = continuum + rng.normal(0, 3, (labels.shape[0], wave.shape[0]))
+    for line in LINES:
+        strengths = rng.uniform(20, 60, labels.shape[0])
+        if line == LINES[0]:
+            strengths[labels == 0] = 0
+        else:
+            strengths[labels < 2] = 0
+        fluxes += strengths[:, None] * np.exp(-0.5 * ((wave - line) / 8) ** 2)
+
+    return fluxes
+
+def get_lamost_wave(points: int = LAMOST_POINTS, shift: float = 0.0) -> np.ndarray:
+    """
+    Gets LAMOST-like logarithmic wave grid.
+
+    Parameters:
+        points (int): number of points of the grid.
+        shift (float): the interval is narrowed by shift angstroms from both sides, so grids can differ.
+
+    Returns:
+        np.ndarray: 1D array of wave.
+    """
+    return np.logspace(np.log10(LAMOST_START + shift), np.log10(LAMOST_END - shift), points)
+
+def make_preprocessed_fluxes(points: int, labels: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    Creates synthetic spectra on uniform wave grid of preprocessed data, fluxes are scaled to [-1, 1]
+    like preprocessed fluxes.
+
+    Parameters:
+        points (int): number of uniform points.
+        labels (np.ndarray): 1D array of labels.
+        rng (np.random.Generator): random generator.
+
+    Returns:
+        np.ndarray: 2D array of fluxes.
+    """
+    fluxes = make_fluxes(np.linspace(PREP_START, PREP_END, points), labels, rng)
+    fluxes -= fluxes.min(axis=1, keepdims=True)
+    fluxes *= 2 / fluxes.max(axis=1, keepdims=True)
+    fluxes -= 1
+    return fluxes
+
+def make_source_spectra(count: int, grid_count: int, points: int = LAMOST_POINTS, 
+                        shares: list[float] = (0.9, 0.06, 0.04), seed: int = 42
+                        ) -> tuple[list[np.ndarray], list[np.ndarray]]:
+    """
+    Creates synthetic spectra on grid_count shared LAMOST-like wave grids, before preprocessing.
+    Like spectra read from FITS files, every spectrum has its own big-endian float32 arrays.
+
+    Parameters:
+        count (int): number of spectra.
+        grid_count (int): number of distinct wave grids.
+        points (int): number of points of wave grid.
+        shares (list[float]): share of every class.
+        seed (int): seed for random generator.
+
+    Returns:
+        Tuple[list[np.ndarray], list[np.ndarray]]:
+            Waves of spectra.
+            Fluxes of spectra.
+    """
+    rng = np.random.default_rng(seed)
+    grids = [get_lamost_wave(points, i * 0.01) for i in range(grid_count)]
+    labels = make_labels(count, shares, rng)
+    waves = [grids[i % grid_count].astype(">f4") for i in range(count)]
+    fluxes = [None] * count
+    for i, grid in enumerate(grids):
+        rows = np.arange(i, count, grid_count)
+        for row, flux in zip(rows, make_fluxes(grid, labels[rows], rng).astype(">f4")):
+            fluxes[row] = flux
+
+    return waves, fluxes
+
+def write_lamost_fits(dir_path: str, count: int, shares: list[float] = (0.9, 0.06, 0.04),
+                      seed: int = 42) -> np.ndarray:
+    """
+    Writes synthetic LAMOST DR2-like FITS files: header contains FILENAME, data have 5 rows,
+    flux in row 0 and logarithmic wave in row 2, as float32.
+
+    Parameters:
+        dir_path (str): path to directory, where files are written.
+        count (int): number of spectra.
+        shares (list[float]): share of every class.
+        seed (int): seed for random generator.
+
+    Returns:
+        np.ndarray: 1D array of labels of written spectra.
+    """
+    from astropy.io import fits
+
+    Path(dir_path).mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    wave = get_lamost_wave()
+    labels = make_labels(count, shares, rng)
+    fluxes = make_fluxes(wave, labels, rng)
+    for i, flux in enumerate(fluxes):
+        data = np.zeros((5, LAMOST_POINTS), dtype=np.float32)
+        data[0], data[1], data[2] = flux, 1.0, wave
+        hdu = fits.PrimaryHDU(data)
+        hdu.header["FILENAME"] = f"spec-{i:07d}.fits"
+        hdu.writeto(f"{dir_path}/spec-{i:07d}.fits", overwrite=True)
+
+    return labels
+
+def write_spectra_file(file_path: str, count: int, points: int = 600, shares: list[float] = (0.9, 0.06, 0.04),
+                       with_labels: bool = False, name_prefix: str = "spec", chunk_size: int = 50000, 
+                       seed: int = 42, dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Writes synthetic preprocessed spectra to HDF5 file by chunks, in the format of preprocessing result
+    (pool data) or, with labels, of active learning training data, see make_preprocessed_fluxes.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+        count (int): number of spectra.
+        points (int): number of uniform points.
+        shares (list[float]): share of every class.
+        with_labels (bool): if True, dataset labels is written.
+        name_prefix (str): prefix of spectrum filenames.
+        chunk_size (int): number of spectra generated at once.
+        seed (int): seed for random generator.
+        dtype (np.dtype): data type of wave and fluxes.
+
+    Returns:
+        np.ndarray: 1D array of labels of written spectra.
+    """
+    rng = np.random.default_rng(seed)
+    wave = np.linspace(PREP_START, PREP_END, points)
+    labels = make_labels(count, shares, rng)
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("filenames", data=[f"{name_prefix}-{i:07d}.fits" for i in range(count)],
+                           dtype=h5py.string_dtype("utf-8"))
+        h5f.create_dataset("wave", data=wave.astype(dtype))
+        fluxes = h5f.create_dataset("fluxes", shape=(count, points), dtype=dtype)
+        for start in range(0, count, chunk_size):
+            chunk = make_preprocessed_fluxes(points, labels[start:start + chunk_size], rng)
+            fluxes[start:start + chunk.shape[0]] = chunk
+        if with_labels:
+            h5f.create_dataset("labels", data=labels)
+
+    return labels
@@ -0,0 +1,43 @@
+import h5py
+import numpy as np
+from numpy.typing import NDArray
+
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+HASH_CHUNK_SIZE = 2**16
+
+def get_filename_hashes(filenames: NDArray[str]) -> NDArray[np.uint64]:
+    """
+    Gets stable 64-bit FNV-1a hashes of UTF-8 encoded filenames, computed by vectorized operations.
+    Hashes are persisted in filename indexes of HDF5 files, so they must not change.
+
+    Parameters:
+        filenames (NDArray[str]): 1D array of spectra filenames.
+
+    Returns:
+        NDArray[np.uint64]: 1D array of filename hashes.
+    """
+    hashes = np.full(len(filenames), FNV_OFFSET, dtype=np.uint64)
+    for start in range(0, len(filenames), HASH_CHUNK_SIZE):
+        encoded = np.char.encode(np.asarray(filenames[start:start + HASH_CHUNK_SIZE], dtype=str), "utf-8")
+        codes = encoded.view(np.uint8).reshape(encoded.shape[0], encoded.itemsize).astype(np.uint64)
+        chunk_hashes = hashes[start:start + HASH_CHUNK_SIZE]
+        for column in codes.T:
+            chunk_hashes[:] = np.where(column != 0, (chunk_hashes ^ column) * FNV_PRIME, chunk_hashes)
+
+    return hashes
+
+def write_filename_index(h5f: h5py.File, hashes: NDArray[np.uint64]) -> None:
+    """
+    Writes sorted index of filenames to opened HDF5 file, replacing the old one. Index consists of datasets
+    filename_index_hashes with sorted filename hashes, and filename_index_rows with corresponding rows.
+
+    Parameters:
+        h5f (h5py.File): opened HDF5 file, where index will be written.
+        hashes (NDArray[np.uint64]): 1D array of filename hashes of every spectrum in the file.
+    """
+    rows = np.argsort(hashes, kind="stable")
+    for name, data in (("filename_index_hashes", hashes[rows]), ("filename_index_rows", rows)):
+        if name in h5f:
+            del h5f[name]
+        h5f.create_dataset(name, data=data)
@@ -0,0 +1,51 @@
+import numpy as np
+from numpy.typing import DTypeLike
+from typing import Any
+
+HDF5_CHUNK_BYTES = 2**20
+DEFAULT_BATCH_SIZE_PREDICT = 2**14
+
+def get_flux_dataset_options(config: dict[str, Any], points: int, dtype: DTypeLike,
+                             rows: int | None = None) -> dict[str, Any]:
+    """
+    Gets HDF5 storage options of fluxes dataset from job's configuration.
+    Preprocessing and active learning write fluxes by the same options, so their files have the same layout.
+
+    If no chunk size, compression or shuffle is configured and dataset is not resizable, fluxes are stored
+    contiguously. Otherwise fluxes are stored by row-aligned chunks of hdf5_chunk_rows spectra, if it is 0,
+    the chunk has as many spectra as possible to fit in 1 MiB, while batch size for model prediction
+    (batch_size_predict) is its multiple. Optionally hdf5_compression (gzip or lzf) and hdf5_shuffle filter
+    are applied.
+
+    Parameters:
+        config (dict[str, Any]): job's configuration, loaded from configuration file.
+        points (int): count of fluxes of one spectrum.
+        dtype (DTypeLike): data type of stored fluxes.
+        rows (int | None): count of spectra in the dataset, None means the dataset is resizable.
+
+    Returns:
+        dict[str, Any]: keyword arguments for h5py create_dataset.
+    """
+    chunk_rows = config.get("hdf5_chunk_rows", 0)
+    compression = config.get("hdf5_compression")
+    shuffle = config.get("hdf5_shuffle", False)
+    if rows is not None and chunk_rows <= 0 and compression is None and not shuffle:
+        return {}
+
+    if chunk_rows <= 0:
+        chunk_rows = config.get("batch_size_predict", DEFAULT_BATCH_SIZE_PREDICT)
+        itemsize = np.dtype(dtype).itemsize
+        while chunk_rows > 1 and chunk_rows % 2 == 0 and chunk_rows * points * itemsize > HDF5_CHUNK_BYTES:
+            chunk_rows //= 2
+
+    if rows is not None:
+        chunk_rows = min(chunk_rows, rows)
+    options = {"chunks": (max(1, chunk_rows), points), "shuffle": shuffle}
+    if rows is None:
+        options["maxshape"] = (None, points)
+    if compression is not None:
+        options["compression"] = compression
+        if compression == "gzip":
+            options["compression_opts"] = config.get("hdf5_compression_level", 4)
+
+    return options
@@ -0,0 +1,157 @@
+import json
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+TRACEMALLOC_TOP = 50
+
+def reset_peak_rss() -> None:
+    """
+    Resets peak resident memory of the process, so it can be measured for one stage.
+    Works only on Linux, elsewhere peak since the start of the process is measured.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def get_rss() -> float:
+    """
+    Gets current resident memory of the process, 0 if it cannot be measured.
+    Works only on Linux.
+
+    Returns:
+        float: resident memory in MiB.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return 0.0
+
+def get_peak_rss() -> float:
+    """
+    Gets peak resident memory of the process since the last reset, 0 if it cannot be measured.
+
+    Returns:
+        float: peak resident memory in MiB.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+
+class Metrics:
+    """
+    Records wall time, CPU time, peak RSS and processed rows of job stages and writes them
+    to metrics.json in the result directory.
+
+    One stage can be profiled by cProfile, whose stats are written to profile_<stage>.prof,
+    or by tracemalloc, whose top allocations are written to tracemalloc_<stage>.txt.
+
+    Parameters:
+        result_dir_path (str): path to the result directory of the job.
+        profile_stage (str): name of profiled stage, empty string means no profiling.
+        profile_mode (str): cprofile or tracemalloc.
+    """
+
+    def __init__(self, result_dir_path: str, profile_stage: str = "", profile_mode: str = "cprofile") -> None:
+        self.result_dir_path = result_dir_path
+        self.profile_stage = profile_stage
+        self.profile_mode = profile_mode
+        self.stages = {}
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str, rows: int | None = None) -> Iterator[dict[str, Any]]:
+        """
+        Measures the stage inside the with block.
+
+        Parameters:
+            name (str): name of the stage.
+            rows (int | None): number of processed rows, it can be also set to key rows of yielded record.
+
+        Yields:
+            dict[str, Any]: record of the stage.
+        """
+        record = {"rows": rows}
+        profiler = self.start_profiler() if name == self.profile_stage else None
+        reset_peak_rss()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            record["peak_rss_mib"] = get_peak_rss()
+            if record["rows"] is not None:
+                record["rows_per_second"] = record["rows"] / max(record["wall_seconds"], 1e-9)
+            if profiler is not None:
+                self.stop_profiler(name, profiler)
+            self.stages[name] = record
+
+    def start_profiler(self) -> Any:
+        """
+        Starts profiler of the profiled stage.
+
+        Returns:
+            cProfile.Profile or tracemalloc module.
+        """
+        if self.profile_mode == "tracemalloc":
+            import tracemalloc
+
+            tracemalloc.start()
+            return tracemalloc
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop_profiler(self, name: str, profiler: Any) -> None:
+        """
+        Stops profiler and writes its dump to the result directory.
+
+        Parameters:
+            name (str): name of the profiled stage.
+            profiler: cProfile.Profile or tracemalloc module.
+        """
+        if self.profile_mode == "tracemalloc":
+            snapshot = profiler.take_snapshot()
+            profiler.stop()
+            with open(f"{self.result_dir_path}/tracemalloc_{name}.txt", "w", encoding="utf-8") as f:
+                for statistic in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                    f.write(f"{statistic}\n")
+            return
+
+        profiler.disable()
+        profiler.dump_stats(f"{self.result_dir_path}/profile_{name}.prof")
+
+    def write(self) -> None:
+        """
+        Writes recorded stages and totals of the job to metrics.json.
+        """
+        metrics = {
+            "wall_seconds": time.perf_counter() - self.start,
+            "cpu_seconds": time.process_time() - self.cpu_start,
+            "peak_rss_mib": max([get_peak_rss()] + [stage["peak_rss_mib"] for stage in self.stages.values()]),
+            "stages": self.stages,
+        }
+
+        with open(f"{self.result_dir_path}/metrics.json", "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=4)
@@ -0,0 +1,104 @@
+import json
+import numpy as np
+from pathlib import Path
+from numpy.typing import NDArray
+
+TILE_BINS = 64
+TILE_CAPACITY = 4096
+MAX_LEVEL = 8
+
+def write_tile(dir_path: Path, tile: dict, data: list[NDArray]) -> None:
+    """
+    Writes binary file of one tile, arrays are written one after another.
+
+    Parameters:
+        dir_path (Path): path to directory with tiles.
+        tile (dict): index entry of the tile, its file name is added.
+        data (list[NDArray]): arrays of the tile in little-endian data types.
+    """
+    tile["file"] = f"{tile['z']}_{tile['x']}_{tile['y']}.bin"
+    with open(dir_path / tile["file"], "wb") as f:
+        for array in data:
+            array.tofile(f)
+
+def write_tiles(dir_path: str, fluxes_embedded: NDArray[NDArray[float]], labels: NDArray[int],
+                classes: list[str], bins: int = TILE_BINS, capacity: int = TILE_CAPACITY,
+                max_level: int = MAX_LEVEL) -> None:
+    """
+    Writes multi-resolution quadtree pyramid of embedded data, so plot can load coarse overview
+    and fetch details on zoom.
+
+    Level z splits bounds of data into 2^z x 2^z tiles. Tile with more than capacity points,
+    which is not on the max level, is written as counts of points of every class in bins x bins grid
+    and it is split into 4 tiles of the next level. Other tiles are leaves and contain their points.
+    Tiles without points are not written.
+
+    Every tile is binary file z_x_y.bin in the directory, where x and y count tiles from minimal x and y.
+    Binned tile contains uint32 counts with shape (classes, bins, bins), rows of bins go from minimal y.
+    Leaf tile contains float32 x, float32 y and uint16 labels of its points.
+    All numbers are little-endian. Tiles and data formats are listed in index.json.
+
+    Parameters:
+        dir_path (str): path to directory, where tiles are written.
+        fluxes_embedded (NDArray[NDArray[float]]): 2D array of embedded fluxes.
+        labels (NDArray[int]): 1D array of labels.
+        classes (list[str]): names of classes.
+        bins (int): number of bins of tile side.
+        capacity (int): maximal number of points of leaf tile above the max level.
+        max_level (int): deepest level of the pyramid.
+    """
+    dir_path = Path(dir_path)
+    dir_path.mkdir(parents=True, exist_ok=True)
+    for old_tile in dir_path.glob("*.bin"):
+        old_tile.unlink()
+    x, y = fluxes_embedded[:, 0], fluxes_embedded[:, 1]
+    bounds = [float(x.min()), float(x.max()), float(y.min()), float(y.max())] if x.shape[0] else [0.0, 1.0, 0.0, 1.0]
+    # Normalized coordinates in [0, 1), points on the maximal bound belong to the last tile.
+    scale = np.nextafter(1, 0)
+    u = (x - bounds[0]) / max(bounds[1] - bounds[0], 1e-12) * scale
+    v = (y - bounds[2]) / max(bounds[3] - bounds[2], 1e-12) * scale
+    x32, y32, labels16 = x.astype("<f4"), y.astype("<f4"), labels.astype("<u2")
+
+    tiles = []
+    stack = [(0, 0, 0, np.arange(x.shape[0]))]
+    while stack:
+        z, tile_x, tile_y, rows = stack.pop()
+        if rows.shape[0] == 0:
+            continue
+
+        tile = {"z": z, "x": tile_x, "y": tile_y, "count": int(rows.shape[0])}
+        if rows.shape[0] <= capacity or z == max_level:
+            tile["type"] = "points"
+            write_tile(dir_path, tile, [x32[rows], y32[rows], labels16[rows]])
+            tiles.append(tile)
+            continue
+
+        local_u = u[rows] * 2**z - tile_x
+        local_v = v[rows] * 2**z - tile_y
+        bin_x = np.minimum(local_u * bins, bins - 1).astype(int)
+        bin_y = np.minimum(local_v * bins, bins - 1).astype(int)
+        counts = np.bincount((labels[rows] * bins + bin_y) * bins + bin_x, minlength=len(classes) * bins**2)
+        tile["type"] = "bins"
+        write_tile(dir_path, tile, [counts.astype("<u4")])
+        tiles.append(tile)
+
+        quadrants = (local_u >= 0.5).astype(int) + 2 * (local_v >= 0.5)
+        for quadrant in range(4):
+            stack.append((z + 1, 2 * tile_x + quadrant % 2, 2 * tile_y + quadrant // 2, rows[quadrants == quadrant]))
+
+    index = {
+        "classes": classes,
+        "count": int(x.shape[0]),
+        "class_counts": np.bincount(labels, minlength=len(classes)).tolist(),
+        "bounds": bounds,
+        "bins": bins,
+        "max_level": max_level,
+        "formats": {
+            "bins": "uint32 counts, shape (classes, bins, bins), little-endian",
+            "points": "float32 x, float32 y, uint16 labels, each of length count, little-endian",
+        },
+        "tiles": sorted(tiles, key=lambda tile: (tile["z"], tile["y"], tile["x"])),
+    }
+
+    with open(dir_path / "index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
@@ -1,34 +1,239 @@
 import numpy as np
-from sklearn.manifold import TSNE
-import matplotlib.pyplot as plt
 import json
+from collections.abc import Iterator
 from numpy.typing import NDArray 
 import h5py
 import sys
+from pathlib import Path
 
-def read_data(file_path: str
-                   ) -> tuple[NDArray[float], NDArray[int]]:
+# Modules shared by all jobs are in directory common next to directories of jobs.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+import tiles
+from metrics import Metrics
+
+DEFAULT_BLOCK_SIZE = 4096
+
+def read_labels(file_path: str) -> NDArray[int]:
     """
-    Reads fluxes and labels from HDF5 file.
-    HDF5 file must contain following dataset: fluxes, labels.
+    Reads labels from HDF5 file, fluxes are not read.
 
     Parameters:
         file_path (str): path to HDF5 file.
-    
+
+    Returns:
+        NDArray[int]: 1D array of labels.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        return h5f["labels"][:]
+
+def get_stratified_rows(labels: NDArray[int], max_samples: int, seed: int = 42) -> NDArray[int]:
+    """
+    Gets random subsample of rows, where every label has the same share as in all data.
+    Every present label keeps at least one row.
+
+    Parameters:
+        labels (NDArray[int]): 1D array of labels.
+        max_samples (int): number of rows, which may differ by rounding of label shares, 0 means all rows.
+        seed (int): seed for random generator.
+
+    Returns:
+        NDArray[int]: 1D array of sorted rows.
+    """
+    if max_samples <= 0 or labels.shape[0] <= max_samples:
+        return np.arange(labels.shape[0])
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        size = max(1, round(members.shape[0] * max_samples / labels.shape[0]))
+        rows.append(rng.choice(members, size=size, replace=False))
+
+    return np.sort(np.concatenate(rows))
+
+def iter_fluxes(file_path: str, rows: NDArray[int], chunk_size: int) -> Iterator[NDArray[NDArray[float]]]:
+    """
+    Reads fluxes of selected rows from HDF5 file by chunks.
+    File is read by contiguous blocks of chunk_size spectra, which contain selected rows, 
+    because reading of scattered rows by h5py is much slower than reading of whole blocks.
+    If all rows are read at once, but only some rows are selected, blocks have DEFAULT_BLOCK_SIZE spectra,
+    so unselected spectra of the whole file are never read to memory.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+        rows (NDArray[int]): 1D array of sorted rows.
+        chunk_size (int): number of spectra in one chunk, 0 means all rows at once.
+
+    Yields:
+        NDArray[NDArray[float]]: 2D array of fluxes of at least chunk_size selected spectra, except the last chunk.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        dataset = h5f["fluxes"]
+        if chunk_size > 0:
+            block_size = chunk_size
+        elif rows.shape[0] < dataset.shape[0]:
+            block_size = DEFAULT_BLOCK_SIZE
+        else:
+            block_size = max(dataset.shape[0], 1)
+        bounds = np.searchsorted(rows, np.arange(0, dataset.shape[0] + block_size, block_size))
+        pending, size = [], 0
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if start == end:
+                continue
+            block_rows = rows[start:end]
+            block = dataset[block_rows[0]:block_rows[-1] + 1]
+            pending.append(block if block.shape[0] == block_rows.shape[0] else block[block_rows - block_rows[0]])
+            size += block_rows.shape[0]
+            if chunk_size > 0 and size >= chunk_size:
+                yield np.concatenate(pending)
+                pending, size = [], 0
+
+        if pending:
+            yield np.concatenate(pending)
+
+def read_features(file_path: str, rows: NDArray[int], chunk_size: int, 
+                  pca_components: int) -> NDArray[NDArray[float]]:
+    """
+    Reads fluxes of selected rows and optionally reduces their dimension by PCA.
+    If fluxes are read by chunks, PCA is fitted incrementally chunk by chunk and fluxes are transformed 
+    chunk by chunk, so only reduced fluxes are kept in memory.
+    Number of components is limited by number of spectra and fluxes, short last chunk is fitted together 
+    with the previous chunk.
+
+    Parameters:
+        file_path (str): path to HDF5 file.
+        rows (NDArray[int]): 1D array of sorted rows.
+        chunk_size (int): number of spectra in one chunk, 0 means all rows at once.
+        pca_components (int): number of PCA components, 0 means no PCA.
+
     Returns:
-        Tuple[NDArray[float], NDArray[int]]:
-            2D array with preprocessed fluxes.
-            1D array of labels.
+        NDArray[NDArray[float]]: 2D array of features for embedding.
     """
+    if pca_components <= 0:
+        return np.concatenate(list(iter_fluxes(file_path, rows, chunk_size)))
+
     with h5py.File(file_path, "r") as h5f:
-        fluxes = h5f["fluxes"][:]
-        labels = h5f["labels"][:]
-        
-    return fluxes, labels
+        pca_components = min(pca_components, rows.shape[0], h5f["fluxes"].shape[1])
+
+    if chunk_size <= 0:
+        from sklearn.decomposition import PCA
+
+        fluxes = np.concatenate(list(iter_fluxes(file_path, rows, chunk_size)))
+        pca = PCA(n_components=pca_components, svd_solver="randomized", random_state=42)
+        return pca.fit_transform(fluxes).astype(np.float32)
+
+    from sklearn.decomposition import IncrementalPCA
+
+    # Every chunk passed to partial_fit needs at least as many spectra as components,
+    # only the last chunk can be shorter, so it is fitted together with the previous one.
+    chunk_size = max(chunk_size, pca_components)
+    pca = IncrementalPCA(n_components=pca_components)
+    previous = None
+    for chunk in iter_fluxes(file_path, rows, chunk_size):
+        if previous is not None and chunk.shape[0] < pca_components:
+            chunk = np.concatenate((previous, chunk))
+        elif previous is not None:
+            pca.partial_fit(previous)
+        previous = chunk
+    pca.partial_fit(previous)
+
+    return np.concatenate([pca.transform(chunk).astype(np.float32) 
+                           for chunk in iter_fluxes(file_path, rows, chunk_size)])
+
+def embed(features: NDArray[NDArray[float]], method: str, n_jobs: int | None) -> NDArray[NDArray[float]]:
+    """
+    Applies t-SNE on features.
+
+    Method fft uses FFT-accelerated interpolation of openTSNE, if it is installed, 
+    otherwise Barnes-Hut t-SNE of scikit-learn is used.
+
+    Parameters:
+        features (NDArray[NDArray[float]]): 2D array of features.
+        method (str): t-SNE method, one of exact, barnes_hut, fft.
+        n_jobs (int | None): number of threads, None means one thread.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of embedded features.
+    """
+    if method == "fft":
+        try:
+            from openTSNE import TSNE as FFTTSNE
+            return np.asarray(FFTTSNE(perplexity=30, n_jobs=n_jobs or 1, random_state=42).fit(features))
+        except ImportError:
+            method = "barnes_hut"
+
+    from sklearn.manifold import TSNE
+
+    tsne = TSNE(n_components=2, random_state=42, perplexity=30, method=method, n_jobs=n_jobs)
+    return tsne.fit_transform(features)
+
+def save_plot(fluxes_embedded: NDArray[NDArray[float]], labels: NDArray[int], classes: list[str],
+              file_path: str) -> None:
+    """
+    Saves scatter plot of embedded data. Matplotlib is imported only here, it is not needed for JSON result.
+
+    Parameters:
+        fluxes_embedded (NDArray[NDArray[float]]): 2D array of embedded fluxes.
+        labels (NDArray[int]): 1D array of labels.
+        classes (list[str]): names of classes.
+        file_path (str): path to PNG file.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(8, 6))
+    for i, class_name in enumerate(classes):
+        mask = (labels == i)
+        plt.scatter(fluxes_embedded[mask, 0], fluxes_embedded[mask, 1], label=class_name)
+
+    plt.title("t-SNE vizualization")
+    plt.savefig(file_path)
+
+def save_density_plot(fluxes_embedded: NDArray[NDArray[float]], labels: NDArray[int], classes: list[str],
+                      file_path: str, bins: int = 800) -> None:
+    """
+    Saves density image of embedded data rasterized from 2D histogram, so its cost does not grow 
+    with number of points. Colour of every pixel is mix of class colours weighted by their counts,
+    opacity grows with logarithm of the count.
+
+    Parameters:
+        fluxes_embedded (NDArray[NDArray[float]]): 2D array of embedded fluxes.
+        labels (NDArray[int]): 1D array of labels.
+        classes (list[str]): names of classes.
+        file_path (str): path to PNG file.
+        bins (int): number of pixels of image side.
+    """
+    import matplotlib.pyplot as plt
+
+    x_edges = np.linspace(fluxes_embedded[:, 0].min(), fluxes_embedded[:, 0].max(), bins + 1)
+    y_edges = np.linspace(fluxes_embedded[:, 1].min(), fluxes_embedded[:, 1].max(), bins + 1)
+    counts = np.zeros((len(classes), bins, bins))
+    for i in range(len(classes)):
+        mask = (labels == i)
+        counts[i] = np.histogram2d(fluxes_embedded[mask, 1], fluxes_embedded[mask, 0], bins=(y_edges, x_edges))[0]
+
+    colours = plt.get_cmap("tab10")(np.arange(len(classes)) % 10)[:, :3]
+    total = counts.sum(axis=0)
+    image = np.ones((bins, bins, 4))
+    image[..., :3] = np.einsum("kyx,kc->yxc", counts, colours) / np.maximum(total, 1)[..., None]
+    image[..., 3] = np.log1p(total) / max(np.log1p(total.max()), 1e-12)
+    plt.imsave(file_path, image[::-1])
 
 def main(config_path: str, result_dir_path: str) -> None:
     """
     Loads config, reads data from provided HDF5 file, applies t-SNE on data, then saves result.
+    Plot is saved, unless config's save_plot is false.
+
+    Optional config's keys for big data:
+        max_samples: stratified subsample of spectra by label, 0 means all spectra.
+        chunk_size: number of spectra read from HDF5 file at once, 0 means all spectra.
+        pca_components: number of PCA components computed before t-SNE, 0 means no PCA.
+        method: t-SNE method, one of exact, barnes_hut, fft.
+        n_jobs: number of t-SNE threads.
+        plot: scatter or density, density image is rasterized from 2D histogram.
+        tiles: if true, multi-resolution tiles of the plot are written to directory dim_reduc_tiles.
+
+    Timing and memory of stages are saved to metrics.json, config's profile_stage and profile_mode 
+    optionally enable profiling of one stage, see metrics.Metrics.
     
     Parameters:
         config_path (str): path to config file.
@@ -37,19 +242,25 @@ def main(config_path: str, result_dir_path: str) -> None:
     with open(config_path) as f:
         config = json.load(f)
     
-    fluxes, labels = read_data(config["data_path"])
+    metrics = Metrics(result_dir_path, config.get("profile_stage", ""), config.get("profile_mode", "cprofile"))
+    with metrics.stage("read_data") as stage:
+        labels = read_labels(config["data_path"])
+        rows = get_stratified_rows(labels, config.get("max_samples", 0))
+        labels = labels[rows]
+        features = read_features(config["data_path"], rows, config.get("chunk_size", 0), 
+                                 config.get("pca_components", 0))
+        stage["rows"] = rows.shape[0]
     classes = config["classes"]
 
-    tsne = TSNE(n_components=2, random_state=42, perplexity=30)
-    fluxes_embedded = tsne.fit_transform(fluxes)
+    with metrics.stage("embed", rows.shape[0]):
+        fluxes_embedded = embed(features, config.get("method", "barnes_hut"), config.get("n_jobs"))
 
-    plt.figure(figsize=(8, 6))
-    for i, class_name in enumerate(classes):
-        mask = (labels == i)
-        plt.scatter(fluxes_embedded[mask, 0], fluxes_embedded[mask, 1], label=class_name)
-
-    plt.title("t-SNE vizualization")
-    plt.savefig(result_dir_path + "/t-sne.png")
+    if config.get("save_plot", True):
+        with metrics.stage("save_plot", rows.shape[0]):
+            if config.get("plot", "scatter") == "density":
+                save_density_plot(fluxes_embedded, labels, classes, result_dir_path + "/t-sne.png")
+            else:
+                save_plot(fluxes_embedded, labels, classes, result_dir_path + "/t-sne.png")
 
 
     data = {
@@ -59,9 +270,13 @@ def main(config_path: str, result_dir_path: str) -> None:
         "classes": classes
     }
 
-    with open(result_dir_path + "/dim_reduc.json", "w") as f:
-        json.dump(data, f, indent=4)
+    with metrics.stage("write_result", rows.shape[0]):
+        with open(result_dir_path + "/dim_reduc.json", "w") as f:
+            json.dump(data, f, indent=4)
 
+        if config.get("tiles", False):
+            tiles.write_tiles(result_dir_path + "/dim_reduc_tiles", fluxes_embedded, labels, classes)
+    metrics.write()
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
@@ -0,0 +1,134 @@
+import json
+import sys
+from pathlib import Path
+
+import h5py
+import numpy as np
+from numpy.typing import NDArray
+
+# Modules shared by all jobs are in directory common next to directories of jobs.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+import filename_index
+from metrics import Metrics
+
+def read_pool_layout(file_paths: list[str]) -> tuple[NDArray[float], list[int], np.dtype]:
+    """
+    Reads wave and shapes of pool data from HDF5 files and checks, that they can be composed.
+    HDF5 files must contain following datasets: filenames, wave, fluxes.
+
+    Parameters:
+        file_paths (list[str]): paths to HDF5 files with pool data, e.g. results of preprocessing jobs.
+
+    Returns:
+        Tuple[NDArray[float], list[int], np.dtype]:
+            1D array of spectra wave, same for all files.
+            Number of spectra in every file.
+            Data type of fluxes, same for all files.
+    """
+    if not file_paths:
+        raise ValueError("No pool data to compose")
+
+    wave, counts, dtype = None, [], None
+    for file_path in file_paths:
+        with h5py.File(file_path, "r") as h5f:
+            file_wave = h5f["wave"][:]
+            if wave is None:
+                wave, dtype = file_wave, h5f["fluxes"].dtype
+            elif not np.array_equal(wave, file_wave):
+                raise ValueError(f"Different waves in '{file_paths[0]}' and '{file_path}'")
+            elif h5f["fluxes"].dtype != dtype:
+                raise ValueError(f"Different data types of fluxes in '{file_paths[0]}' and '{file_path}'")
+
+            if h5f["fluxes"].shape != (h5f["filenames"].shape[0], wave.shape[0]):
+                raise ValueError(f"Fluxes don't match filenames and wave in '{file_path}'")
+            counts.append(h5f["filenames"].shape[0])
+
+    return wave, counts, dtype
+
+def compose_pool(file_paths: list[str], result_path: str) -> None:
+    """
+    Composes pool data from several HDF5 files into one HDF5 file without copying spectra.
+
+    Datasets filenames and fluxes of the result are HDF5 virtual datasets, which concatenate 
+    corresponding datasets of source files in the given order. Sources are referenced by absolute path,
+    so they must stay on their place while the composed pool is used. Only wave is copied.
+
+    Parameters:
+        file_paths (list[str]): paths to HDF5 files with pool data, e.g. results of preprocessing jobs.
+        result_path (str): path to HDF5 file, where composed pool will be written.
+    """
+    wave, counts, dtype = read_pool_layout(file_paths)
+    total, points = sum(counts), wave.shape[0]
+
+    filenames_layout = h5py.VirtualLayout(shape=(total,), dtype=h5py.string_dtype("utf-8"))
+    fluxes_layout = h5py.VirtualLayout(shape=(total, points), dtype=dtype)
+    start = 0
+    for file_path, count in zip(file_paths, counts):
+        source_path = str(Path(file_path).resolve())
+        filenames_layout[start:start + count] = h5py.VirtualSource(source_path, "filenames", shape=(count,))
+        fluxes_layout[start:start + count] = h5py.VirtualSource(source_path, "fluxes", shape=(count, points))
+        start += count
+
+    with h5py.File(result_path, "w") as h5f:
+        h5f.create_virtual_dataset("filenames", filenames_layout)
+        h5f.create_dataset("wave", data=wave)
+        h5f.create_virtual_dataset("fluxes", fluxes_layout)
+
+def read_filename_hashes(file_path: str) -> NDArray[np.uint64]:
+    """
+    Reads filename hashes of every spectrum of HDF5 file in order of rows. 
+    They are taken from filename index of the file, if it has one, otherwise they are computed from filenames.
+
+    Parameters:
+        file_path (str): path to HDF5 file with pool data.
+
+    Returns:
+        NDArray[np.uint64]: 1D array of filename hashes.
+    """
+    with h5py.File(file_path, "r") as h5f:
+        if "filename_index_hashes" not in h5f:
+            return filename_index.get_filename_hashes(h5f["filenames"].asstr()[:])
+
+        hashes = np.empty(h5f["filename_index_hashes"].shape[0], dtype=np.uint64)
+        hashes[h5f["filename_index_rows"][:]] = h5f["filename_index_hashes"][:]
+        return hashes
+
+def write_filename_index(file_paths: list[str], result_path: str) -> None:
+    """
+    Writes filename index of composed pool, so active learning can look up its spectra without reading 
+    all filenames. Hashes are concatenated from indexes of source files, see read_filename_hashes.
+
+    Parameters:
+        file_paths (list[str]): paths to HDF5 files with pool data, in the order of composition.
+        result_path (str): path to HDF5 file with composed pool.
+    """
+    hashes = np.concatenate([read_filename_hashes(file_path) for file_path in file_paths])
+    with h5py.File(result_path, "a") as h5f:
+        filename_index.write_filename_index(h5f, hashes)
+
+def main(config_path: str, result_dir_path: str) -> None:
+    """
+    Loads config, then composes pool data from provided HDF5 files and writes their filename index.
+    Timing and memory of stages are saved to metrics.json.
+    
+    Parameters:
+        config_path (str): path to config file.
+        result_dir_path (str): path to directory, where result will be saved.
+    """
+    with open(config_path) as f:
+        config = json.load(f)
+
+    metrics = Metrics(result_dir_path, config.get("profile_stage", ""), config.get("profile_mode", "cprofile"))
+    result_path = f'{result_dir_path}/result.h5'
+    with metrics.stage("compose_pool") as stage:
+        compose_pool(config["data_paths"], result_path)
+        with h5py.File(result_path, "r") as h5f:
+            stage["rows"] = h5f["filenames"].shape[0]
+    with metrics.stage("write_filename_index", stage["rows"]):
+        write_filename_index(config["data_paths"], result_path)
+    metrics.write()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        raise Exception("Enter only path to config and path to save results")
+    main(sys.argv[1], sys.argv[2])
@@ -1,18 +1,42 @@
+import gzip
+import io
 import json
+import os
 import sys
+import tarfile
 import numpy as np
-from astropy.io import fits
-from sklearn.preprocessing import minmax_scale
 from pathlib import Path
 import h5py
+import shutil
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from numpy.typing import NDArray 
+from typing import Any, BinaryIO
 
-def read_spectrum(file_path: str) -> tuple[str, NDArray[float], NDArray[float]]:
+# Modules shared by all jobs are in directory common next to directories of jobs.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+import filename_index
+import hdf5_layout
+import resampling
+from metrics import Metrics
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 2
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz")
+FITS_SUFFIXES = (".fits", ".fit", ".fits.gz", ".fit.gz")
+GZIP_MAGIC = b"\x1f\x8b"
+DEFAULT_CHUNK_SIZE = 1024
+FICLONE = 0x40049409
+
+def read_spectrum(file: str | Path | BinaryIO) -> tuple[str, NDArray[float], NDArray[float]]:
     """
-    Reads LAMOST DR2 spectrum from FITS file.
+    Reads LAMOST DR2 spectrum from FITS file, the file can be gzip compressed.
+    Only header and used rows of the data are read: flux (row 0) and wave (row 2).
 
     Parameters:
-        file_path (str): path to LAMOST DR2 FITS file.
+        file (str | Path | BinaryIO): path to LAMOST DR2 FITS file or opened FITS file object.
     
     Returns:
         Tuple[str, NDArray[float], NDArray[float]:
@@ -20,23 +44,246 @@ def read_spectrum(file_path: str) -> tuple[str, NDArray[float], NDArray[float]]:
             1D array of raw spectrum wave.
             1D array of raw spectrum flux.
     """
-    with fits.open(file_path) as hdul:
+    from astropy.io import fits
+
+    with fits.open(file) as hdul:
         filename = hdul[0].header["FILENAME"]
-        wave = hdul[0].data[2]
-        flux = hdul[0].data[0]
+        wave = hdul[0].section[2]
+        flux = hdul[0].section[0]
 
     return filename, wave, flux
 
+def read_source_spectrum(source: Path | bytes) -> tuple[str, NDArray[float], NDArray[float]]:
+    """
+    Reads LAMOST DR2 spectrum from FITS file or from content of FITS archive member.
+    Gzip compressed content is decompressed in memory.
+
+    Parameters:
+        source (Path | bytes): path to FITS file or content of archive member.
+
+    Returns:
+        Tuple[str, NDArray[float], NDArray[float]:
+            Spectrum filename.
+            1D array of raw spectrum wave.
+            1D array of raw spectrum flux.
+    """
+    if isinstance(source, Path):
+        return read_spectrum(source)
+    if source[:2] == GZIP_MAGIC:
+        source = gzip.decompress(source)
+    return read_spectrum(io.BytesIO(source))
+
+def list_source_files(src_path: str) -> list[Path]:
+    """
+    Lists source files of the directory in sorted order.
+
+    Parameters:
+        src_path (str): path to directory containing LAMOST DR2 FITS files or archives.
+
+    Returns:
+        list[Path]: sorted paths to source files.
+    """
+    return sorted(Path(src_path).iterdir())
+
+def is_archive(file_path: Path) -> bool:
+    """
+    Checks whether the source file is tar archive, by its suffix.
+
+    Parameters:
+        file_path (Path): path to source file.
+
+    Returns:
+        bool: True if the file is tar archive.
+    """
+    return file_path.name.endswith(ARCHIVE_SUFFIXES)
+
+def iter_sources(file_paths: list[Path]) -> Iterator[tuple[str, str, Path | bytes]]:
+    """
+    Iterates spectrum sources of source files.
+
+    Every FITS file (plain or gzip compressed) is one source. Every FITS member of tar archive
+    (.tar, .tar.gz, .tgz) is one source, archive is read as a stream and members are read one at a time.
+
+    Parameters:
+        file_paths (list[Path]): paths to source files.
+
+    Yields:
+        Tuple[str, str, Path | bytes]:
+            Source file name.
+            Archive member name, empty for FITS file.
+            Path to FITS file or content of archive member.
+    """
+    for f in file_paths:
+        if not is_archive(f):
+            yield f.name, "", f
+            continue
+
+        with tarfile.open(f, "r|*") as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith(FITS_SUFFIXES):
+                    yield f.name, member.name, tar.extractfile(member).read()
+
+def preprocess_sources(sources: list[Path | bytes], new_wave: NDArray[float], dtype: np.dtype = np.float64
+                       ) -> tuple[NDArray[str], NDArray[NDArray[float]]]:
+    """
+    Reads LAMOST DR2 spectra, interpolates fluxes to the new wave and scales them.
+    Spectra sharing the same source wave are interpolated together, see resampling.resample.
+
+    Parameters:
+        sources (list[Path | bytes]): paths to FITS files or contents of archive members.
+        new_wave (NDArray[float]): 1D array of wave to interpolate on.
+        dtype (np.dtype): data type of preprocessed fluxes, interpolation and scaling is done in float64.
+
+    Returns:
+        Tuple[NDArray[str], NDArray[NDArray[float]]]:
+            1D array of spectra filenames.
+            2D array of preprocessed fluxes.
+    """
+    filename_list = []
+
+    def read_spectra() -> Iterator[tuple[NDArray[float], NDArray[float]]]:
+        for source in sources:
+            filename, wave, flux = read_source_spectrum(source)
+            filename_list.append(filename)
+            yield wave, flux
+
+    from sklearn.preprocessing import minmax_scale
+
+    fluxes = resampling.resample(new_wave, read_spectra())
+    filenames = np.array(filename_list)
+    fluxes = minmax_scale(fluxes, feature_range=(-1, 1), axis=1, copy=False)
+
+    return filenames, fluxes.astype(dtype, copy=False)
+
+def get_chunk_keys(chunk: list[tuple[str, str, Path | bytes]]) -> list[tuple[str, str]]:
+    """
+    Gets source file and archive member names of spectrum sources.
+
+    Parameters:
+        chunk (list[tuple[str, str, Path | bytes]]): spectrum sources, see iter_sources.
+
+    Returns:
+        list[tuple[str, str]]: source file and archive member name of every source.
+    """
+    return [(file_name, member_name) for file_name, member_name, _ in chunk]
+
+def iter_preprocessed_chunks(sources: Iterable[tuple[str, str, Path | bytes]], new_wave: NDArray[float], 
+                             chunk_size: int, num_workers: int = 1, dtype: np.dtype = np.float64
+                             ) -> Iterator[tuple[list[tuple[str, str]], NDArray[str], NDArray[NDArray[float]]]]:
+    """
+    Preprocesses spectrum sources chunk by chunk, chunks are yielded in the order of sources.
+    Sources are consumed lazily, only when the chunk is submitted.
+
+    If num_workers is greater than 1, chunks are processed in a process pool, 
+    at most 2 * num_workers chunks are processed or waiting at the same time.
+
+    Parameters:
+        sources (Iterable[tuple[str, str, Path | bytes]]): spectrum sources, see iter_sources.
+        new_wave (NDArray[float]): 1D array of wave to interpolate on.
+        chunk_size (int): number of spectra in one chunk.
+        num_workers (int): number of worker processes, 1 means serial run.
+        dtype (np.dtype): data type of preprocessed fluxes.
+
+    Yields:
+        Tuple[list[tuple[str, str]], NDArray[str], NDArray[NDArray[float]]]:
+            Source file and archive member names of the chunk.
+            1D array of spectra filenames of the chunk.
+            2D array of preprocessed fluxes of the chunk.
+    """
+    sources = iter(sources)
+    chunks = iter(lambda: list(islice(sources, chunk_size)), [])
+    if num_workers <= 1:
+        for chunk in chunks:
+            yield get_chunk_keys(chunk), *preprocess_sources([source for *_, source in chunk], new_wave, dtype)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= 2 * num_workers:
+                keys, future = pending.popleft()
+                yield keys, *future.result()
+            future = executor.submit(preprocess_sources, [source for *_, source in chunk], new_wave, dtype)
+            pending.append((get_chunk_keys(chunk), future))
+        while pending:
+            keys, future = pending.popleft()
+            yield keys, *future.result()
+
+def collect_preprocessed_chunks(file_paths: list[Path], new_wave: NDArray[float], num_workers: int = 1, 
+                                dtype: np.dtype = np.float64
+                                ) -> tuple[list[tuple[str, str]], NDArray[str], NDArray[NDArray[float]]]:
+    """
+    Preprocesses all spectra of source files in memory.
+
+    Parameters:
+        file_paths (list[Path]): paths to source files.
+        new_wave (NDArray[float]): 1D array of wave to interpolate on.
+        num_workers (int): number of worker processes, 1 means serial run.
+        dtype (np.dtype): data type of preprocessed fluxes.
+
+    Returns:
+        Tuple[list[tuple[str, str]], NDArray[str], NDArray[NDArray[float]]]:
+            Source file and archive member names of every spectrum.
+            1D array of spectra filenames.
+            2D array of preprocessed fluxes.
+    """
+    chunk_size = DEFAULT_CHUNK_SIZE
+    if num_workers > 1 and not any(is_archive(f) for f in file_paths):
+        chunk_size = max(1, min(DEFAULT_CHUNK_SIZE, len(file_paths) // (num_workers * 4)))
+    chunks = list(iter_preprocessed_chunks(iter_sources(file_paths), new_wave, chunk_size, num_workers, dtype))
+
+    keys = [key for c_keys, _, _ in chunks for key in c_keys]
+    filenames = np.concatenate([c_filenames for _, c_filenames, _ in chunks]) if chunks else np.array([])
+    fluxes = (np.concatenate([c_fluxes for _, _, c_fluxes in chunks]) if chunks 
+              else np.empty((0, new_wave.shape[0]), dtype=dtype))
+
+    return keys, filenames, fluxes
+
+def get_rows(keys: list[tuple[str, str]], start: int = 0) -> dict[str, dict[str, int]]:
+    """
+    Gets rows of spectra in the preprocessed data.
+
+    Parameters:
+        keys (list[tuple[str, str]]): source file and archive member names of spectra, in order of rows.
+        start (int): row of the first spectrum.
+
+    Returns:
+        dict[str, dict[str, int]]: source file name mapped to its archive member names mapped to their rows.
+    """
+    rows = {}
+    for row, (file_name, member_name) in enumerate(keys, start):
+        rows.setdefault(file_name, {})[member_name] = row
+    return rows
+
+def get_spectrum_count(rows: dict[str, dict[str, int]]) -> int:
+    """
+    Gets number of spectra in the preprocessed data.
+
+    Parameters:
+        rows (dict[str, dict[str, int]]): rows of spectra, see get_rows.
+
+    Returns:
+        int: number of spectra.
+    """
+    return sum(len(file_rows) for file_rows in rows.values())
+
 def preprocess_lamost_dr2_dir(src_path: str, start: float, end: float, 
-                              points: int) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
+                              points: int, num_workers: int = 1, dtype: np.dtype = np.float64
+                              ) -> tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
     """
     Preprocess directory containing LAMOST DR2 FITS files.
 
+    Directory can contain FITS files, gzip compressed FITS files and tar archives of them, see iter_sources.
+    Files are processed in sorted order. If num_workers is greater than 1, files are read 
+    and interpolated in a process pool, the order of the result is the same as in serial run.
+
     Parameters:
         src_path (str): path to directory containing LAMOST DR2 FITS file.
         start (float): starting wavelength in angstroms.
         end (float): ending wavelength in angstroms.
         points (int): count of fluxes within the selected wavelength interval.
+        num_workers (int): number of worker processes, 1 means serial run.
+        dtype (np.dtype): data type of preprocessed wave and fluxes.
 
     Returns:
         Tuple[NDArray[str], NDArray[float], NDArray[NDArray[float]]]:
@@ -44,44 +291,264 @@ def preprocess_lamost_dr2_dir(src_path: str, start: float, end: float,
             1D array of preprocessed spectra wave.
             2D array of preprocessed fluxes.
     """
-    src_dir = Path(src_path)
+    new_wave = np.linspace(start, end, points, dtype=float)
+    _, filenames, fluxes = collect_preprocessed_chunks(list_source_files(src_path), new_wave, num_workers, dtype)
 
-    filename_list = []
-    flux_list = []
+    return filenames, np.array(new_wave, dtype=dtype), fluxes
+
+def preprocess_lamost_dr2_dir_to_file(src_path: str, file_path: str, start: float, end: float, 
+                                      points: int, chunk_size: int, num_workers: int = 1, 
+                                      dataset_options: dict[str, Any] | None = None, 
+                                      dtype: np.dtype = np.float64) -> dict[str, dict[str, int]]:
+    """
+    Preprocess directory containing LAMOST DR2 FITS files and streams the result to HDF5 file.
+
+    Files are processed in sorted order by chunks of chunk_size spectra, every chunk is appended
+    to the resizable datasets right after it is preprocessed, so the memory usage depends 
+    on the chunk size, not on the number of files.
+
+    Parameters:
+        src_path (str): path to directory containing LAMOST DR2 FITS file.
+        file_path (str): path to HDF5, where preprocessed data will be written.
+        start (float): starting wavelength in angstroms.
+        end (float): ending wavelength in angstroms.
+        points (int): count of fluxes within the selected wavelength interval.
+        chunk_size (int): number of spectra preprocessed at once.
+        num_workers (int): number of worker processes, 1 means serial run.
+        dataset_options (dict[str, Any] | None): HDF5 storage options of fluxes dataset, 
+            see hdf5_layout.get_flux_dataset_options.
+        dtype (np.dtype): data type of preprocessed wave and fluxes.
+
+    Returns:
+        dict[str, dict[str, int]]: rows of written spectra, see get_rows.
+    """
     new_wave = np.linspace(start, end, points, dtype=float)
-    for f in src_dir.iterdir():
-        filename, wave, flux = read_spectrum(f)
-        new_flux = np.interp(new_wave, wave, flux)
-        filename_list.append(filename)
-        flux_list.append(new_flux)
-        
-    filenames = np.array(filename_list)
-    wave = np.array(new_wave, dtype=np.float64)
-    fluxes = np.array(flux_list, dtype=np.float64)
-    fluxes = minmax_scale(fluxes, feature_range=(-1, 1), axis=1, copy=False)
+    keys = []
+
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("filenames", shape=(0,), maxshape=(None,), chunks=(chunk_size,),
+                           dtype=h5py.string_dtype("utf-8"))
+        h5f.create_dataset("wave", data=np.array(new_wave, dtype=dtype))
+        h5f.create_dataset("fluxes", shape=(0, points), dtype=dtype,
+                           **(dataset_options or hdf5_layout.get_flux_dataset_options({}, points, dtype)))
 
-    return filenames, wave, fluxes
+        sources = iter_sources(list_source_files(src_path))
+        for c_keys, filenames, fluxes in iter_preprocessed_chunks(sources, new_wave, chunk_size, num_workers, dtype):
+            append_preprocessed_data(h5f, filenames, fluxes)
+            keys.extend(c_keys)
+
+    return get_rows(keys)
 
 def write_preprocessed_data(file_path: str, filenames: NDArray[str], wave: NDArray[float], 
-                            fluxes: NDArray[NDArray[float]]) -> None:
+                            fluxes: NDArray[NDArray[float]], 
+                            dataset_options: dict[str, Any] | None = None) -> None:
     """
     Writes the preprocessed data to HDF5 file.
+    Datasets filenames and fluxes are resizable, so the file can be updated by the next run.
 
     Parameters:
         file_path (str): path to HDF5, where training data will be written.
         filenames (NDArray[str]): 1D array containing spectrum filenames.
         wave (NDArray[float]): 1D array containing spectrum preprocessed wave.
         fluxes (NDArray[NDArray[float]]): 2D array containing spectrum prepricessed fluxes.
+        dataset_options (dict[str, Any] | None): HDF5 storage options of fluxes dataset, 
+            see hdf5_layout.get_flux_dataset_options.
     """
 
     with h5py.File(file_path, "w") as h5f:
-        h5f.create_dataset("filenames", data=filenames.tolist(), dtype=h5py.string_dtype("utf-8"))
+        h5f.create_dataset("filenames", data=filenames.tolist(), maxshape=(None,), 
+                           dtype=h5py.string_dtype("utf-8"))
         h5f.create_dataset("wave", data=wave)
-        h5f.create_dataset("fluxes", data=fluxes)
+        h5f.create_dataset("fluxes", data=fluxes, 
+                           **(dataset_options or hdf5_layout.get_flux_dataset_options({}, fluxes.shape[1], 
+                                                                                      fluxes.dtype)))
+
+def append_preprocessed_data(h5f: h5py.File, filenames: NDArray[str], 
+                             fluxes: NDArray[NDArray[float]]) -> None:
+    """
+    Appends the preprocessed data to the resizable datasets of opened HDF5 file.
+
+    Parameters:
+        h5f (h5py.File): HDF5 file opened for writing, contains resizable datasets filenames and fluxes.
+        filenames (NDArray[str]): 1D array containing spectrum filenames.
+        fluxes (NDArray[NDArray[float]]): 2D array containing spectrum prepricessed fluxes.
+    """
+    start, end = h5f["filenames"].shape[0], h5f["filenames"].shape[0] + filenames.shape[0]
+    h5f["filenames"].resize((end,))
+    h5f["fluxes"].resize((end, h5f["fluxes"].shape[1]))
+    h5f["filenames"][start:end] = filenames.tolist()
+    h5f["fluxes"][start:end] = fluxes
+
+def write_filename_index(file_path: str) -> None:
+    """
+    Writes sorted index of filenames to HDF5 file with preprocessed data, replacing the old one.
+    Index consists of datasets filename_index_hashes with sorted filename hashes, 
+    and filename_index_rows with corresponding rows.
+
+    Parameters:
+        file_path (str): path to HDF5 file with preprocessed data.
+    """
+    with h5py.File(file_path, "a") as h5f:
+        filename_index.write_filename_index(h5f, filename_index.get_filename_hashes(h5f["filenames"].asstr()[:]))
+
+def get_source_state(file_paths: list[Path]) -> dict[str, dict[str, int]]:
+    """
+    Gets size and modification time of every source file.
+
+    Parameters:
+        file_paths (list[Path]): paths to LAMOST DR2 FITS files.
+
+    Returns:
+        dict[str, dict[str, int]]: file name mapped to its size and modification time in nanoseconds.
+    """
+    state = {}
+    for f in file_paths:
+        stat = f.stat()
+        state[f.name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return state
+
+def get_preprocessing_params(config: dict[str, Any]) -> dict[str, Any]:
+    """
+    Gets parameters from config, which change content of the preprocessed data.
+
+    Parameters:
+        config (dict[str, Any]): preprocessing configuration, loaded from configuration file.
+
+    Returns:
+        dict[str, Any]: parameters, which must be same to reuse previously preprocessed data.
+    """
+    return {
+        "wave_start_point": float(config["wave_start_point"]),
+        "wave_end_point": float(config["wave_end_point"]),
+        "wave_point_count": int(config["wave_point_count"]),
+        "precision": config.get("precision", "float64"),
+    }
+
+def read_manifest(file_path: str) -> dict[str, Any] | None:
+    """
+    Reads manifest of the previous preprocessing run.
+
+    Parameters:
+        file_path (str): path to manifest JSON file.
+
+    Returns:
+        Manifest with keys version, params and files, 
+        None if manifest doesn't exist or was written by other version.
+    """
+    if not Path(file_path).is_file():
+        return None
+
+    with open(file_path) as f:
+        manifest = json.load(f)
+
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def write_manifest(file_path: str, params: dict[str, Any], state: dict[str, dict[str, int]], 
+                   rows: dict[str, dict[str, int]]) -> None:
+    """
+    Writes manifest of preprocessed source files.
+
+    Parameters:
+        file_path (str): path to manifest JSON file.
+        params (dict[str, Any]): preprocessing parameters.
+        state (dict[str, dict[str, int]]): source file name mapped to its size and modification time.
+        rows (dict[str, dict[str, int]]): rows of spectra in the preprocessed data, see get_rows.
+    """
+    files = {name: {**file_state, "rows": rows.get(name, {})} for name, file_state in state.items()}
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "params": params, "files": files}, f)
+    os.replace(tmp_path, file_path)
+
+def clone_file(src_path: str, dst_path: str) -> None:
+    """
+    Copies file through temporary file, so incomplete copy is never left under the destination name.
+    On file systems with copy-on-write (btrfs, XFS) the copy shares data with the source file,
+    so only parts rewritten later are really copied. Otherwise the whole file is copied.
+
+    Parameters:
+        src_path (str): path to copied file.
+        dst_path (str): path to the copy.
+    """
+    tmp_path = f"{dst_path}.tmp"
+    try:
+        import fcntl
+        with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except (ImportError, OSError):
+        shutil.copyfile(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+
+def update_preprocessed_file(src_files: list[Path], file_path: str, manifest: dict[str, Any], 
+                             state: dict[str, dict[str, int]], chunk_size: int, 
+                             num_workers: int = 1) -> dict[str, dict[str, int]] | None:
+    """
+    Preprocesses only new and changed source files and updates existing HDF5 file.
+
+    Rows of spectra from changed files are rewritten in place, new spectra are appended to the end.
+    Manifest is written only after the update, so spectra appended by interrupted update are not 
+    in the manifest. They are removed first, so they are not duplicated.
+
+    Parameters:
+        src_files (list[Path]): paths to source files, which must contain all files from manifest.
+        file_path (str): path to HDF5 file written by previous run.
+        manifest (dict[str, Any]): manifest of previous run.
+        state (dict[str, dict[str, int]]): current size and modification time of source files.
+        chunk_size (int): number of spectra preprocessed at once.
+        num_workers (int): number of worker processes, 1 means serial run.
+
+    Returns:
+        Rows of spectra in the updated data (see get_rows), 
+        None if some changed archive doesn't contain spectra from previous run anymore.
+    """
+    old_files = manifest["files"]
+    rows = {name: dict(file_info["rows"]) for name, file_info in old_files.items()}
+    changed_files = [f for f in src_files if f.name not in old_files or 
+                     (old_files[f.name]["size"], old_files[f.name]["mtime_ns"]) != 
+                     (state[f.name]["size"], state[f.name]["mtime_ns"])]
+    seen_keys = set()
+
+    params = manifest["params"]
+    new_wave = np.linspace(params["wave_start_point"], params["wave_end_point"], 
+                           params["wave_point_count"], dtype=float)
+    with h5py.File(file_path, "r+") as h5f:
+        count = get_spectrum_count(rows)
+        if h5f["filenames"].shape[0] > count:
+            h5f["filenames"].resize((count,))
+            h5f["fluxes"].resize((count, h5f["fluxes"].shape[1]))
+        dtype = h5f["fluxes"].dtype
+        sources = iter_sources(changed_files)
+        for keys, filenames, fluxes in iter_preprocessed_chunks(sources, new_wave, chunk_size, num_workers, dtype):
+            seen_keys.update(keys)
+            new_indexes = []
+            for i, (file_name, member_name) in enumerate(keys):
+                row = rows.get(file_name, {}).get(member_name)
+                if row is None:
+                    new_indexes.append(i)
+                    continue
+                h5f["filenames"][row] = filenames[i]
+                h5f["fluxes"][row] = fluxes[i]
+
+            new_keys = [keys[i] for i in new_indexes]
+            for file_name, file_rows in get_rows(new_keys, h5f["filenames"].shape[0]).items():
+                rows.setdefault(file_name, {}).update(file_rows)
+            append_preprocessed_data(h5f, filenames[new_indexes], fluxes[new_indexes])
+
+    for f in changed_files:
+        if any((f.name, member_name) not in seen_keys for member_name in rows.get(f.name, {})):
+            return None
+
+    return rows
 
 def main(config_path: str, result_dir_path: str) -> None:
     """
     Loads config, then starts preprocessing.
+
+    If result directory or config's base_result_dir_path contains result and manifest of previous run
+    with same preprocessing parameters, only new and changed source files are preprocessed.
+    Result of base directory is copied only then, and it is left unchanged.
+    Otherwise, or if some source file or spectrum was removed, the whole directory is preprocessed.
+    Timing and memory of stages are saved to metrics.json.
     
     Parameters:
         config_path (str): path to config file.
@@ -89,11 +556,57 @@ def main(config_path: str, result_dir_path: str) -> None:
     """
     with open(config_path) as f:
         config = json.load(f)
-    
-    filenames, wave, fluxes = preprocess_lamost_dr2_dir(config["data_dir_path"], config["wave_start_point"], 
-                                                   config["wave_end_point"], config["wave_point_count"])
-    
-    write_preprocessed_data(f'{result_dir_path}/result.h5', filenames, wave, fluxes)
+
+    metrics = Metrics(result_dir_path, config.get("profile_stage", ""), config.get("profile_mode", "cprofile"))
+    result_path = f'{result_dir_path}/result.h5'
+    manifest_path = f'{result_dir_path}/{MANIFEST_FILENAME}'
+    base_dir = config.get("base_result_dir_path", "")
+    if not base_dir or Path(base_dir).resolve() == Path(result_dir_path).resolve():
+        base_dir = result_dir_path
+
+    with metrics.stage("list_source_files") as stage:
+        src_files = list_source_files(config["data_dir_path"])
+        state = get_source_state(src_files)
+        stage["rows"] = len(src_files)
+    params = get_preprocessing_params(config)
+    base_path = f'{base_dir}/result.h5'
+    manifest = read_manifest(f'{base_dir}/{MANIFEST_FILENAME}') if Path(base_path).is_file() else None
+    chunk_size = config.get("chunk_size", 0)
+    num_workers = config.get("num_workers", 1)
+    dtype = np.dtype(params["precision"])
+    dataset_options = hdf5_layout.get_flux_dataset_options(config, params["wave_point_count"], dtype)
+
+    rows = None
+    if manifest is not None and manifest["params"] == params and manifest["files"].keys() <= state.keys():
+        if base_dir != result_dir_path:
+            with metrics.stage("copy_base_result"):
+                clone_file(base_path, result_path)
+        with metrics.stage("update_preprocessed_file") as stage:
+            rows = update_preprocessed_file(src_files, result_path, manifest, state, 
+                                            chunk_size if chunk_size > 0 else DEFAULT_CHUNK_SIZE, 
+                                            num_workers)
+            stage["rows"] = get_spectrum_count(rows) if rows is not None else None
+
+    if rows is None:
+        with metrics.stage("preprocess") as stage:
+            if chunk_size > 0:
+                rows = preprocess_lamost_dr2_dir_to_file(config["data_dir_path"], result_path, 
+                                                         config["wave_start_point"], config["wave_end_point"], 
+                                                         config["wave_point_count"], chunk_size, num_workers, 
+                                                         dataset_options, dtype)
+            else:
+                new_wave = np.linspace(params["wave_start_point"], params["wave_end_point"], 
+                                       params["wave_point_count"], dtype=float)
+                keys, filenames, fluxes = collect_preprocessed_chunks(src_files, new_wave, num_workers, dtype)
+                write_preprocessed_data(result_path, filenames, np.array(new_wave, dtype=dtype), fluxes, 
+                                        dataset_options)
+                rows = get_rows(keys)
+            stage["rows"] = get_spectrum_count(rows)
+
+    with metrics.stage("write_filename_index", get_spectrum_count(rows)):
+        write_filename_index(result_path)
+    write_manifest(manifest_path, params, state, rows)
+    metrics.write()
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
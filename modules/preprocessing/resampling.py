@@ -0,0 +1,116 @@
+import numpy as np
+from collections.abc import Iterable
+from numpy.typing import NDArray
+
+BLOCK_SIZE = 256
+
+def get_grid_key(wave: NDArray[float]) -> tuple[int, float, float, float]:
+    """
+    Gets cheap key of the source wave, spectra with equal waves have equal keys.
+
+    Parameters:
+        wave (NDArray[float]): 1D array of source wave.
+
+    Returns:
+        Tuple[int, float, float, float]: length, first, middle and last point of the wave.
+    """
+    return wave.shape[0], wave[0], wave[wave.shape[0] // 2], wave[-1]
+
+def get_interp_plan(new_wave: NDArray[float], wave: NDArray[float]
+                    ) -> tuple[NDArray[int], NDArray[float], NDArray[float], NDArray[int], NDArray[int]]:
+    """
+    Precomputes indexes and distances needed to interpolate fluxes from the wave to the new wave.
+
+    Parameters:
+        new_wave (NDArray[float]): 1D array of wave to interpolate on.
+        wave (NDArray[float]): 1D array of strictly increasing source wave.
+
+    Returns:
+        Tuple[NDArray[int], NDArray[float], NDArray[float], NDArray[int], NDArray[int]]:
+            1D array of left neighbour indexes followed by right neighbour indexes in the source wave.
+            1D array of distances between left and right neighbours.
+            1D array of distances between new wave points and their left neighbours.
+            1D array of new wave indexes, which take flux of their left neighbour.
+            1D array of new wave indexes, which take flux of their right neighbour.
+    """
+    indexes = np.clip(np.searchsorted(wave, new_wave, side="right") - 1, 0, wave.shape[0] - 2)
+    dx = wave[indexes + 1] - wave[indexes]
+    offsets = new_wave - wave[indexes]
+    from_left = np.flatnonzero((offsets == 0) | (new_wave < wave[0]))
+    from_right = np.flatnonzero(new_wave >= wave[-1])
+
+    return np.concatenate((indexes, indexes + 1)), dx, offsets, from_left, from_right
+
+def blend(plan: tuple[NDArray[int], NDArray[float], NDArray[float], NDArray[int], NDArray[int]],
+          neighbours: NDArray[NDArray[float]]) -> NDArray[NDArray[float]]:
+    """
+    Interpolates fluxes from their gathered neighbours, same operations as np.interp are used.
+
+    Parameters:
+        plan (tuple): interpolation plan of the source wave, see get_interp_plan.
+        neighbours (NDArray[NDArray[float]]): 2D array of left neighbour fluxes followed by right neighbour fluxes.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of fluxes on the new wave.
+    """
+    _, dx, offsets, from_left, from_right = plan
+    points = dx.shape[0]
+    fluxes_left, fluxes_right = neighbours[:, :points], neighbours[:, points:]
+    result = np.subtract(fluxes_right, fluxes_left)
+    result /= dx
+    result *= offsets
+    result += fluxes_left
+    result[:, from_left] = fluxes_left[:, from_left]
+    result[:, from_right] = fluxes_right[:, from_right]
+
+    return result
+
+def resample(new_wave: NDArray[float],
+             spectra: Iterable[tuple[NDArray[float], NDArray[float]]]) -> NDArray[NDArray[float]]:
+    """
+    Interpolates fluxes of spectra to the new wave.
+
+    Spectra are grouped by their source wave. The first spectrum of every wave is interpolated by np.interp.
+    For every next spectrum with strictly increasing wave, only neighbours of the new wave points are gathered
+    from its flux, when all spectra are consumed, every group is interpolated at once by blocks of BLOCK_SIZE spectra.
+    For finite fluxes the result is same as np.interp called on every spectrum.
+
+    Parameters:
+        new_wave (NDArray[float]): 1D array of wave to interpolate on.
+        spectra (Iterable[tuple[NDArray[float], NDArray[float]]]): source wave and flux of every spectrum.
+
+    Returns:
+        NDArray[NDArray[float]]: 2D array of fluxes on the new wave, in the order of input spectra.
+    """
+    grids = {}
+    interpolated = []
+    for row, (wave, flux) in enumerate(spectra):
+        candidates = grids.setdefault(get_grid_key(wave), [])
+        wave_bytes = wave.tobytes()
+        grid = next((grid for grid in candidates if grid["wave_bytes"] == wave_bytes), None)
+        if grid is None:
+            candidates.append({"wave_bytes": wave_bytes, "plan": None, "rows": [], "neighbours": []})
+            interpolated.append((row, np.interp(new_wave, wave, flux)))
+            continue
+
+        if grid["plan"] is None:
+            wave = np.asarray(wave, dtype=np.float64)
+            increasing = wave.shape[0] > 1 and np.all(np.diff(wave) > 0)
+            grid["plan"] = get_interp_plan(new_wave, wave) if increasing else ()
+        if not grid["plan"]:
+            interpolated.append((row, np.interp(new_wave, wave, flux)))
+            continue
+        grid["rows"].append(row)
+        grid["neighbours"].append(flux.take(grid["plan"][0]))
+
+    result = np.empty((len(interpolated) + sum(len(grid["rows"]) for candidates in grids.values()
+                                               for grid in candidates), new_wave.shape[0]), dtype=np.float64)
+    for row, flux in interpolated:
+        result[row] = flux
+    for candidates in grids.values():
+        for grid in candidates:
+            for start in range(0, len(grid["rows"]), BLOCK_SIZE):
+                neighbours = np.stack(grid["neighbours"][start:start + BLOCK_SIZE], dtype=np.float64)
+                result[grid["rows"][start:start + BLOCK_SIZE]] = blend(grid["plan"], neighbours)
+
+    return result
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+MODULES_DIR = Path(__file__).resolve().parent.parent
+for name in ("active_learning", "preprocessing", "dim_reduc", "pool_composition", "common"):
+    sys.path.insert(0, str(MODULES_DIR / name))
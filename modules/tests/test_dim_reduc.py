@@ -0,0 +1,42 @@
+import h5py
+import numpy as np
+import pytest
+from sklearn.decomposition import IncrementalPCA
+
+import job_dim_reduc
+
+def write_fluxes(file_path, rows: int, points: int) -> np.ndarray:
+    fluxes = np.random.default_rng(0).normal(size=(rows, points))
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("fluxes", data=fluxes)
+    return fluxes
+
+@pytest.mark.parametrize("chunk_size", [0, 10])
+def test_pca_components_are_limited_by_spectra(tmp_path, chunk_size):
+    write_fluxes(tmp_path / "data.h5", 40, 60)
+
+    features = job_dim_reduc.read_features(str(tmp_path / "data.h5"), np.arange(40), chunk_size, 50)
+
+    assert features.shape == (40, 40)
+
+def test_short_last_chunk_is_fitted(tmp_path, monkeypatch):
+    write_fluxes(tmp_path / "data.h5", 45, 30)
+    fitted = []
+    partial_fit = IncrementalPCA.partial_fit
+    monkeypatch.setattr(IncrementalPCA, "partial_fit", 
+                        lambda self, chunk: fitted.append(chunk.shape[0]) or partial_fit(self, chunk))
+
+    features = job_dim_reduc.read_features(str(tmp_path / "data.h5"), np.arange(45), 10, 8)
+
+    assert features.shape == (45, 8)
+    assert fitted == [10, 10, 10, 15]
+
+def test_subsample_is_read_by_bounded_blocks(tmp_path, monkeypatch):
+    fluxes = write_fluxes(tmp_path / "data.h5", 100, 4)
+    rows = np.array([0, 3, 50, 51, 99])
+    monkeypatch.setattr(job_dim_reduc, "DEFAULT_BLOCK_SIZE", 16)
+
+    chunks = list(job_dim_reduc.iter_fluxes(str(tmp_path / "data.h5"), rows, 0))
+
+    assert len(chunks) == 1
+    assert np.array_equal(chunks[0], fluxes[rows])
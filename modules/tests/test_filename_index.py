@@ -0,0 +1,187 @@
+import h5py
+import numpy as np
+import pytest
+
+import file_utils
+import filename_index
+import job_preprocessing
+import regular_iteration
+from config import ActiveLearningConfig
+
+CLASSES = ["other", "single peak", "double peak"]
+
+def fnv1a(filename: str) -> int:
+    value = 0xcbf29ce484222325
+    for byte in filename.encode("utf-8"):
+        value = ((value ^ byte) * 0x100000001b3) % 2**64
+    return value
+
+def make_config(tmp_path, **values) -> ActiveLearningConfig:
+    return ActiveLearningConfig.model_validate({
+        "iteration": 1, "classes": CLASSES, "candidate_classes": CLASSES[1:],
+        "pool_data_path": str(tmp_path / "pool.h5"), "result_dir_path": str(tmp_path), **values,
+    })
+
+def write_pool(file_path, filenames, index_hashes=None) -> np.ndarray:
+    fluxes = np.arange(len(filenames) * 4, dtype=float).reshape(-1, 4)
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("filenames", data=list(filenames), dtype=h5py.string_dtype("utf-8"))
+        h5f.create_dataset("wave", data=np.linspace(4000, 5000, 4))
+        h5f.create_dataset("fluxes", data=fluxes)
+        if index_hashes is not None:
+            filename_index.write_filename_index(h5f, index_hashes)
+    return fluxes
+
+def test_hashes_match_fnv1a_reference():
+    filenames = np.array(["", "a", "foobar", "spec-55859-B5585906_sp01-001.fits", "spektrum-é.fits"])
+
+    hashes = filename_index.get_filename_hashes(filenames)
+
+    assert hashes.dtype == np.uint64
+    assert hashes.tolist() == [fnv1a(filename) for filename in filenames]
+    assert hashes[2] == 0x85944171f73967e8
+
+def test_hashes_do_not_depend_on_chunking(monkeypatch):
+    filenames = np.array([f"spec-{i}{'x' * (i % 7)}.fits" for i in range(50)])
+    expected = filename_index.get_filename_hashes(filenames)
+
+    monkeypatch.setattr(filename_index, "HASH_CHUNK_SIZE", 3)
+
+    assert np.array_equal(filename_index.get_filename_hashes(filenames), expected)
+    assert np.array_equal(filename_index.get_filename_hashes(filenames.astype(object)), expected)
+
+def test_preprocessing_index_is_read_by_active_learning(tmp_path):
+    filenames = np.array(["c.fits", "a.fits", "b.fits", "a.fits"])
+    file_path = str(tmp_path / "result.h5")
+    write_pool(file_path, filenames)
+    computed_hashes, computed_rows = file_utils.read_filename_index(file_path)
+
+    job_preprocessing.write_filename_index(file_path)
+    sorted_hashes, rows = file_utils.read_filename_index(file_path)
+
+    assert np.array_equal(sorted_hashes, computed_hashes)
+    assert np.array_equal(rows, computed_rows)
+    assert np.array_equal(file_utils.read_filename_hashes(file_path), file_utils.get_filename_hashes(filenames))
+
+def test_index_round_trip(tmp_path):
+    filenames = np.array([f"spec-{i}.fits" for i in range(20)])[::-1]
+    file_path = str(tmp_path / "pool.h5")
+    write_pool(file_path, filenames, file_utils.get_filename_hashes(filenames))
+
+    sorted_hashes, rows = file_utils.read_filename_index(file_path)
+
+    assert np.all(sorted_hashes[1:] >= sorted_hashes[:-1])
+    assert np.array_equal(file_utils.get_filename_hashes(filenames[rows]), sorted_hashes)
+    assert np.array_equal(file_utils.find_rows(file_path, np.array(["spec-3.fits", "missing.fits", "spec-19.fits"])),
+                          [16, -1, 0])
+
+def test_index_of_referenced_pool(tmp_path):
+    filenames = np.array(["a.fits", "b.fits", "c.fits", "d.fits"])
+    write_pool(str(tmp_path / "pool.h5"), filenames, file_utils.get_filename_hashes(filenames))
+    file_path = str(tmp_path / "result.h5")
+    with h5py.File(file_path, "w") as h5f:
+        file_utils.write_pool_reference(h5f, str(tmp_path / "pool.h5"), np.array([3, 1]))
+
+    assert np.array_equal(file_utils.read_filename_hashes(file_path), file_utils.get_filename_hashes(filenames[[3, 1]]))
+    assert file_utils.read_pool_filenames(file_path, np.array([1, 0])).tolist() == ["b.fits", "d.fits"]
+
+def test_unique_rows_keep_first_spectrum_of_every_filename():
+    filenames = np.array(["a", "b", "a", "c", "b", "d", "e"])
+    hashes = np.array([1, 1, 1, 2, 1, 2, 3], dtype=np.uint64)
+    rows = np.argsort(hashes, kind="stable")
+
+    unique_rows = file_utils.get_unique_rows(hashes[rows], rows, lambda indexes: filenames[indexes])
+
+    assert unique_rows.tolist() == [0, 1, 3, 5, 6]
+
+def test_unique_rows_without_shared_hashes_read_no_filenames():
+    hashes = np.array([3, 1, 2], dtype=np.uint64)
+    rows = np.argsort(hashes, kind="stable")
+
+    def read_filenames(indexes):
+        raise AssertionError("filenames must not be read")
+
+    assert file_utils.get_unique_rows(hashes[rows], rows, read_filenames).tolist() == [0, 1, 2]
+
+def test_member_mask_ignores_colliding_filenames():
+    filenames = np.array(["x", "y", "z"])
+    hashes = file_utils.get_filename_hashes(np.array(["x", "x", "w"]))
+
+    mask = file_utils.get_member_mask(hashes, lambda indexes: filenames[indexes], np.array(["x", "w"]))
+
+    assert mask.tolist() == [True, False, False]
+
+@pytest.mark.parametrize("pool_chunk_size", [0, 2])
+def test_pool_dedup_and_exclusion_survive_hash_collisions(tmp_path, monkeypatch, pool_chunk_size):
+    filenames = np.array(["a.fits", "b.fits", "a.fits", "c.fits", "d.fits"])
+    write_pool(str(tmp_path / "pool.h5"), filenames, np.zeros(filenames.shape[0], dtype=np.uint64))
+    monkeypatch.setattr(file_utils, "get_filename_hashes", lambda names: np.zeros(len(names), dtype=np.uint64))
+    config = make_config(tmp_path, pool_chunk_size=pool_chunk_size)
+    filenames_tr = np.array(["c.fits"])
+
+    if pool_chunk_size:
+        state = {"rows": 0, "pool_rows": 0, "oracle_heap": [], "candidate_indexes": [], "scores": []}
+        predictor = lambda fluxes: np.tile([1.0, 0.0, 0.0], (fluxes.shape[0], 1))
+        chunks = list(regular_iteration.score_pool_chunks(config, predictor, filenames_tr, state))
+        kept = np.concatenate([chunk["filenames"] for chunk in chunks])
+        pool_indexes = np.concatenate([chunk["pool_indexes"] for chunk in chunks])
+    else:
+        kept, _, _, pool_indexes, hashes = regular_iteration.get_pool_data(config)
+        mask = ~file_utils.get_member_mask(hashes, lambda indexes: kept[indexes], filenames_tr)
+        kept, pool_indexes = kept[mask], pool_indexes[mask]
+
+    assert kept.tolist() == ["a.fits", "b.fits", "d.fits"]
+    assert pool_indexes.tolist() == [0, 1, 4]
+
+def test_training_data_dedup_survives_hash_collisions(tmp_path, monkeypatch):
+    filenames = np.array(["a.fits", "b.fits", "c.fits"])
+    fluxes = write_pool(str(tmp_path / "labelled.h5"), filenames, np.zeros(filenames.shape[0], dtype=np.uint64))
+    (tmp_path / "oracle.json").write_text('{"filenames": ["b.fits", "a.fits", "b.fits", "c.fits"], '
+                                          '"labels": [1, 0, 1, 2]}')
+    config = make_config(tmp_path, training_data_to_add_path=str(tmp_path / "labelled.h5"),
+                         oracle_data_to_add_path=str(tmp_path / "oracle.json"))
+    monkeypatch.setattr(file_utils, "get_filename_hashes", lambda names: np.zeros(len(names), dtype=np.uint64))
+
+    filenames_tr, _, fluxes_tr, labels_tr = regular_iteration.get_tr_data(config)
+
+    assert filenames_tr.tolist() == ["b.fits", "a.fits", "c.fits"]
+    assert labels_tr.tolist() == [1, 0, 2]
+    assert np.array_equal(fluxes_tr, fluxes[[1, 0, 2]])
+
+def test_append_store_round_trip(tmp_path, monkeypatch):
+    file_path = str(tmp_path / "training_data.h5")
+    wave = np.linspace(4000, 5000, 4)
+    fluxes = np.arange(20, dtype=float).reshape(5, 4)
+    filenames = np.array(["a.fits", "b.fits", "c.fits", "d.fits", "e.fits"])
+    labels = np.array([0, 1, 2, 0, 1])
+    monkeypatch.setattr(file_utils, "get_filename_hashes", lambda names: np.zeros(len(names), dtype=np.uint64))
+
+    file_utils.append_training_data(file_path, make_config(tmp_path, iteration=1), filenames[:2], wave,
+                                    fluxes[:2], labels[:2])
+    file_utils.append_training_data(file_path, make_config(tmp_path, iteration=2), filenames[[1, 0, 2, 3]], wave,
+                                    fluxes[[1, 0, 2, 3]], labels[[1, 0, 2, 3]])
+    file_utils.append_training_data(file_path, make_config(tmp_path, iteration=2), filenames[[0, 4]], wave,
+                                    fluxes[[0, 4]], labels[[0, 4]])
+
+    read_filenames, _, read_fluxes, read_labels = file_utils.read_training_data(file_path)
+    assert read_filenames.tolist() == ["a.fits", "b.fits", "e.fits"]
+    assert np.array_equal(read_fluxes, fluxes[[0, 1, 4]])
+    assert read_labels.tolist() == [0, 1, 1]
+    assert file_utils.read_training_data(file_path, iteration=1)[0].tolist() == ["a.fits", "b.fits"]
+    assert file_utils.read_filename_index(file_path)[1].tolist() == [0, 1, 2]
+
+def test_append_store_refuses_to_rewind(tmp_path):
+    file_path = str(tmp_path / "training_data.h5")
+    wave = np.linspace(4000, 5000, 4)
+    fluxes = np.arange(12, dtype=float).reshape(3, 4)
+    filenames = np.array(["a.fits", "b.fits", "c.fits"])
+    for iteration in (1, 2):
+        file_utils.append_training_data(file_path, make_config(tmp_path, iteration=iteration), 
+                                        filenames[:iteration + 1], wave, fluxes[:iteration + 1], 
+                                        np.arange(iteration + 1))
+
+    with pytest.raises(ValueError):
+        file_utils.append_training_data(file_path, make_config(tmp_path, iteration=1), filenames[:2], wave,
+                                        fluxes[:2], np.arange(2))
+
+    assert file_utils.read_training_data(file_path)[0].tolist() == ["a.fits", "b.fits", "c.fits"]
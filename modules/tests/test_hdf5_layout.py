@@ -0,0 +1,39 @@
+import h5py
+import numpy as np
+
+import file_utils
+import hdf5_layout
+import job_preprocessing
+from config import ActiveLearningConfig
+
+def test_fixed_dataset_is_contiguous_unless_configured():
+    assert hdf5_layout.get_flux_dataset_options({}, 600, np.float64, 1000) == {}
+    assert hdf5_layout.get_flux_dataset_options({"hdf5_shuffle": True}, 600, np.float64, 1000)["chunks"] == (128, 600)
+    assert hdf5_layout.get_flux_dataset_options({"hdf5_chunk_rows": 64}, 600, np.float64, 10)["chunks"] == (10, 600)
+
+def test_chunk_divides_prediction_batch():
+    options = hdf5_layout.get_flux_dataset_options({"batch_size_predict": 3 * 2**10}, 4096, np.float32)
+
+    assert options["chunks"] == (48, 4096)
+    assert options["maxshape"] == (None, 4096)
+    assert 3 * 2**10 % options["chunks"][0] == 0
+    assert options["chunks"][0] * 4096 * 4 <= hdf5_layout.HDF5_CHUNK_BYTES
+
+def test_preprocessing_and_active_learning_write_same_layout(tmp_path):
+    settings = {"hdf5_compression": "gzip", "hdf5_compression_level": 1, "hdf5_shuffle": True}
+    filenames = np.array(["a.fits", "b.fits"])
+    wave = np.linspace(4000, 5000, 600)
+    fluxes = np.zeros((2, 600), dtype=np.float32)
+    config = ActiveLearningConfig.model_validate({
+        "iteration": 1, "classes": ["a", "b"], "candidate_classes": ["b"], "pool_data_path": "",
+        "append_training_data": True, **settings,
+    })
+
+    job_preprocessing.write_preprocessed_data(str(tmp_path / "result.h5"), filenames, wave, fluxes,
+                                              hdf5_layout.get_flux_dataset_options(settings, 600, fluxes.dtype))
+    file_utils.append_training_data(str(tmp_path / "training_data.h5"), config, filenames, wave, fluxes,
+                                    np.array([0, 1]))
+
+    with h5py.File(tmp_path / "result.h5") as prep_h5f, h5py.File(tmp_path / "training_data.h5") as tr_h5f:
+        for attribute in ("chunks", "maxshape", "compression", "compression_opts", "shuffle"):
+            assert getattr(prep_h5f["fluxes"], attribute) == getattr(tr_h5f["fluxes"], attribute)
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from metrics import Metrics
+
+def test_stages_are_written_with_rows_and_times(tmp_path):
+    metrics = Metrics(str(tmp_path))
+    with metrics.stage("read", 10):
+        pass
+    with metrics.stage("predict") as stage:
+        stage["rows"] = 4
+    with metrics.stage("write"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.stage("failed", 2):
+            raise RuntimeError()
+    metrics.write()
+
+    result = json.loads((tmp_path / "metrics.json").read_text())
+    stages = result["stages"]
+    assert list(stages) == ["read", "predict", "write", "failed"]
+    assert stages["predict"]["rows"] == 4
+    assert stages["predict"]["rows_per_second"] == pytest.approx(4 / stages["predict"]["wall_seconds"])
+    assert stages["write"]["rows"] is None and "rows_per_second" not in stages["write"]
+    assert result["wall_seconds"] >= sum(stage["wall_seconds"] for stage in stages.values())
+    assert result["peak_rss_mib"] >= max(stage["peak_rss_mib"] for stage in stages.values())
+
+def test_profiled_stage_is_dumped(tmp_path):
+    metrics = Metrics(str(tmp_path), "predict", "tracemalloc")
+    with metrics.stage("predict"):
+        [0] * 1000
+    with metrics.stage("write"):
+        pass
+
+    assert [path.name for path in tmp_path.iterdir()] == ["tracemalloc_predict.txt"]
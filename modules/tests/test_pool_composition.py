@@ -0,0 +1,36 @@
+import json
+
+import h5py
+import numpy as np
+
+import file_utils
+import filename_index
+import job_pool_composition
+
+def write_result(file_path, filenames, with_index) -> np.ndarray:
+    fluxes = np.random.default_rng(len(filenames)).random((len(filenames), 4))
+    with h5py.File(file_path, "w") as h5f:
+        h5f.create_dataset("filenames", data=filenames, dtype=h5py.string_dtype("utf-8"))
+        h5f.create_dataset("wave", data=np.linspace(4000, 5000, 4))
+        h5f.create_dataset("fluxes", data=fluxes)
+        if with_index:
+            filename_index.write_filename_index(h5f, filename_index.get_filename_hashes(np.array(filenames)))
+    return fluxes
+
+def test_composed_pool_has_index_and_metrics(tmp_path):
+    first = write_result(tmp_path / "first.h5", ["c.fits", "a.fits"], with_index=True)
+    second = write_result(tmp_path / "second.h5", ["b.fits", "d.fits", "e.fits"], with_index=False)
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({"data_paths": [str(tmp_path / "first.h5"), str(tmp_path / "second.h5")]}))
+
+    job_pool_composition.main(str(config_path), str(tmp_path))
+
+    with h5py.File(tmp_path / "result.h5") as h5f:
+        assert np.array_equal(h5f["fluxes"][:], np.concatenate((first, second)))
+        hashes = filename_index.get_filename_hashes(h5f["filenames"].asstr()[:])
+        assert np.array_equal(h5f["filename_index_hashes"][:], np.sort(hashes))
+        assert np.array_equal(hashes[h5f["filename_index_rows"][:]], h5f["filename_index_hashes"][:])
+    assert file_utils.find_rows(str(tmp_path / "result.h5"), np.array(["d.fits", "a.fits", "x.fits"])).tolist() == [3, 1, -1]
+    metrics = json.loads((tmp_path / "metrics.json").read_text())
+    assert list(metrics["stages"]) == ["compose_pool", "write_filename_index"]
+    assert metrics["stages"]["compose_pool"]["rows"] == 5
@@ -0,0 +1,51 @@
+import os
+
+import h5py
+import numpy as np
+import pytest
+
+import file_utils
+from test_filename_index import make_config, write_pool
+
+def write_reference(file_path, pool_path, indexes):
+    with h5py.File(file_path, "w") as h5f:
+        file_utils.write_pool_reference(h5f, str(pool_path), np.array(indexes))
+
+def test_reference_reads_same_data_as_copy(tmp_path):
+    filenames = np.array([f"s{i}.fits" for i in range(6)])
+    fluxes = write_pool(tmp_path / "pool.h5", filenames)
+    write_reference(tmp_path / "first.h5", tmp_path / "pool.h5", [5, 1, 2, 4])
+    write_reference(tmp_path / "second.h5", tmp_path / "first.h5", [3, 0])
+
+    read_filenames, wave, read_fluxes = file_utils.read_pool_data(str(tmp_path / "second.h5"))
+
+    assert read_filenames.tolist() == ["s4.fits", "s5.fits"]
+    assert np.array_equal(read_fluxes, fluxes[[4, 5]])
+    assert wave.shape == (4,)
+    with h5py.File(tmp_path / "second.h5") as h5f:
+        assert h5f.get("pool", getlink=True).filename == str((tmp_path / "pool.h5").resolve())
+    subset_filenames, subset_fluxes = file_utils.read_pool_subset(str(tmp_path / "first.h5"), np.array([1, 3]))
+    assert subset_filenames.tolist() == ["s1.fits", "s4.fits"]
+    assert np.array_equal(subset_fluxes, fluxes[[1, 4]])
+
+def test_zero_iteration_references_whole_pool(tmp_path):
+    import zero_iteration
+
+    filenames = np.array([f"s{i}.fits" for i in range(6)])
+    fluxes = write_pool(tmp_path / "pool.h5", filenames)
+    config = make_config(tmp_path, iteration=0, reference_pool=True, oracle_batch_size=2)
+
+    zero_iteration.run(config)
+
+    read_filenames, _, read_fluxes = file_utils.read_pool_data(str(tmp_path / "result.h5"))
+    assert np.array_equal(read_filenames, filenames)
+    assert np.array_equal(read_fluxes, fluxes)
+    assert file_utils.find_rows(str(tmp_path / "result.h5"), np.array(["s3.fits"])).tolist() == [3]
+
+def test_modified_pool_is_detected(tmp_path):
+    write_pool(tmp_path / "pool.h5", np.array(["a.fits", "b.fits"]))
+    write_reference(tmp_path / "result.h5", tmp_path / "pool.h5", [1])
+    write_pool(tmp_path / "pool.h5", np.array(["c.fits", "a.fits", "b.fits"]))
+
+    with pytest.raises(ValueError, match="modified"):
+        file_utils.read_pool_data(str(tmp_path / "result.h5"))
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import cnn_model
+from test_filename_index import make_config
+
+def keras_probabilities(model, fluxes, points, config):
+    return np.tile([0.2, 0.8], (fluxes.shape[0], 1))
+
+def make_backend(offset, calls):
+    def get_xla_predictor(model, points, config):
+        calls.append(points)
+        return lambda fluxes: np.tile([0.2 - offset, 0.8 + offset], (fluxes.shape[0], 1))
+    return get_xla_predictor
+
+def test_backend_drifting_from_keras_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(cnn_model, "predict", keras_probabilities)
+    monkeypatch.setattr(cnn_model, "get_xla_predictor", make_backend(0.1, []))
+    config = make_config(tmp_path, inference_backend="xla", inference_max_drift=0.01)
+
+    with pytest.raises(ValueError, match="differ from Keras"):
+        cnn_model.get_predictor(None, 4, config, np.zeros((8, 4)))
+
+def test_backend_within_drift_is_cached(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cnn_model, "predict", keras_probabilities)
+    monkeypatch.setattr(cnn_model, "get_xla_predictor", make_backend(0.001, calls))
+    config = make_config(tmp_path, inference_backend="xla", inference_max_drift=0.01)
+    predictors = {}
+
+    first = cnn_model.get_predictor(None, 4, config, np.zeros((8, 4)), predictors)
+    second = cnn_model.get_predictor(None, 4, config, np.zeros((8, 4)), predictors)
+
+    assert first is second
+    assert calls == [4]
@@ -0,0 +1,32 @@
+import h5py
+import numpy as np
+
+import job_preprocessing
+
+def test_update_removes_spectra_of_interrupted_update(tmp_path):
+    file_path = str(tmp_path / "result.h5")
+    fluxes = np.arange(20, dtype=float).reshape(5, 4)
+    job_preprocessing.write_preprocessed_data(file_path, np.array(["a", "b", "c", "d", "e"]), 
+                                              np.linspace(4000, 5000, 4), fluxes)
+    params = {"wave_start_point": 4000.0, "wave_end_point": 5000.0, "wave_point_count": 4}
+    state = {"x.tar": {"size": 1, "mtime_ns": 1}, "y.fits": {"size": 2, "mtime_ns": 2}}
+    job_preprocessing.write_manifest(str(tmp_path / "manifest.json"), params, state, 
+                                     {"x.tar": {"a": 0, "b": 1}, "y.fits": {"": 2}})
+    manifest = job_preprocessing.read_manifest(str(tmp_path / "manifest.json"))
+
+    rows = job_preprocessing.update_preprocessed_file([], file_path, manifest, state, 2)
+
+    assert rows == {"x.tar": {"a": 0, "b": 1}, "y.fits": {"": 2}}
+    assert not (tmp_path / "manifest.json.tmp").exists()
+    with h5py.File(file_path) as h5f:
+        assert h5f["filenames"].asstr()[:].tolist() == ["a", "b", "c"]
+        assert np.array_equal(h5f["fluxes"][:], fluxes[:3])
+
+def test_clone_file_replaces_destination(tmp_path):
+    (tmp_path / "src").write_bytes(b"new")
+    (tmp_path / "dst").write_bytes(b"old content")
+
+    job_preprocessing.clone_file(str(tmp_path / "src"), str(tmp_path / "dst"))
+
+    assert (tmp_path / "dst").read_bytes() == b"new"
+    assert not (tmp_path / "dst.tmp").exists()
@@ -0,0 +1,19 @@
+import numpy as np
+
+import resampling
+
+def test_resample_equals_interp_loop():
+    rng = np.random.default_rng(0)
+    grid_a = np.linspace(3900, 5100, 300)
+    grid_b = np.sort(rng.uniform(3800, 5200, 250))
+    unsorted = rng.uniform(3900, 5100, 200)
+    # New wave goes out of source waves and hits their points exactly.
+    new_wave = np.concatenate(([3700.0], np.linspace(4000, 5000, 97), grid_a[[10, 150]], [5300.0]))
+    waves = [grid_a] * (resampling.BLOCK_SIZE + 5) + [grid_b] * 7 + [unsorted] * 3 + [grid_a.copy()] * 2
+    rng.shuffle(waves)
+    fluxes = [rng.normal(size=wave.shape[0]).astype(np.float32 if i % 3 == 0 else np.float64)
+              for i, wave in enumerate(waves)]
+
+    expected = np.array([np.interp(new_wave, wave, flux) for wave, flux in zip(waves, fluxes)])
+
+    assert np.array_equal(resampling.resample(new_wave, zip(waves, fluxes)), expected)
@@ -0,0 +1,53 @@
+import numpy as np
+
+import file_utils
+import regular_iteration
+from test_filename_index import make_config
+
+HASHES = np.arange(10, 20, dtype=np.uint64)
+
+def write_cache(tmp_path, full_iteration) -> str:
+    # Spectra 3 and 7 are candidates, entropies of others grow with their hashes.
+    labels_pred = np.zeros(10, dtype=int)
+    labels_pred[[3, 7]] = 1
+    entropies = np.linspace(0.1, 1.0, 10)
+    file_path = str(tmp_path / "score_cache.h5")
+    file_utils.write_score_cache(file_path, HASHES[::-1], labels_pred[::-1], entropies[::-1], full_iteration)
+    return file_path
+
+def make_scoring_config(tmp_path, iteration, full_iteration):
+    return make_config(tmp_path, iteration=iteration, budgeted_scoring=True, rescore_budget=0.5, 
+                       rescore_exploration=0.0, full_rescore_every=3, 
+                       score_cache_path=write_cache(tmp_path, full_iteration))
+
+def predict_ones(calls):
+    def predictor(fluxes):
+        calls.append(fluxes[:, 0].astype(int).tolist())
+        return np.tile([0.0, 0.0, 1.0], (fluxes.shape[0], 1))
+    return predictor
+
+def test_budget_rescores_candidates_top_entropies_and_new_spectra(tmp_path):
+    cache = regular_iteration.get_score_cache(make_scoring_config(tmp_path, iteration=3, full_iteration=1))
+
+    assert np.flatnonzero(cache["rescore"]).tolist() == [3, 6, 7, 8, 9]
+
+    hashes = np.array([19, 3, 13, 12, 17], dtype=np.uint64)
+    fluxes = hashes.astype(float)[:, None].repeat(4, axis=1)
+    calls = []
+    labels_pred, entropies = regular_iteration.score_spectra(predict_ones(calls), fluxes, hashes, cache)
+
+    assert calls == [[19, 3, 13, 17]]
+    assert labels_pred.tolist() == [2, 2, 2, 0, 2]
+    assert entropies[3] == np.linspace(0.1, 1.0, 10)[2]
+
+def test_full_rescore_after_configured_iterations(tmp_path):
+    config = make_scoring_config(tmp_path, iteration=4, full_iteration=1)
+    assert regular_iteration.get_score_cache(config) is None
+
+    calls = []
+    fluxes = HASHES.astype(float)[:, None].repeat(4, axis=1)
+    regular_iteration.score_spectra(predict_ones(calls), fluxes, HASHES, None)
+    assert calls == [HASHES.astype(int).tolist()]
+
+    regular_iteration.write_score_cache(config, None, HASHES, np.zeros(10, dtype=int), np.zeros(10))
+    assert file_utils.read_score_cache(str(tmp_path / "score_cache.h5"))["full_iteration"] == 4
@@ -0,0 +1,84 @@
+import json
+
+import h5py
+import numpy as np
+import pytest
+
+import file_utils
+import regular_iteration
+from test_filename_index import make_config, write_pool
+
+FILENAMES = np.array(["a.fits", "b.fits", "c.fits", "d.fits", "e.fits"])
+
+def make_iteration(tmp_path, iteration, oracle_filenames, training_data_path):
+    result_dir = tmp_path / f"it{iteration}"
+    result_dir.mkdir(exist_ok=True)
+    oracle_path = tmp_path / f"oracle{iteration}.json"
+    oracle_path.write_text(json.dumps({"filenames": oracle_filenames, "labels": [1] * len(oracle_filenames)}))
+    return make_config(tmp_path, iteration=iteration, append_training_data=True, result_dir_path=str(result_dir),
+                       training_data_path=training_data_path, training_data_to_add_path=str(tmp_path / "pool.h5"),
+                       oracle_data_to_add_path=str(oracle_path))
+
+def run_update(config) -> str:
+    store_path = regular_iteration.move_training_store(config)
+    regular_iteration.update_training_store(config, store_path)
+    return store_path
+
+def test_store_moves_forward_and_reads_only_new_fluxes(tmp_path, monkeypatch):
+    fluxes = write_pool(tmp_path / "pool.h5", FILENAMES)
+    read_fluxes_by_filenames = file_utils.read_fluxes_by_filenames
+    requested = []
+    def read_fluxes(file_path, filenames, dtype=None):
+        requested.append(filenames.tolist())
+        return read_fluxes_by_filenames(file_path, filenames, dtype)
+    monkeypatch.setattr(file_utils, "read_fluxes_by_filenames", read_fluxes)
+
+    first_path = run_update(make_iteration(tmp_path, 1, ["a.fits", "b.fits"], ""))
+    second = make_iteration(tmp_path, 2, ["b.fits", "c.fits", "c.fits", "d.fits"], first_path)
+    second_path = run_update(second)
+
+    assert requested == [["a.fits", "b.fits"], ["c.fits", "d.fits"]]
+    assert not (tmp_path / "it1" / "training_data.h5").exists()
+    assert second_path == str(tmp_path / "it2" / "training_data.h5")
+    filenames, _, read_fluxes, _ = file_utils.read_training_data(second_path)
+    assert filenames.tolist() == ["a.fits", "b.fits", "c.fits", "d.fits"]
+    assert np.array_equal(read_fluxes, fluxes[:4])
+    with h5py.File(second_path) as h5f:
+        assert h5f["iteration"][:].tolist() == [1, 1, 2, 2]
+
+    run_update(second)
+    assert file_utils.read_training_data(second_path)[0].tolist() == ["a.fits", "b.fits", "c.fits", "d.fits"]
+    with pytest.raises(ValueError, match="moved by later iteration"):
+        run_update(make_iteration(tmp_path, 1, ["a.fits", "b.fits"], first_path))
+
+def test_snapshot_and_truncation_by_iteration(tmp_path):
+    file_path = str(tmp_path / "training_data.h5")
+    wave = np.linspace(4000, 5000, 4)
+    fluxes = np.arange(20, dtype=float).reshape(5, 4)
+    for iteration, rows in ((1, [0, 1]), (2, [2]), (3, [3, 4])):
+        file_utils.append_training_data(file_path, make_config(tmp_path, iteration=iteration), FILENAMES[rows], 
+                                        wave, fluxes[rows], np.array(rows))
+
+    assert file_utils.read_training_data(file_path, iteration=2)[0].tolist() == FILENAMES[:3].tolist()
+    assert file_utils.read_training_data(file_path, iteration=0)[0].tolist() == []
+    with pytest.raises(ValueError):
+        file_utils.truncate_training_store(file_path, 2)
+
+    assert file_utils.truncate_training_store(file_path, 3) == 3
+    assert file_utils.read_training_data(file_path)[0].tolist() == FILENAMES[:3].tolist()
+    assert file_utils.find_rows(file_path, FILENAMES).tolist() == [0, 1, 2, -1, -1]
+
+def test_store_dataset_streams_every_spectrum_once(tmp_path):
+    cnn_model = pytest.importorskip("cnn_model")
+    pytest.importorskip("tensorflow")
+    fluxes = np.repeat(np.arange(10, dtype=np.float32)[:, None], 4, axis=1)
+    labels = np.arange(10) % 2
+    with h5py.File(tmp_path / "training_data.h5", "w") as h5f:
+        dataset = h5f.create_dataset("fluxes", data=fluxes, chunks=(3, 4), maxshape=(None, 4))
+        batches = list(cnn_model.make_store_dataset(dataset, labels, 4, 2, 4, 8).as_numpy_iterator())
+
+    assert [batch.shape[0] for batch, _ in batches] == [4, 4, 2]
+    rows = np.concatenate([batch[:, 0, 0] for batch, _ in batches]).astype(int)
+    one_hot = np.concatenate([batch_labels for _, batch_labels in batches])
+    assert sorted(rows) == list(range(10))
+    assert np.array_equal(one_hot.argmax(axis=1), labels[rows])
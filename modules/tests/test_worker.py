@@ -0,0 +1,92 @@
+import json
+
+import h5py
+import numpy as np
+
+import cnn_model
+import file_utils
+import worker
+from test_filename_index import write_pool
+
+def test_pool_cache_evicts_least_recently_used():
+    cache = file_utils.PoolCache(3 * 800)
+    arrays = {key: (np.zeros(100),) for key in "abcd"}
+    for key in "abc":
+        cache.put(key, arrays[key])
+    cache.get("a")
+
+    cache.put("d", arrays["d"])
+
+    assert list(cache.items) == ["c", "a", "d"]
+    assert cache.size == 3 * 800
+    assert not arrays["a"][0].flags.writeable
+    cache.put("big", (np.zeros(400),))
+    assert "big" not in cache.items
+
+def test_pool_cache_holds_only_referenced_original_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "pool_cache", file_utils.PoolCache(2**20))
+    fluxes = write_pool(tmp_path / "pool.h5", np.array(["a.fits", "b.fits", "c.fits"]))
+    for name, rows in (("all.h5", [0, 1, 2]), ("part.h5", [2, 0])):
+        with h5py.File(tmp_path / name, "w") as h5f:
+            file_utils.write_pool_reference(h5f, str(tmp_path / "pool.h5"), np.array(rows))
+
+    file_utils.read_pool_data(str(tmp_path / "pool.h5"))
+    assert not file_utils.pool_cache.items
+    _, _, all_fluxes = file_utils.read_pool_data(str(tmp_path / "all.h5"))
+    filenames, _, part_fluxes = file_utils.read_pool_data(str(tmp_path / "part.h5"))
+
+    assert len(file_utils.pool_cache.items) == 1
+    assert all_fluxes is next(iter(file_utils.pool_cache.items.values()))[2]
+    assert filenames.tolist() == ["c.fits", "a.fits"]
+    assert np.array_equal(part_fluxes, fluxes[[2, 0]])
+
+def test_model_cache_is_keyed_by_saved_file(tmp_path):
+    cache = cnn_model.ModelCache(1)
+    model_path = tmp_path / "model.keras"
+    model_path.write_bytes(b"first")
+    model, predictors = object(), {}
+    cache.put(str(model_path), model, predictors)
+
+    assert cache.pop(str(model_path)) == (model, predictors)
+    assert cache.pop(str(model_path)) is None
+    cache.put(str(model_path), model, predictors)
+    model_path.write_bytes(b"second model")
+    assert cache.pop(str(model_path)) is None
+
+def test_jobs_are_claimed_in_order_and_report_status(tmp_path):
+    queue_dir = str(tmp_path / "queue")
+    first = worker.submit_job(queue_dir, "first.json", str(tmp_path / "first"))
+    second = worker.submit_job(queue_dir, "second.json", str(tmp_path / "second"))
+    calls = []
+
+    def main(config_path: str, result_dir_path: str) -> None:
+        calls.append(config_path)
+        if config_path.endswith("second.json"):
+            raise ValueError("broken config")
+
+    for _ in range(2):
+        job_path = worker.claim_job(queue_dir)
+        assert job_path.parent.name == "running"
+        worker.run_job(job_path, queue_dir, main)
+        assert not job_path.exists()
+
+    assert worker.claim_job(queue_dir) is None
+    assert [path.rsplit("/", 1)[1] for path in calls] == ["first.json", "second.json"]
+    assert json.loads(first.read_text())["status"] == "ok"
+    status = json.loads(second.read_text())
+    assert status["status"] == "error"
+    assert "broken config" in status["error"]
+    assert status["result_dir_path"] == str(tmp_path / "second")
+
+def test_worker_runs_given_number_of_jobs(tmp_path, monkeypatch):
+    queue_dir = str(tmp_path / "queue")
+    done = [worker.submit_job(queue_dir, f"{i}.json", str(tmp_path)) for i in range(3)]
+    monkeypatch.setattr(cnn_model, "model_cache", None)
+    monkeypatch.setattr(file_utils, "pool_cache", file_utils.PoolCache(1))
+
+    worker.run_worker(queue_dir, lambda config_path, result_dir_path: None, cache_size_mb=0, max_jobs=2)
+
+    assert [path.exists() for path in done] == [True, True, False]
+    assert len(list((tmp_path / "queue" / "pending").glob("*.json"))) == 1
+    assert file_utils.pool_cache is None
+    assert isinstance(cnn_model.model_cache, cnn_model.ModelCache)